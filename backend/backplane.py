@@ -0,0 +1,226 @@
+"""
+Pub/sub backplane that connects room shards running in separate worker processes.
+
+Every shard subscribes to its own channel and anyone who needs that shard
+publishes to it. Messages from one publisher arrive in order and each
+subscriber handles them one at a time, so a shard sees a client's actions in
+the order they were sent.
+
+InProcessBackplane keeps all channels inside one process. RespBackplane speaks
+the Redis protocol (PUBLISH/SUBSCRIBE) over TCP or a Unix socket, so it runs
+against Redis or against the RespBroker stand-in in this module:
+    python backplane.py unix:///tmp/guess-game-backplane.sock
+"""
+import asyncio
+import logging
+import sys
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Backplane:
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def subscribe(self, channel: str, handler: Handler):
+        raise NotImplementedError
+
+    def publish(self, channel: str, message: dict):
+        """Send without waiting; the message is delivered in order after earlier ones"""
+        raise NotImplementedError
+
+
+async def dispatch(handler: Handler, message: dict):
+    try:
+        await handler(message)
+    except Exception as e:
+        logger.error(f"Backplane handler failed on {message.get('op')}: {e}")
+
+
+class InProcessBackplane(Backplane):
+    """Channels are queues in this process - for a single worker running every shard"""
+    def __init__(self):
+        self.queues: Dict[str, List[asyncio.Queue]] = {}
+        self.consumers: List[asyncio.Task] = []
+
+    async def stop(self):
+        for consumer in self.consumers:
+            consumer.cancel()
+        self.consumers.clear()
+
+    async def subscribe(self, channel: str, handler: Handler):
+        queue = asyncio.Queue()
+        self.queues.setdefault(channel, []).append(queue)
+        self.consumers.append(asyncio.create_task(self._consume(queue, handler)))
+
+    async def _consume(self, queue: asyncio.Queue, handler: Handler):
+        while True:
+            await dispatch(handler, await queue.get())
+
+    def publish(self, channel: str, message: dict):
+        for queue in self.queues.get(channel, ()):
+            queue.put_nowait(message)
+
+
+def encode_command(*args: bytes) -> bytes:
+    """A RESP array of bulk strings - the wire form of commands and pushed messages"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Backplane connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"*":
+        count = int(rest)
+        return None if count < 0 else [await read_reply(reader) for _ in range(count)]
+    if kind == b"$":
+        size = int(rest)
+        return None if size < 0 else (await reader.readexactly(size + 2))[:-2]
+    if kind == b":":
+        return int(rest)
+    if kind == b"+":
+        return rest
+    if kind == b"-":
+        raise RuntimeError(f"Backplane error: {rest.decode(errors='replace')}")
+    raise ConnectionError(f"Unexpected backplane reply: {line[:40]!r}")
+
+
+async def open_connection(url: str):
+    """Streams for redis://host:port or unix:///path"""
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return await asyncio.open_unix_connection(parsed.path)
+    return await asyncio.open_connection(parsed.hostname or "localhost", parsed.port or 6379)
+
+
+class RespBackplane(Backplane):
+    """PUBLISH/SUBSCRIBE over the Redis protocol, one connection for each direction"""
+    def __init__(self, url: str, encode: Callable[[dict], str], decode: Callable[[bytes], dict]):
+        self.url = url
+        self.encode = encode
+        self.decode = decode
+        self.handlers: Dict[bytes, Handler] = {}
+        self._subscribed: Dict[bytes, asyncio.Future] = {}
+        self._sub_writer: Optional[asyncio.StreamWriter] = None
+        self._pub_writer: Optional[asyncio.StreamWriter] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        sub_reader, self._sub_writer = await open_connection(self.url)
+        pub_reader, self._pub_writer = await open_connection(self.url)
+        self._tasks = [
+            asyncio.create_task(self._read_messages(sub_reader)),
+            asyncio.create_task(self._read_publish_replies(pub_reader)),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for writer in (self._sub_writer, self._pub_writer):
+            if writer is not None:
+                writer.close()
+
+    async def subscribe(self, channel: str, handler: Handler):
+        name = channel.encode()
+        self.handlers[name] = handler
+        confirmed = self._subscribed[name] = asyncio.get_running_loop().create_future()
+        self._sub_writer.write(encode_command(b"SUBSCRIBE", name))
+        await self._sub_writer.drain()
+        # Messages published before the broker confirms would be lost
+        await confirmed
+
+    def publish(self, channel: str, message: dict):
+        self._pub_writer.write(encode_command(b"PUBLISH", channel.encode(), self.encode(message).encode()))
+
+    async def _read_messages(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                kind, channel, payload = await read_reply(reader)
+                if kind == b"message":
+                    handler = self.handlers.get(channel)
+                    if handler is not None:
+                        await dispatch(handler, self.decode(payload))
+                elif kind == b"subscribe":
+                    confirmed = self._subscribed.pop(channel, None)
+                    if confirmed is not None:
+                        confirmed.set_result(None)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Backplane subscription lost: {e}")
+
+    async def _read_publish_replies(self, reader: asyncio.StreamReader):
+        # PUBLISH answers with the subscriber count, which nothing needs
+        try:
+            while True:
+                await read_reply(reader)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Backplane publish connection lost: {e}")
+
+
+class RespBroker:
+    """Minimal local stand-in for Redis: just SUBSCRIBE, PUBLISH and PING"""
+    def __init__(self):
+        self.subscribers: Dict[bytes, List[asyncio.StreamWriter]] = {}
+
+    async def serve(self, url: str) -> asyncio.AbstractServer:
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            return await asyncio.start_unix_server(self._handle, parsed.path)
+        return await asyncio.start_server(self._handle, parsed.hostname or "localhost", parsed.port or 6379)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        channels: List[bytes] = []
+        try:
+            while True:
+                command = await read_reply(reader)
+                name = command[0].upper()
+                if name == b"PUBLISH":
+                    subscribers = self.subscribers.get(command[1], ())
+                    pushed = encode_command(b"message", command[1], command[2])
+                    for subscriber in subscribers:
+                        subscriber.write(pushed)
+                    writer.write(b":%d\r\n" % len(subscribers))
+                elif name == b"SUBSCRIBE":
+                    for channel in command[1:]:
+                        self.subscribers.setdefault(channel, []).append(writer)
+                        channels.append(channel)
+                        # [b"subscribe", channel, subscription count]
+                        writer.write(b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:%d\r\n" % (len(channel), channel, len(channels)))
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                else:
+                    writer.write(b"-ERR unknown command\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers[channel].remove(writer)
+            writer.close()
+
+
+async def serve_forever(url: str):
+    server = await RespBroker().serve(url)
+    logger.info(f"Backplane broker listening on {url}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve_forever(sys.argv[1] if len(sys.argv) > 1 else "unix:///tmp/guess-game-backplane.sock"))
@@ -0,0 +1,210 @@
+"""
+Append-only event log with periodic snapshots, used to make room state durable.
+
+Events are buffered in memory and written to the current log segment in
+batches, each batch followed by one fsync, on a worker thread - appending
+never blocks the event loop. A snapshot captures the full state at a log
+position and starts a new segment, after which older segments are deleted.
+Recovery is the latest snapshot plus the events logged after it.
+
+Events appended as archived are also kept in an archive file that compaction
+never touches, for records wanted long after the state they changed is gone
+(e.g. every round ever played). It grows for the life of the directory.
+
+A process about to go down can freeze the log: later appends are dropped, so
+recovery gets the state as of the freeze rather than the teardown after it.
+"""
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".log"
+ARCHIVE_FILE = "archive.log"
+
+
+class EventLog:
+    def __init__(self, directory: str, encode: Callable[[dict], str], decode: Callable[[bytes], dict] = json.loads,
+                 flush_interval: float = 0.05, max_batch: int = 5000):
+        self.directory = Path(directory)
+        self.encode = encode
+        self.decode = decode
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.seq = 0  # sequence number of the last appended event
+        self.snapshot_seq = 0  # sequence number covered by the latest snapshot
+        self.frozen = False  # appends are dropped once set
+        self.buffer: List[str] = []
+        self.archive_buffer: List[str] = []
+        self.archive_found = False  # whether load() found an archive from an earlier run
+        self._segment = None
+        self._archive = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._snapshot_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    def load(self) -> Tuple[Optional[dict], Iterator[dict]]:
+        """Latest snapshot (or None) and an iterator over the events logged after it"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.archive_found = (self.directory / ARCHIVE_FILE).exists()
+        snapshot = None
+        snapshot_path = self.directory / SNAPSHOT_FILE
+        if snapshot_path.exists():
+            with open(snapshot_path, "rb") as f:
+                snapshot = self.decode(f.read())
+            self.snapshot_seq = self.seq = snapshot["seq"]
+        return snapshot, self._replay()
+
+    def read_archive(self) -> Iterator[dict]:
+        """Archived events, oldest first, for a reader alongside the process writing them"""
+        try:
+            f = open(self.directory / ARCHIVE_FILE, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield self.decode(line)
+                except ValueError:
+                    continue  # the tail of a batch still being written, or torn by a crash
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+    def _replay(self) -> Iterator[dict]:
+        for path in self._segments():
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        event = self.decode(line)
+                    except ValueError:
+                        # A torn write from a crash can only be the tail of a segment
+                        logger.warning(f"Skipping unreadable event in {path.name}")
+                        continue
+                    if event["seq"] <= self.seq:
+                        continue
+                    self.seq = event["seq"]
+                    yield event
+
+    async def start(self):
+        """Open a fresh segment after recovery and start the background flusher"""
+        self._lock = asyncio.Lock()
+        self._snapshot_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self._open_segment, self.seq + 1)
+        await asyncio.to_thread(self._open_archive)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+        if self._segment is not None:
+            await asyncio.to_thread(self._segment.close)
+            self._segment = None
+        if self._archive is not None:
+            await asyncio.to_thread(self._archive.close)
+            self._archive = None
+
+    def append(self, event: dict, archived: bool = False):
+        """Record an event, and keep it in the archive too if archived; it reaches disk with the next batch"""
+        if self.frozen:
+            return
+        self.seq += 1
+        event["seq"] = self.seq
+        line = self.encode(event)
+        self.buffer.append(line)
+        if archived:
+            self.archive_buffer.append(line)
+        if len(self.buffer) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    def archive(self, record: dict):
+        """Keep a record in the archive only, e.g. one from before the archive existed"""
+        if not self.frozen:
+            self.archive_buffer.append(self.encode(record))
+
+    def freeze(self):
+        """Drop every later append"""
+        self.frozen = True
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Event log flush failed: {e}")
+
+    async def flush(self):
+        if not (self.buffer or self.archive_buffer) or self._lock is None:
+            return
+        async with self._lock:
+            batch, self.buffer = self.buffer, []
+            archived, self.archive_buffer = self.archive_buffer, []
+            await asyncio.to_thread(self._write, batch, archived)
+
+    def _write(self, lines: List[str], archived: List[str]):
+        for f, batch in ((self._segment, lines), (self._archive, archived)):
+            if batch:
+                f.write(("\n".join(batch) + "\n").encode())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _open_segment(self, first_seq: int):
+        path = self.directory / f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}"
+        self._segment = open(path, "ab")
+
+    def _open_archive(self):
+        self._archive = open(self.directory / ARCHIVE_FILE, "a+b")
+        # A crash can leave a torn last record - end its line so the next one starts clean
+        if self._archive.tell() > 0:
+            self._archive.seek(-1, os.SEEK_END)
+            if self._archive.read(1) != b"\n":
+                self._archive.write(b"\n")
+
+    async def snapshot(self, capture: Callable[[], dict]):
+        """Write capture() as the new snapshot and drop the segments it covers"""
+        if self._lock is None:
+            return
+        # One snapshot at a time, so an older one never replaces a newer one on disk
+        async with self._snapshot_lock:
+            async with self._lock:
+                # Capture state, log position and pending batch together, so later
+                # events all land in the new segment
+                state = capture()
+                seq = self.seq
+                batch, self.buffer = self.buffer, []
+                archived, self.archive_buffer = self.archive_buffer, []
+                old_segment = self._segment
+                await asyncio.to_thread(self._write, batch, archived)
+                await asyncio.to_thread(old_segment.close)
+                await asyncio.to_thread(self._open_segment, seq + 1)
+            await asyncio.to_thread(self._write_snapshot, state, seq)
+            self.snapshot_seq = seq
+
+    def _write_snapshot(self, state: dict, seq: int):
+        snapshot_path = self.directory / SNAPSHOT_FILE
+        tmp_path = snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(self.encode({"seq": seq, **state}).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+        # Every segment except the current one is now covered by the snapshot (the archive is kept)
+        current = Path(self._segment.name).name
+        for path in self._segments():
+            if path.name != current:
+                path.unlink()
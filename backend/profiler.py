@@ -0,0 +1,68 @@
+"""
+Sampling profiler for individual calls, reporting in the collapsed-stack format
+that flame graph tools read (flamegraph.pl, speedscope, inferno): one
+"root;caller;callee weight" line per distinct call stack.
+
+A call picked by sample() runs under sys.setprofile, which sees every Python and
+C function call and return on this thread. The time between two events is
+charged to the stack that was on top, so weights are self time in microseconds,
+and the profiler's own work between events is left out. Calls not picked cost
+one random() comparison. Sampled calls run several times slower, so keep the
+sample rate low on a busy server.
+"""
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, Dict
+
+
+class StackProfiler:
+    def __init__(self, sample_rate: float = 0.0):
+        self.sample_rate = sample_rate  # fraction of calls profiled, 0 to turn off
+        self.stacks: Dict[str, float] = defaultdict(float)  # collapsed stack -> seconds of self time
+        self.samples = 0  # calls profiled since the last reset
+
+    def sample(self) -> bool:
+        """Whether to profile the next call"""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, root: str, func: Callable, *args):
+        """Call func(*args) under the profiler, its stacks starting at `root`"""
+        stacks = self.stacks
+        names = [root]  # collapsed stack of every frame entered and not yet returned from
+        clock = time.perf_counter
+        last = clock()
+
+        def on_event(frame, event, arg):
+            nonlocal last
+            stacks[names[-1]] += clock() - last
+            if event == "call":
+                code = frame.f_code
+                names.append(f"{names[-1]};{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            elif event == "c_call":
+                names.append(f"{names[-1]};{getattr(arg, '__qualname__', None) or repr(arg)}")
+            elif len(names) > 1:  # return, c_return, c_exception
+                names.pop()
+            last = clock()
+
+        sys.setprofile(on_event)
+        try:
+            return func(*args)
+        finally:
+            sys.setprofile(None)
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Stacks profiled so far, weighted in microseconds"""
+        lines = []
+        for stack, seconds in self.stacks.items():
+            weight = round(seconds * 1_000_000)
+            if weight > 0:
+                lines.append(f"{stack} {weight}\n")
+        return "".join(lines)
+
+    def reset(self):
+        self.stacks = defaultdict(float)
+        self.samples = 0
@@ -0,0 +1,40 @@
+"""
+Token buckets for limiting how often clients may act.
+
+A bucket holds up to `burst` tokens and refills at `rate` tokens a second;
+each action takes one. Refilling is computed from the time since the last
+take, so an idle bucket costs nothing and there is no timer per bucket.
+"""
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.tokens = burst  # a new bucket starts full
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: Optional[float] = None) -> bool:
+        """Spend a token if there is one"""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def give_back(self):
+        """Return a token taken for an action that did not go ahead after all"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available"""
+        self._refill(time.monotonic())
+        return max(1 - self.tokens, 0) / self.rate
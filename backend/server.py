@@ -1,15 +1,48 @@
-from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 # from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Dict, Optional, Union
+from pydantic import BaseModel, Field, ConfigDict, ValidationError, field_validator
+from typing import Callable, Deque, FrozenSet, Iterator, List, Dict, NamedTuple, Optional, Set, Tuple, Type, Union
+from collections import deque
+from operator import itemgetter
+import asyncio
+import heapq
+import re
+import signal
+import threading
 import uuid
+import time
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime, timezone
 import json
+import zlib
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, every client gets JSON without it
+    msgpack = None
+
+from event_log import EventLog
+from backplane import Backplane, InProcessBackplane, RespBackplane
+from metrics import MetricsRegistry
+from timer_wheel import TimerWheel
+from rate_limit import TokenBucket
+from profiler import StackProfiler
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, large rooms fall back to the plain loop
+    np = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -33,6 +66,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Create a router with the /api prefix
@@ -45,7 +79,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Room names configuration
+# Room names configuration - these rooms always exist, others are created on demand
 ROOM_NAMES = {
     1: "חדר הסודות",
     2: "חדר חדרי החדרים",
@@ -53,60 +87,1284 @@ ROOM_NAMES = {
     4: "חדר אחרון ודי",
 }
 
+# Room registry limits
+MAX_ROOMS = int(os.getenv("MAX_ROOMS", "50000"))
+MAX_ROOM_ID = int(os.getenv("MAX_ROOM_ID", "1000000"))
+MAX_PLAYERS_PER_ROOM = int(os.getenv("MAX_PLAYERS_PER_ROOM", "5000"))  # players + viewers
+ROOM_IDLE_TTL = float(os.getenv("ROOM_IDLE_TTL", "300"))  # seconds an empty on-demand room is kept
+ROOM_GC_INTERVAL = float(os.getenv("ROOM_GC_INTERVAL", "60"))
+
+# Rounds kept per room for the history API, and the most recent ones sent inline in room_state
+HISTORY_MAX_ROUNDS = int(os.getenv("HISTORY_MAX_ROUNDS", "1000"))
+HISTORY_INLINE_ROUNDS = int(os.getenv("HISTORY_INLINE_ROUNDS", "20"))
+
+# Durable room state: append-only event log plus periodic snapshots, enabled by
+# EVENT_LOG_DIR (relative paths are under the backend directory)
+EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", "")
+EVENT_LOG_FLUSH_MS = float(os.getenv("EVENT_LOG_FLUSH_MS", "50"))
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "60"))
+# Players restored from the log come back disconnected; those who haven't reconnected
+# this many seconds after startup are dropped, as if they had left
+RESTORE_REJOIN_SECONDS = float(os.getenv("RESTORE_REJOIN_SECONDS", "120"))
+
+# Rooms at least this large are scored with NumPy instead of a Python loop
+VECTORIZE_MIN_PLAYERS = int(os.getenv("VECTORIZE_MIN_PLAYERS", "64"))
+# Store the ROUND_TOP_K closest players with each round (0/1 keeps just the winner)
+ROUND_TOP_K = int(os.getenv("ROUND_TOP_K", "0"))
+# Seconds a round may stay in "choosing" before it is force-finished, 0 for no limit (admins
+# can set it per room). Every room's deadline sits on one timer wheel ticking every ROUND_TIMER_TICK seconds.
+ROUND_TIMEOUT = float(os.getenv("ROUND_TIMEOUT", "300"))
+ROUND_TIMER_TICK = float(os.getenv("ROUND_TIMER_TICK", "1"))
+
+# Rooms are sharded across worker processes - room_id % SHARD_COUNT is the owning shard.
+# Workers reach each other through BACKPLANE_URL (redis://host:port or unix:///path);
+# without it this process serves every shard over the in-process backplane.
+SHARD_COUNT = max(int(os.getenv("SHARD_COUNT", "1")), 1)
+BACKPLANE_URL = os.getenv("BACKPLANE_URL", "")
+SHARD_LOCK_DIR = os.getenv("SHARD_LOCK_DIR", "/tmp")
+BACKPLANE_CALL_TIMEOUT = float(os.getenv("BACKPLANE_CALL_TIMEOUT", "5"))
+
+# Shard locks stay open (and held) for the life of the process
+shard_locks = []
+
+def claim_shard_id() -> int:
+    """SHARD_ID if set, else the first free shard index - so `uvicorn --workers N` just works"""
+    if os.getenv("SHARD_ID"):
+        return int(os.getenv("SHARD_ID"))
+    if not BACKPLANE_URL or SHARD_COUNT == 1:
+        return 0
+    import fcntl
+    for index in range(SHARD_COUNT):
+        lock = open(Path(SHARD_LOCK_DIR) / f"guess-game-shard-{index}.lock", "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            continue
+        shard_locks.append(lock)
+        return index
+    raise RuntimeError(f"All {SHARD_COUNT} shards are already taken")
+
+SHARD_ID = claim_shard_id()
+# Shards whose rooms live in this process
+SERVED_SHARDS = {SHARD_ID} if BACKPLANE_URL else set(range(SHARD_COUNT))
+
+def shard_of(room_id: int) -> int:
+    return room_id % SHARD_COUNT
+
+def shard_channel(shard: int) -> str:
+    return f"shard:{shard}"
+
+# Metrics for /api/metrics - each worker process reports its own
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))  # seconds between event loop lag probes
+# Fraction of room actions run under the stack profiler, readable as a flame graph from
+# GET /api/profiler and changed at runtime with PUT /api/profiler. Both need the
+# X-Profiler-Token header to match PROFILER_TOKEN; without a token set they are refused.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+
+metrics = MetricsRegistry()
+profiler = StackProfiler(PROFILE_SAMPLE_RATE)
+ACTION_SECONDS = metrics.histogram("game_action_duration_seconds", "Time to apply one queued room action; _count is actions handled", ["action"])
+ACTION_ERRORS = metrics.counter("game_action_errors_total", "Room actions whose handler raised", ["action"])
+INVALID_ACTIONS = metrics.counter("game_invalid_actions_total", "Client actions ignored for failing their message schema", ["action"])
+RATE_LIMIT_DECISIONS = metrics.counter("game_rate_limit_decisions_total",
+                                       "Client actions let through (allowed), held for later (held) or dropped by the rate limiter",
+                                       ["action", "decision"])
+RATE_LIMIT_EXCEEDED = metrics.counter("game_rate_limit_exceeded_total", "Client actions over a limit, by the bucket that ran dry",
+                                      ["action", "scope"])
+SCORING_SECONDS = metrics.histogram("game_round_scoring_duration_seconds", "Time to score a round and record it")
+BROADCAST_SECONDS = metrics.histogram("game_broadcast_duration_seconds", "Time to queue one broadcast on every socket of a room")
+BROADCAST_FANOUT = metrics.histogram("game_broadcast_fanout", "Sockets one broadcast was queued on",
+                                     buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+SENT_FRAMES = metrics.counter("game_sent_frames_total", "Frames written to websockets")
+SENT_BYTES = metrics.counter("game_sent_bytes_total", "Bytes written to websockets")
+SEND_FAILURES = metrics.counter("game_send_failures_total", "Websocket writes that failed")
+DROPPED_FRAMES = metrics.counter("game_dropped_frames_total", "Queued frames superseded for clients that fell behind")
+SLOW_CONSUMERS = metrics.counter("game_slow_consumer_disconnects_total", "Clients disconnected for falling behind")
+HEARTBEAT_EVICTIONS = metrics.counter("game_heartbeat_evictions_total", "Clients disconnected for not answering pings")
+COMPRESS_SECONDS = metrics.histogram("game_compression_duration_seconds", "Time to deflate one frame (once, however many sockets get it)")
+COMPRESS_IN_BYTES = metrics.counter("game_compression_input_bytes_total", "Bytes of frames deflated")
+COMPRESS_OUT_BYTES = metrics.counter("game_compression_output_bytes_total", "Bytes those frames deflated to")
+LOOP_LAG = metrics.histogram("game_event_loop_lag_seconds", "How late the event loop woke the lag probe")
+# A distribution of the current rooms, so a gauge rather than a histogram that would have
+# to start over at every scrape; histogram_quantile() still works on its le label
+ROOM_SOCKETS = metrics.gauge("game_rooms_by_sockets", "Rooms with at most le sockets, as of the scrape", labelnames=["le"])
+ROOM_SOCKETS_BOUNDS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+metrics.gauge("game_rooms", "Rooms held by this process", lambda: len(rooms))
+metrics.gauge("game_players_connected", "Connected players, not counting viewers", lambda: sum(room.playing_count for room in rooms.values()))
+metrics.gauge("game_viewers_connected", "Connected viewers", lambda: sum(room.viewers_count for room in rooms.values()))
+metrics.gauge("game_lobby_subscribers", "Sockets on the lobby stream", lambda: len(lobby.subscribers))
+metrics.gauge("game_round_timers", "Rounds with a pending deadline", lambda: len(round_timers))
+metrics.gauge("game_profiler_sample_rate", "Fraction of room actions being profiled", lambda: profiler.sample_rate)
+metrics.gauge("game_compression_ratio", "Input over output bytes of deflated frames so far",
+              lambda: COMPRESS_IN_BYTES.labels().value / (COMPRESS_OUT_BYTES.labels().value or 1))
+
+@metrics.on_collect
+def collect_room_sockets():
+    counts = [0] * (len(ROOM_SOCKETS_BOUNDS) + 1)
+    for connections in room_connections.values():
+        counts[bisect_left(ROOM_SOCKETS_BOUNDS, len(connections))] += 1
+    cumulative = 0
+    for bound, count in zip([str(bound) for bound in ROOM_SOCKETS_BOUNDS] + ["+Inf"], counts):
+        cumulative += count
+        ROOM_SOCKETS.labels(bound).set(cumulative)
+
 def get_room_name(room_id: int) -> str:
     """Get room name with fallback to default if not found"""
-    return ROOM_NAMES.get(room_id, f"חדר {room_id}")
+    return registry.names.get(room_id) or ROOM_NAMES.get(room_id, f"חדר {room_id}")
 
 # Game State Management
-class Player(BaseModel):
-    player_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    nickname: str
-    is_admin: bool = False
-    is_viewer: bool = False  # True if player is viewing only, not participating
-    number: Optional[Union[int, float]] = None
-    connected: bool = True
-
-class GameRound(BaseModel):
-    round_number: int
-    players_data: Dict[str, Union[int, float]]  # nickname -> number (can be int or float)
-    total_sum: float
-    average: float
-    target_number: float
-    winner: str
-    timestamp: str
-
-class RoomState(BaseModel):
-    room_id: int
-    players: Dict[str, Player] = {}  # nickname -> Player
-    game_status: str = "waiting"  # waiting, choosing, results
-    current_round: int = 0
-    game_history: List[GameRound] = []
-    multiplier: float = 0.8  # Configurable multiplier (0.1 to 1.9)
-    force_finish_called: bool = False  # Track if force_finish was called this round
-
-# In-memory storage for 4 rooms
-rooms: Dict[int, RoomState] = {
-    1: RoomState(room_id=1),
-    2: RoomState(room_id=2),
-    3: RoomState(room_id=3),
-    4: RoomState(room_id=4)
-}
+# Runtime state is plain slotted objects, mutated on every message - pydantic is
+# kept for request bodies at the API edge
+class Player:
+    __slots__ = ("player_id", "nickname", "is_admin", "is_viewer", "number", "connected")
+    
+    def __init__(self, nickname: str, player_id: Optional[str] = None, is_admin: bool = False,
+                 is_viewer: bool = False, number: Optional[Union[int, float]] = None, connected: bool = True):
+        self.player_id = player_id or str(uuid.uuid4())
+        self.nickname = nickname
+        self.is_admin = is_admin
+        self.is_viewer = is_viewer  # True if player is viewing only, not participating
+        self.number = number
+        self.connected = connected
 
-# Separate WebSocket connections storage
-room_connections: Dict[int, Dict[str, WebSocket]] = {
-    1: {},
-    2: {},
-    3: {},
-    4: {}
+class GameRound:
+    """A finished round - never changes once recorded, so its dict form is built once"""
+    __slots__ = ("round_number", "players_data", "total_sum", "average", "target_number",
+                 "winner", "timestamp", "top_players", "_dict")
+    
+    def __init__(self, round_number: int, players_data: Dict[str, Union[int, float]], total_sum: float,
+                 average: float, target_number: float, winner: Optional[str], timestamp: str,
+                 top_players: Optional[List[str]] = None):
+        self.round_number = round_number
+        self.players_data = players_data  # nickname -> number (can be int or float)
+        self.total_sum = total_sum
+        self.average = average
+        self.target_number = target_number
+        self.winner = winner
+        self.timestamp = timestamp
+        self.top_players = top_players  # closest ROUND_TOP_K nicknames, when enabled
+        self._dict: Optional[dict] = None
+    
+    def to_dict(self) -> dict:
+        """JSON form for clients and the event log; treat it as read-only, it is shared"""
+        if self._dict is None:
+            self._dict = {
+                "round_number": self.round_number,
+                "players_data": self.players_data,
+                "total_sum": self.total_sum,
+                "average": self.average,
+                "target_number": self.target_number,
+                "winner": self.winner,
+                "timestamp": self.timestamp,
+            }
+            if self.top_players is not None:
+                self._dict["top_players"] = self.top_players
+        return self._dict
+
+class RoomStats:
+    """Running totals over a room's rounds since its history was last cleared.
+    
+    Each finished round adds to them once, so stats queries never rescan
+    game_history (which also keeps only HISTORY_MAX_ROUNDS rounds). The ranked
+    player table is built on the first query after a round and reused until the next.
+    """
+    __slots__ = ("rounds", "target_sum", "target_min", "target_max", "trend_sums", "pick_sum", "picks",
+                 "players", "_table")
+    changes = 0  # across all rooms - the cross-room stats are rebuilt when it moves
+    
+    def __init__(self):
+        RoomStats.changes += 1
+        self.rounds = 0
+        self.target_sum = 0.0
+        self.target_min: Optional[float] = None
+        self.target_max: Optional[float] = None
+        # Least-squares sums of target over round number: n is rounds, then x, y, xy, xx
+        self.trend_sums = [0.0, 0.0, 0.0, 0.0]
+        self.pick_sum = 0.0
+        self.picks = 0
+        # nickname -> [rounds played, wins, sum of picks, sum of distances to the target], in first-seen order
+        self.players: Dict[str, List[float]] = {}
+        self._table: Optional[List[dict]] = None
+    
+    def record(self, game_round: GameRound):
+        target = game_round.target_number
+        self.rounds += 1
+        self.target_sum += target
+        self.target_min = target if self.target_min is None else min(self.target_min, target)
+        self.target_max = target if self.target_max is None else max(self.target_max, target)
+        x = game_round.round_number
+        sums = self.trend_sums
+        sums[0] += x
+        sums[1] += target
+        sums[2] += x * target
+        sums[3] += x * x
+        players = self.players
+        for nickname, number in game_round.players_data.items():
+            if number is None:
+                continue
+            totals = players.get(nickname)
+            if totals is None:
+                totals = players[nickname] = [0, 0, 0.0, 0.0]
+            totals[0] += 1
+            totals[2] += number
+            totals[3] += abs(number - target)
+            self.pick_sum += number
+            self.picks += 1
+        if game_round.winner in players:
+            players[game_round.winner][1] += 1
+        self._table = None
+        RoomStats.changes += 1
+    
+    @property
+    def trend(self) -> Optional[float]:
+        """How much the target moves per round, as a least-squares slope; None under two rounds"""
+        x, y, xy, xx = self.trend_sums
+        n = self.rounds
+        spread = n * xx - x * x
+        if n < 2 or spread == 0:
+            return None
+        return (n * xy - x * y) / spread
+    
+    def table(self) -> List[dict]:
+        """Players ranked by wins, then win rate, then closeness to the target (ties by first round played)"""
+        if self._table is None:
+            if np is not None and len(self.players) >= VECTORIZE_MIN_PLAYERS:
+                self._table = self._ranked_vectorized()
+            else:
+                self._table = self._ranked()
+        return self._table
+    
+    def _ranked(self) -> List[dict]:
+        rows = [(nickname, played, wins, wins / played, pick_sum / played, distance_sum / played)
+                for nickname, (played, wins, pick_sum, distance_sum) in self.players.items()]
+        rows.sort(key=lambda row: (-row[2], -row[3], row[5]))  # stable, so first-seen order breaks ties
+        return [player_stats(*row) for row in rows]
+    
+    def _ranked_vectorized(self) -> List[dict]:
+        nicknames = list(self.players)
+        totals = np.array(list(self.players.values()), dtype=np.float64)
+        played, wins = totals[:, 0], totals[:, 1]
+        win_rates = wins / played
+        average_picks = totals[:, 2] / played
+        average_distances = totals[:, 3] / played
+        order = np.lexsort((np.arange(len(nicknames)), average_distances, -win_rates, -wins))
+        return [
+            player_stats(nicknames[i], int(played[i]), int(wins[i]), float(win_rates[i]),
+                         float(average_picks[i]), float(average_distances[i]))
+            for i in order.tolist()
+        ]
+    
+    def to_dict(self, limit: int) -> dict:
+        trend = self.trend
+        return {
+            "rounds": self.rounds,
+            "average_target": round(self.target_sum / self.rounds, 2) if self.rounds else None,
+            "min_target": self.target_min,
+            "max_target": self.target_max,
+            "target_trend": round(trend, 4) if trend is not None else None,
+            "average_pick": round(self.pick_sum / self.picks, 2) if self.picks else None,
+            "player_total": len(self.players),
+            "players": self.table()[:limit],
+        }
+    
+    def to_snapshot(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "target_sum": self.target_sum,
+            "target_min": self.target_min,
+            "target_max": self.target_max,
+            "trend_sums": list(self.trend_sums),
+            "pick_sum": self.pick_sum,
+            "picks": self.picks,
+            "players": {nickname: list(totals) for nickname, totals in self.players.items()},
+        }
+    
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "RoomStats":
+        stats = cls()
+        for key, value in data.items():
+            setattr(stats, key, value)
+        return stats
+    
+    @classmethod
+    def from_rounds(cls, rounds: List[GameRound]) -> "RoomStats":
+        stats = cls()
+        for game_round in rounds:
+            stats.record(game_round)
+        return stats
+
+def player_stats(nickname: str, played: int, wins: int, win_rate: float, average_pick: float, average_distance: float) -> dict:
+    return {
+        "nickname": nickname,
+        "rounds": played,
+        "wins": wins,
+        "win_rate": round(win_rate, 4),
+        "average_pick": round(average_pick, 2),
+        "average_distance": round(average_distance, 2),
+    }
+
+class RoomState:
+    __slots__ = ("room_id", "players", "game_status", "current_round", "game_history", "rounds_recorded",
+                 "stats", "multiplier", "force_finish_called", "round_timeout", "round_deadline",
+                 "_connected", "_playing_count", "_chosen_count", "_admin")
+    
+    def __init__(self, room_id: int, game_status: str = "waiting", current_round: int = 0,
+                 game_history: Optional[List[GameRound]] = None, rounds_recorded: int = 0,
+                 multiplier: float = 0.8, force_finish_called: bool = False, round_timeout: float = ROUND_TIMEOUT):
+        self.room_id = room_id
+        self.players: Dict[str, Player] = {}  # nickname -> Player
+        self.game_status = game_status  # waiting, choosing, results
+        self.current_round = current_round
+        self.game_history: List[GameRound] = game_history if game_history is not None else []  # oldest first, at most HISTORY_MAX_ROUNDS
+        self.rounds_recorded = rounds_recorded  # rounds added since the history was last cleared
+        self.stats = RoomStats()  # totals over those rounds, for the stats API
+        self.multiplier = multiplier  # Configurable multiplier (0.1 to 1.9)
+        self.force_finish_called = force_finish_called  # Track if force_finish was called this round
+        self.round_timeout = round_timeout  # seconds, 0 for no limit
+        self.round_deadline: Optional[float] = None  # epoch seconds the current round is force-finished at
+        
+        # Incremental indexes over players, kept up to date by the mutation methods
+        # below so readiness and admin checks never scan the whole room
+        self._connected: Dict[str, None] = {}  # connected nicknames, in join order
+        self._playing_count = 0  # connected non-viewers
+        self._chosen_count = 0  # connected non-viewers with a number
+        self._admin: Optional[str] = None
+    
+    @property
+    def connected_count(self) -> int:
+        return len(self._connected)
+    
+    @property
+    def playing_count(self) -> int:
+        return self._playing_count
+    
+    @property
+    def viewers_count(self) -> int:
+        return len(self._connected) - self._playing_count
+    
+    @property
+    def chosen_count(self) -> int:
+        return self._chosen_count
+    
+    @property
+    def admin(self) -> Optional[str]:
+        return self._admin
+    
+    @property
+    def all_chosen(self) -> bool:
+        """Every connected playing player (not viewers) has chosen"""
+        return self._playing_count > 0 and self._chosen_count == self._playing_count
+    
+    @property
+    def has_playing_admin(self) -> bool:
+        return self._admin is not None and not self.players[self._admin].is_viewer
+    
+    def _track(self, player: Player, sign: int):
+        # Add (+1) or remove (-1) a player's contribution to the indexes
+        if not player.connected:
+            return
+        if sign > 0:
+            self._connected[player.nickname] = None
+        else:
+            self._connected.pop(player.nickname, None)
+        if player.is_viewer:
+            return
+        self._playing_count += sign
+        if player.number is not None:
+            self._chosen_count += sign
+    
+    def add_player(self, player: Player):
+        if player.nickname in self.players:
+            self.remove_player(player.nickname)
+        record_event(self.room_id, "player_joined", nickname=player.nickname, player_id=player.player_id, is_viewer=player.is_viewer)
+        self.players[player.nickname] = player
+        self._track(player, 1)
+        if player.connected and self._admin is None:
+            self.set_admin(player.nickname)
+        lobby.changed(self.room_id)
+    
+    def remove_player(self, nickname: str):
+        record_event(self.room_id, "player_left", nickname=nickname)
+        player = self.players.pop(nickname)
+        self._track(player, -1)
+        if self._admin == nickname:
+            self._admin = None
+            self.elect_admin()
+        lobby.changed(self.room_id)
+    
+    def set_connected(self, nickname: str, connected: bool):
+        player = self.players[nickname]
+        if player.connected == connected:
+            return
+        self._track(player, -1)
+        player.connected = connected
+        self._track(player, 1)
+        if connected and self._admin is None:
+            self.set_admin(nickname)
+        elif not connected and self._admin == nickname:
+            # Admin left - promote the longest-connected player
+            self.elect_admin()
+        lobby.changed(self.room_id)
+    
+    def set_number(self, nickname: str, number: Optional[Union[int, float]]):
+        record_event(self.room_id, "number_chosen", nickname=nickname, number=number)
+        player = self.players[nickname]
+        self._track(player, -1)
+        player.number = number
+        self._track(player, 1)
+    
+    def reset_numbers(self):
+        for player in self.players.values():
+            player.number = None
+        self._chosen_count = 0
+    
+    def start_round(self):
+        record_event(self.room_id, "round_started")
+        self.game_status = "choosing"
+        lobby.changed(self.room_id)
+        self.current_round += 1
+        self.force_finish_called = False  # Reset flag for new round
+        self.reset_numbers()
+        self.start_deadline()
+    
+    def start_deadline(self):
+        if self.round_timeout > 0:
+            round_timers.schedule(self.room_id, self.round_timeout, self.current_round)
+            self.round_deadline = time.time() + self.round_timeout
+    
+    def clear_deadline(self):
+        round_timers.cancel(self.room_id)
+        self.round_deadline = None
+    
+    def stop_game(self):
+        record_event(self.room_id, "game_stopped")
+        self.game_status = "waiting"
+        lobby.changed(self.room_id)
+        self.reset_numbers()
+        self.clear_deadline()
+    
+    def set_multiplier(self, multiplier: float):
+        record_event(self.room_id, "multiplier_set", multiplier=multiplier)
+        self.multiplier = multiplier
+    
+    def set_round_timeout(self, seconds: float):
+        """Applies from the next round"""
+        record_event(self.room_id, "round_timeout_set", seconds=seconds)
+        self.round_timeout = seconds
+    
+    def force_finish(self):
+        """No more choices are accepted this round"""
+        record_event(self.room_id, "force_finish")
+        self.force_finish_called = True
+    
+    def finish_round(self, game_round: GameRound):
+        record_event(self.room_id, "round_finished", archived=True, round=game_round.to_dict())
+        self.add_round(game_round)
+        self.game_status = "results"
+        lobby.changed(self.room_id)
+        self.clear_deadline()
+    
+    def add_round(self, game_round: GameRound):
+        self.game_history.append(game_round)
+        self.rounds_recorded += 1
+        self.stats.record(game_round)
+        if len(self.game_history) > HISTORY_MAX_ROUNDS:
+            del self.game_history[:len(self.game_history) - HISTORY_MAX_ROUNDS]
+    
+    def clear_history(self):
+        record_event(self.room_id, "history_cleared")
+        # A new list tells send_room_state to reset clients' history
+        self.game_history = []
+        self.rounds_recorded = 0
+        self.stats = RoomStats()
+    
+    def history_page(self, before: Optional[int], limit: int) -> List[GameRound]:
+        """Up to limit rounds older than round number before (newest if None), oldest first"""
+        end = len(self.game_history) if before is None else bisect_left(self.game_history, before, key=lambda r: r.round_number)
+        return self.game_history[max(end - limit, 0):end]
+    
+    def to_snapshot(self) -> dict:
+        """Durable part of the room - connections and admin are not restored"""
+        return {
+            "room_id": self.room_id,
+            "room_name": registry.names.get(self.room_id),
+            "game_status": self.game_status,
+            "current_round": self.current_round,
+            "multiplier": self.multiplier,
+            "force_finish_called": self.force_finish_called,
+            "round_timeout": self.round_timeout,
+            "rounds_recorded": self.rounds_recorded,
+            "game_history": [h.to_dict() for h in self.game_history],
+            "stats": self.stats.to_snapshot(),
+            "players": [
+                {"nickname": p.nickname, "player_id": p.player_id, "is_viewer": p.is_viewer, "number": p.number}
+                for p in self.players.values()
+            ],
+        }
+    
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "RoomState":
+        room = cls(
+            room_id=data["room_id"],
+            game_status=data["game_status"],
+            current_round=data["current_round"],
+            multiplier=data["multiplier"],
+            force_finish_called=data["force_finish_called"],
+            rounds_recorded=data["rounds_recorded"],
+            game_history=[GameRound(**h) for h in data["game_history"]],
+            round_timeout=data.get("round_timeout", ROUND_TIMEOUT),
+        )
+        if "stats" in data:
+            room.stats = RoomStats.from_snapshot(data["stats"])
+        else:
+            # Snapshots from before stats were kept - count what history is left
+            room.stats = RoomStats.from_rounds(room.game_history)
+        # Restored players wait for their owners to reconnect
+        for p in data["players"]:
+            room.add_player(Player(connected=False, **p))
+        # A round that was being played gets a full deadline from now
+        if room.game_status == "choosing":
+            room.start_deadline()
+        return room
+    
+    def set_admin(self, nickname: str):
+        """Make nickname the one and only admin"""
+        if self._admin is not None and self._admin in self.players:
+            self.players[self._admin].is_admin = False
+        self._admin = nickname
+        self.players[nickname].is_admin = True
+    
+    def elect_admin(self):
+        if self._admin is not None and self._admin in self.players:
+            self.players[self._admin].is_admin = False
+        self._admin = None
+        for nickname in self._connected:
+            self.set_admin(nickname)
+            break
+
+# Outbound queue bound per connection and what to do when a client can't keep up:
+# "latest" drops queued states and keeps only the newest (a client still twice the bound
+# behind with nothing to collapse is dropped), "disconnect" drops the client
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "latest")
+# Every HEARTBEAT_INTERVAL seconds one sweep pings sockets that have been quiet that long and
+# drops those quiet for over HEARTBEAT_TIMEOUT, through the usual disconnect. 0 disables it.
+# The ping is a message ({"type":"ping"}, answered with {"action":"pong"}): ASGI keeps
+# websocket control frames from the app, and a half-open socket never fails a queued send.
+# Only clients that have answered a ping are dropped - older ones never will, and a player
+# waiting in the lobby sends nothing. Those are left to uvicorn's protocol-level pings
+# (--ws-ping-interval / --ws-ping-timeout).
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "15"))
+HEARTBEAT_TIMEOUT = float(os.getenv("HEARTBEAT_TIMEOUT", "45"))
+
+# Token-bucket limits on client actions, as (actions per second, burst): each connection has a
+# bucket per action, and each room one per action shared by all its connections (so reconnecting
+# doesn't reset an admin's budget). Over a limit, actions that only set a value are held - the
+# latest one is applied once the bucket refills - and anything else is dropped.
+# RATE_LIMIT_SCALE multiplies every rate and burst; 0 turns limiting off.
+RATE_LIMIT_SCALE = float(os.getenv("RATE_LIMIT_SCALE", "1"))
+CONNECTION_ACTION_LIMITS = {
+    "sync": (2, 4),
+    "start_game": (1, 3),
+    "choose_number": (4, 8),
+    "new_round": (1, 3),
+    "stop_game": (1, 3),
+    "clear_history": (1, 3),
+    "set_multiplier": (2, 4),
+    "set_round_timeout": (2, 4),
+    "remove_player": (5, 10),
+    "force_finish_round": (1, 3),
+    "unknown": (2, 4),
+}
+ROOM_ACTION_LIMITS = {
+    "sync": (100, MAX_PLAYERS_PER_ROOM),
+    "start_game": (2, 4),
+    "choose_number": (MAX_PLAYERS_PER_ROOM, MAX_PLAYERS_PER_ROOM),  # every player choosing at once is normal
+    "new_round": (2, 4),
+    "stop_game": (2, 4),
+    "clear_history": (2, 4),
+    "set_multiplier": (4, 8),
+    "set_round_timeout": (4, 8),
+    "remove_player": (10, 20),
+    "force_finish_round": (2, 4),
+    "unknown": (20, 40),
 }
+HELD_ACTIONS = frozenset({"sync", "choose_number", "set_multiplier", "set_round_timeout"})
+
+# Message types that are superseded by any newer full room_state
+STATE_MESSAGE_TYPES = ("room_state", "room_patch")
+
+# Websocket subprotocol a client offers to get binary MessagePack frames instead of JSON text.
+# Keys listed in WIRE_KEYS go out as their index; a socket's first frame is
+# {"type": "wire_keys", "keys": WIRE_KEYS} so clients never hard-code the list.
+# Text frames (e.g. a refusal before the connection is set up) are still JSON.
+MSGPACK_SUBPROTOCOL = "msgpack.v1"
+# Websocket subprotocol for JSON with frames of at least WS_COMPRESS_MIN_BYTES sent as binary
+# raw DEFLATE frames. Each frame is compressed once and the bytes are shared by every socket,
+# unlike transport permessage-deflate, which compresses per socket.
+DEFLATE_SUBPROTOCOL = "deflate.v1"
+WS_COMPRESS_MIN_BYTES = int(os.getenv("WS_COMPRESS_MIN_BYTES", "512"))
+WS_COMPRESS_LEVEL = int(os.getenv("WS_COMPRESS_LEVEL", "1"))  # 1 is ~4x faster than 6 for ~20% larger frames
+WIRE_KEYS = [
+    "type", "room_id", "version", "base_version", "players", "player_id", "nickname", "is_admin",
+    "has_chosen", "number", "connected", "viewers_count", "game_status", "current_round", "multiplier",
+    "history_total", "history_limit", "game_history", "set", "remove", "upsert", "order", "history_reset",
+    "history_append", "round_number", "players_data", "total_sum", "average", "target_number", "winner",
+    "timestamp", "top_players", "message", "action", "rooms", "removed", "room_name", "player_count",
+    "round_timeout", "round_deadline",
+]
+WIRE_KEY_INDEX = {key: index for index, key in enumerate(WIRE_KEYS)}
+
+# Values that are data keyed by nickname, sent as they are
+WIRE_DATA_KEYS = frozenset({"players_data"})
+
+def compact_keys(value):
+    # Only string keys are ever sent, so an int key always means a WIRE_KEYS index
+    if isinstance(value, list):
+        return [compact_keys(v) if isinstance(v, (dict, list)) else v for v in value]
+    compacted = {}
+    for k, v in value.items():
+        if isinstance(v, (dict, list)) and k not in WIRE_DATA_KEYS:
+            v = compact_keys(v)
+        compacted[WIRE_KEY_INDEX.get(k, k)] = v
+    return compacted
+
+def expand_keys(value):
+    if isinstance(value, dict):
+        return {(WIRE_KEYS[k] if isinstance(k, int) else k): expand_keys(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [expand_keys(v) for v in value]
+    return value
+
+def pack_message(message: dict) -> bytes:
+    """Serialize a message to a binary MessagePack frame with compacted keys"""
+    return msgpack.packb(compact_keys(message))
+
+def unpack_message(data: bytes) -> dict:
+    return expand_keys(msgpack.unpackb(data, strict_map_key=False))
+
+# Sent with plain keys, ahead of everything else on a MessagePack socket
+WIRE_KEYS_FRAME = msgpack.packb({"type": "wire_keys", "keys": WIRE_KEYS}) if msgpack is not None else b""
+
+def deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(WS_COMPRESS_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)  # raw, no zlib header
+    return compressor.compress(data) + compressor.flush()
+
+def wire_subprotocol(websocket: WebSocket) -> Optional[str]:
+    """The first wire format subprotocol the client offered that is available, None for plain JSON"""
+    for subprotocol in websocket.scope.get("subprotocols", ()):
+        if subprotocol == DEFLATE_SUBPROTOCOL or (subprotocol == MSGPACK_SUBPROTOCOL and msgpack is not None):
+            return subprotocol
+    return None
+
+async def receive_action(websocket: WebSocket) -> dict:
+    """The next client message - a JSON text frame, or a MessagePack binary one"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        if msgpack is None:
+            raise ValueError("Binary frame but msgpack is not installed")
+        return unpack_message(message["bytes"])
+    return decode_message(message["text"])
+
+def decode_message(data: Union[str, bytes]) -> dict:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def encode_message(message: dict) -> str:
+    """Serialize a message to the text of a websocket frame"""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+class Frame:
+    """A message encoded at most once and shared by every connection it is queued on"""
+    __slots__ = ("type", "message", "_text", "_size", "_packed", "_deflated")
+    
+    def __init__(self, message: dict):
+        self.type = message.get("type")
+        self.message = message
+        self._text: Optional[str] = None
+        self._size: Optional[int] = None
+        self._packed: Optional[bytes] = None
+        self._deflated: Optional[bytes] = None
+    
+    @classmethod
+    def from_text(cls, frame_type: Optional[str], text: str) -> "Frame":
+        """A frame that arrived already encoded, e.g. relayed from another shard"""
+        frame = cls.__new__(cls)
+        frame.type = frame_type
+        frame.message = None
+        frame._text = text
+        frame._size = None
+        frame._packed = None
+        frame._deflated = None
+        return frame
+    
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = encode_message(self.message)
+        return self._text
+    
+    @property
+    def size(self) -> int:
+        """Encoded length in bytes"""
+        if self._size is None:
+            self._size = len(self.text.encode())
+        return self._size
+    
+    @property
+    def packed(self) -> bytes:
+        """The MessagePack form, for clients that negotiated MSGPACK_SUBPROTOCOL"""
+        if self._packed is None:
+            message = self.message if self.message is not None else decode_message(self._text)
+            self._packed = pack_message(message)
+        return self._packed
+    
+    @property
+    def deflated(self) -> bytes:
+        """The JSON text compressed with raw DEFLATE, for clients that negotiated DEFLATE_SUBPROTOCOL"""
+        if self._deflated is None:
+            started = time.perf_counter()
+            self._deflated = deflate(self.text.encode())
+            COMPRESS_SECONDS.observe(time.perf_counter() - started)
+            COMPRESS_IN_BYTES.inc(self.size)
+            COMPRESS_OUT_BYTES.inc(len(self._deflated))
+        return self._deflated
+
+PING_FRAME = Frame({"type": "ping"})
+PONG_MESSAGE = {"action": "pong"}
+
+class ClientConnection:
+    """A websocket with its own outbound queue, drained by a dedicated writer task"""
+    def __init__(self, websocket: WebSocket, room_id: int, nickname: str, full_state: bool = False, wire: Optional[str] = None):
+        self.websocket = websocket
+        self.room_id = room_id
+        self.nickname = nickname
+        self.full_state = full_state  # Opted in to a full room_state on every change (old protocol)
+        self.wire = wire  # Negotiated wire format subprotocol, None for plain JSON
+        self.awaiting_snapshot = True  # Needs a full snapshot before it can apply patches
+        self.last_seen = time.monotonic()  # When the client last sent anything
+        self.answers_pings = False  # Has answered a heartbeat ping, so going quiet means it is gone
+        self.buckets: Dict[str, TokenBucket] = {}  # action -> this connection's rate limit
+        self.held: Dict[str, dict] = {}  # action -> latest message held back by the rate limit
+        self.queue: Deque[Frame] = deque()
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.writer = asyncio.create_task(self._write_loop())
+    
+    def send(self, frame: Frame, snapshot: Optional[Frame] = None) -> bool:
+        """Queue a frame without waiting; returns False if the client is too slow to keep"""
+        if self.closed:
+            return True
+        if len(self.queue) >= SEND_QUEUE_SIZE:
+            if SLOW_CONSUMER_POLICY == "disconnect":
+                return False
+            if snapshot is None and frame.type == "room_state":
+                snapshot = frame
+            if snapshot is not None:
+                # Keep only the latest state - queued states and patches are all superseded by it
+                queued = len(self.queue)
+                self.queue = deque(f for f in self.queue if f.type not in STATE_MESSAGE_TYPES)
+                DROPPED_FRAMES.inc(queued - len(self.queue))
+                frame = snapshot
+            elif len(self.queue) >= 2 * SEND_QUEUE_SIZE:
+                # Nothing to collapse into (a ping, a relayed patch) - queued patches must not
+                # be lost, so past twice the bound the client is too slow to keep
+                return False
+        self.queue.append(frame)
+        self.wakeup.set()
+        return True
+    
+    async def _write_loop(self):
+        try:
+            if self.wire == MSGPACK_SUBPROTOCOL:
+                await self.websocket.send_bytes(WIRE_KEYS_FRAME)
+            while True:
+                while not self.queue:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                frame = self.queue.popleft()
+                if self.wire == MSGPACK_SUBPROTOCOL:
+                    data = frame.packed
+                    await self.websocket.send_bytes(data)
+                    SENT_BYTES.inc(len(data))
+                elif self.wire == DEFLATE_SUBPROTOCOL and frame.size >= WS_COMPRESS_MIN_BYTES:
+                    data = frame.deflated
+                    await self.websocket.send_bytes(data)
+                    SENT_BYTES.inc(len(data))
+                else:
+                    await self.websocket.send_text(frame.text)
+                    SENT_BYTES.inc(frame.size)
+                SENT_FRAMES.inc()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            SEND_FAILURES.inc()
+            logger.error(f"Error sending to {self.nickname}: {e}")
+            if not self.closed:
+                self.lost()
+    
+    def received(self, data: dict) -> bool:
+        """Note that the client is alive; False for a heartbeat pong, which is not an action"""
+        self.last_seen = time.monotonic()
+        if data == PONG_MESSAGE:
+            self.answers_pings = True
+            return False
+        return True
+    
+    def lost(self):
+        """The client went away without its receive loop noticing"""
+        manager.disconnect(self.room_id, self.nickname, connection=self)
+    
+    def close(self, drop_socket: bool = False):
+        """Stop the writer; optionally close the socket so its receive loop ends too"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        if drop_socket:
+            asyncio.create_task(self._close_socket())
+    
+    async def _close_socket(self):
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+# choose_number bursts inside this window (ms) go out as a single broadcast, 0 disables
+BROADCAST_COALESCE_MS = float(os.getenv("BROADCAST_COALESCE_MS", "30"))
+
+# Viewers get a full room_state at most VIEWER_MAX_UPDATES_PER_SEC times a second (the latest
+# one wins; game_status changes such as results go out at once), without player ids and with
+# only the last VIEWER_HISTORY_ROUNDS rounds. 0 sends viewers every update, like players.
+VIEWER_MAX_UPDATES_PER_SEC = float(os.getenv("VIEWER_MAX_UPDATES_PER_SEC", "2"))
+VIEWER_HISTORY_ROUNDS = int(os.getenv("VIEWER_HISTORY_ROUNDS", "5"))
+
+# room_id -> task that will broadcast the coalesced state
+pending_broadcasts: Dict[int, asyncio.Task] = {}
+
+# What an action needs broadcast afterwards, in increasing urgency
+NO_BROADCAST = 0
+COALESCED_BROADCAST = 1  # choose_number - may wait for the coalescing window
+IMMEDIATE_BROADCAST = 2
+
+class RoomActor:
+    """Applies a room's inbound actions in arrival order, one batch at a time.
+    
+    Everything queued while the previous batch ran is applied together and
+    followed by a single broadcast, so handlers never interleave. An action
+    needing an immediate broadcast (results, a new round) ends its part of
+    the batch, so clients see that state before the next action changes it.
+    """
+    def __init__(self, room_id: int):
+        self.room_id = room_id
+        self.inbox: Deque[tuple] = deque()
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+    
+    def submit(self, handler, *args):
+        """Queue handler(room_id, *args), which returns the broadcast it needs"""
+        self.inbox.append((handler, args))
+        self.wakeup.set()
+    
+    async def _run(self):
+        while True:
+            while not self.inbox:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            batch, self.inbox = self.inbox, deque()
+            broadcast = NO_BROADCAST
+            for handler, args in batch:
+                label = action_label(handler, args)
+                started = time.perf_counter()
+                try:
+                    if profiler.sample():
+                        result = profiler.run(label, handler, self.room_id, *args)
+                    else:
+                        result = handler(self.room_id, *args)
+                    broadcast = max(broadcast, result)
+                except Exception as e:
+                    ACTION_ERRORS.labels(label).inc()
+                    logger.error(f"Error handling {label} in room {self.room_id}: {e}")
+                ACTION_SECONDS.labels(label).observe(time.perf_counter() - started)
+                if broadcast == IMMEDIATE_BROADCAST:
+                    await self._broadcast(broadcast)
+                    broadcast = NO_BROADCAST
+            await self._broadcast(broadcast)
+    
+    async def _broadcast(self, broadcast: int):
+        # A failing broadcast must not end the actor, or the room stops handling actions
+        try:
+            if broadcast == IMMEDIATE_BROADCAST:
+                await send_room_state(self.room_id)
+            elif broadcast == COALESCED_BROADCAST:
+                await schedule_room_state(self.room_id)
+        except Exception as e:
+            ACTION_ERRORS.labels("broadcast").inc()
+            logger.error(f"Error broadcasting room {self.room_id}: {e}")
+    
+    def stop(self):
+        self.task.cancel()
+
+# Round deadlines of every room; an expired one is applied by the room's actor like any action
+round_timers = TimerWheel(lambda room_id, round_number: registry.submit(room_id, expire_round, round_number),
+                          tick=ROUND_TIMER_TICK)
+
+class RoomSync:
+    """Last state broadcast to a room, used to build room_patch deltas"""
+    def __init__(self):
+        self.version = 0
+        self.fields: dict = {}
+        self.players: Dict[str, dict] = {}  # nickname -> player entry, in broadcast order
+        self.history: Deque[dict] = deque(maxlen=max(HISTORY_INLINE_ROUNDS, 0))  # dumped inline rounds
+        self.history_source: Optional[List[GameRound]] = None  # room.game_history the dump belongs to
+        self.rounds_seen = 0  # room.rounds_recorded at the last broadcast
+        # Throttled viewer tier - see ConnectionManager.feed_viewers
+        self.viewer_state: Optional[dict] = None  # latest state viewers were not sent yet
+        self.viewer_status: Optional[str] = None  # game_status viewers last got
+        self.viewer_sent_at = 0.0
+        self.viewer_flush: Optional[asyncio.TimerHandle] = None
+        self.new_viewers: List[ClientConnection] = []  # waiting for their first state
+
+class RoomRegistry:
+    """All live rooms keyed by id - permanent rooms plus rooms created on demand"""
+    def __init__(self, permanent_names: Dict[int, str]):
+        self.rooms: Dict[int, RoomState] = {}
+        self.connections: Dict[int, Dict[str, ClientConnection]] = {}
+        # The same sockets split by delivery tier: every update, or throttled viewers
+        self.player_connections: Dict[int, Dict[str, ClientConnection]] = {}
+        self.viewer_connections: Dict[int, Dict[str, ClientConnection]] = {}
+        self.sync: Dict[int, RoomSync] = {}
+        self.buckets: Dict[int, Dict[str, TokenBucket]] = {}  # room -> action -> rate limit shared by its connections
+        self.names: Dict[int, str] = {}
+        self.last_active: Dict[int, float] = {}
+        self.actors: Dict[int, RoomActor] = {}  # started on a room's first action
+        self.permanent = set(permanent_names)
+        self.ordered_ids: List[int] = []  # sorted, for cursor pagination
+        for room_id in permanent_names:
+            self.create(room_id)
+    
+    def create(self, room_id: int, name: Optional[str] = None) -> RoomState:
+        record_event(room_id, "room_created", name=name)
+        if room_id in self.rooms:
+            self.remove(room_id)
+        room = RoomState(room_id=room_id)
+        self.rooms[room_id] = room
+        self.connections[room_id] = {}
+        self.player_connections[room_id] = {}
+        self.viewer_connections[room_id] = {}
+        self.sync[room_id] = RoomSync()
+        self.buckets[room_id] = {}
+        if name:
+            self.names[room_id] = name
+        self.last_active[room_id] = time.monotonic()
+        insort(self.ordered_ids, room_id)
+        lobby.changed(room_id)
+        return room
+    
+    def get_or_create(self, room_id: int) -> Optional[RoomState]:
+        """Return the room, creating it on first use; None if the id or capacity is out of range"""
+        room = self.rooms.get(room_id)
+        if room is not None:
+            return room
+        if not 1 <= room_id <= MAX_ROOM_ID or len(self.rooms) >= MAX_ROOMS:
+            return None
+        return self.create(room_id)
+    
+    def submit(self, room_id: int, handler, *args):
+        """Queue an action on the room's actor; dropped if the room is gone"""
+        if room_id not in self.rooms:
+            return
+        actor = self.actors.get(room_id)
+        if actor is None:
+            actor = self.actors[room_id] = RoomActor(room_id)
+        actor.submit(handler, *args)
+    
+    def next_room_id(self) -> int:
+        room_id = self.ordered_ids[-1] + 1 if self.ordered_ids else 1
+        # Skip ahead to an id this shard owns
+        return room_id + (SHARD_ID - room_id) % SHARD_COUNT
+    
+    def release(self, room_id: int):
+        """Room has no connected players - reset permanent rooms, drop on-demand ones"""
+        for leftover in self.connections[room_id].values():
+            leftover.close(drop_socket=True)
+        record_event(room_id, "room_reset")
+        self.rooms[room_id].clear_deadline()
+        if room_id in self.permanent:
+            self.rooms[room_id] = RoomState(room_id=room_id)
+            self.connections[room_id] = {}
+            self.player_connections[room_id] = {}
+            self.viewer_connections[room_id] = {}
+            self.last_active[room_id] = time.monotonic()
+            lobby.changed(room_id)
+        else:
+            self.remove(room_id)
+    
+    def remove(self, room_id: int):
+        self.rooms.pop(room_id).clear_deadline()
+        del self.connections[room_id]
+        del self.player_connections[room_id]
+        del self.viewer_connections[room_id]
+        del self.buckets[room_id]
+        sync = self.sync.pop(room_id)
+        if sync.viewer_flush is not None:
+            sync.viewer_flush.cancel()
+        del self.last_active[room_id]
+        self.names.pop(room_id, None)
+        self.ordered_ids.pop(bisect_right(self.ordered_ids, room_id) - 1)
+        pending = pending_broadcasts.pop(room_id, None)
+        if pending is not None:
+            pending.cancel()
+        actor = self.actors.pop(room_id, None)
+        if actor is not None:
+            actor.stop()
+        lobby.changed(room_id)
+    
+    def page(self, after: int, limit: int, game_status: Optional[str] = None, has_players: Optional[bool] = None):
+        """Rooms with id > after matching the filters, up to limit; also returns the next cursor"""
+        page = []
+        for index in range(bisect_right(self.ordered_ids, after), len(self.ordered_ids)):
+            room_id = self.ordered_ids[index]
+            room = self.rooms[room_id]
+            if game_status is not None and room.game_status != game_status:
+                continue
+            if has_players is not None and bool(self.connections[room_id]) != has_players:
+                continue
+            if len(page) == limit:
+                return page, page[-1].room_id
+            page.append(room)
+        return page, None
+    
+    def collect_idle(self):
+        """Drop on-demand rooms that stayed empty past ROOM_IDLE_TTL"""
+        cutoff = time.monotonic() - ROOM_IDLE_TTL
+        idle = [room_id for room_id, last_active in self.last_active.items()
+                if room_id not in self.permanent and not self.connections[room_id] and last_active < cutoff]
+        for room_id in idle:
+            record_event(room_id, "room_reset")
+            self.remove(room_id)
+        return len(idle)
+    
+    def snapshot(self) -> dict:
+        """Durable view of every room"""
+        return {"rooms": [self.rooms[room_id].to_snapshot() for room_id in self.ordered_ids]}
+    
+    def restore(self, snapshot: Optional[dict], events: Iterator[dict]):
+        """Rebuild rooms from a snapshot and the events logged after it"""
+        if snapshot is not None:
+            for data in snapshot["rooms"]:
+                room_id = data["room_id"]
+                if room_id not in self.rooms:
+                    self.create(room_id, data.get("room_name"))
+                self.rooms[room_id] = RoomState.from_snapshot(data)
+                lobby.changed(room_id)
+        for event in events:
+            apply_event(event)
+
+# Set at startup once the log has been replayed
+event_log: Optional[EventLog] = None
+# Set at startup, after the event log
+backplane: Optional[Backplane] = None
+
+def record_event(room_id: int, op: str, archived: bool = False, **data):
+    """Append a state change to the durable log, if one is configured; archived ones
+    are also kept past compaction (see EventLog)"""
+    if event_log is None:
+        return
+    event_log.append({"room": room_id, "op": op, **data}, archived)
+
+def apply_event(event: dict):
+    """Replay one logged event onto the registry (event_log is not set yet)"""
+    room_id = event["room"]
+    op = event["op"]
+    if op == "room_created":
+        registry.create(room_id, event.get("name"))
+        return
+    room = rooms.get(room_id)
+    if room is None:
+        return
+    if op == "room_reset":
+        room.clear_deadline()
+        if room_id in registry.permanent:
+            rooms[room_id] = RoomState(room_id=room_id)
+        else:
+            registry.remove(room_id)
+    elif op == "player_joined":
+        room.add_player(Player(nickname=event["nickname"], player_id=event["player_id"], is_viewer=event["is_viewer"], connected=False))
+    elif op == "player_left":
+        if event["nickname"] in room.players:
+            room.remove_player(event["nickname"])
+    elif op == "number_chosen":
+        if event["nickname"] in room.players:
+            room.set_number(event["nickname"], event["number"])
+    elif op == "round_started":
+        room.start_round()
+    elif op == "game_stopped":
+        room.stop_game()
+    elif op == "multiplier_set":
+        room.set_multiplier(event["multiplier"])
+    elif op == "round_timeout_set":
+        room.set_round_timeout(event["seconds"])
+    elif op == "force_finish":
+        room.force_finish()
+    elif op == "round_finished":
+        room.finish_round(GameRound(**event["round"]))
+    elif op == "history_cleared":
+        room.clear_history()
+
+# Lobby pages kept per query - more distinct queries than this between changes start over
+LOBBY_CACHE_PAGES = 256
+# Lobby stream (/api/ws/lobby): changed summaries go out at most every LOBBY_PUSH_INTERVAL_MS,
+# to at most LOBBY_MAX_SUBSCRIBERS sockets per worker - the rest poll GET /api/rooms
+LOBBY_PUSH_INTERVAL_MS = float(os.getenv("LOBBY_PUSH_INTERVAL_MS", "250"))
+LOBBY_MAX_SUBSCRIBERS = int(os.getenv("LOBBY_MAX_SUBSCRIBERS", "2000"))
+LOBBY_STREAM_ROOMS = 100  # rooms in the initial lobby_state, the first page of GET /api/rooms
+
+class LobbyCache:
+    """GET /api/rooms bodies, encoded once and reused until a room's summary changes.
+    
+    Every change bumps the version; the ETag is the version of every shard, so an
+    unchanged lobby is answered with 304 without building or asking anything.
+    Changed rooms are also collected and pushed, once per LOBBY_PUSH_INTERVAL_MS,
+    to lobby stream subscribers and to the other shards.
+    """
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]  # a restarted process never reuses an old ETag
+        self.version = 0
+        self.summaries: Dict[int, dict] = {}  # room_id -> summary, dropped when it changes
+        self.pages: Dict[tuple, tuple] = {}  # query -> (etag, body, next cursor)
+        self.remote_stamps: Dict[int, str] = {}  # shard -> its last announced stamp
+        self.subscribers: Set["LobbySubscriber"] = set()
+        self.dirty: Set[int] = set()  # rooms changed since the last push
+        self.push_scheduled = False
+    
+    @property
+    def stamp(self) -> str:
+        return f"{self.epoch}-{self.version}"
+    
+    def changed(self, room_id: int):
+        """Something in the room's lobby summary (players, status, existence) changed"""
+        self.version += 1
+        self.summaries.pop(room_id, None)
+        self.pages.clear()
+        if backplane is None or not (self.subscribers or len(SERVED_SHARDS) < SHARD_COUNT):
+            return
+        self.dirty.add(room_id)
+        if not self.push_scheduled:
+            # However busy a room is, its summary goes out once per interval
+            self.push_scheduled = True
+            asyncio.get_running_loop().call_later(LOBBY_PUSH_INTERVAL_MS / 1000, self.flush)
+    
+    def flush(self):
+        self.push_scheduled = False
+        dirty, self.dirty = sorted(self.dirty), set()
+        summaries = [self.summary(rooms[room_id]) for room_id in dirty if room_id in rooms]
+        removed = [room_id for room_id in dirty if room_id not in rooms]
+        self.push(summaries, removed)
+        for shard in range(SHARD_COUNT):
+            if shard not in SERVED_SHARDS:
+                backplane.publish(shard_channel(shard), {
+                    "op": "lobby_delta", "shard": SHARD_ID, "stamp": self.stamp, "rooms": summaries, "removed": removed,
+                })
+    
+    def push(self, summaries: List[dict], removed: List[int]):
+        """Send changed summaries and removed room ids to every lobby stream subscriber"""
+        if not self.subscribers or not (summaries or removed):
+            return
+        frame = Frame({"type": "lobby_update", "rooms": summaries, "removed": removed})
+        for subscriber in list(self.subscribers):
+            subscriber.push(frame)
+    
+    def remote_changed(self, shard: int, stamp: str):
+        if self.remote_stamps.get(shard) != stamp:
+            self.remote_stamps[shard] = stamp
+            self.pages.clear()
+    
+    def etag(self) -> Optional[str]:
+        """Covers every shard's rooms; None until all remote shards are known"""
+        stamps = [self.stamp]
+        for shard in range(SHARD_COUNT):
+            if shard not in SERVED_SHARDS:
+                if shard not in self.remote_stamps:
+                    return None
+                stamps.append(self.remote_stamps[shard])
+        return '"' + ".".join(stamps) + '"'
+    
+    def summary(self, room: RoomState) -> dict:
+        summary = self.summaries.get(room.room_id)
+        if summary is None:
+            summary = self.summaries[room.room_id] = room_summary(room)
+        return summary
+    
+    def store(self, query: tuple, etag: str, body: bytes, next_cursor: Optional[int]):
+        if len(self.pages) >= LOBBY_CACHE_PAGES:
+            self.pages.clear()
+        self.pages[query] = (etag, body, next_cursor)
+
+class LobbySubscriber(ClientConnection):
+    """A lobby tab on /api/ws/lobby: one lobby_state, then lobby_update deltas"""
+    def __init__(self, websocket: WebSocket, wire: Optional[str] = None):
+        super().__init__(websocket, room_id=0, nickname="lobby", wire=wire)
+        # Updates held back until the initial lobby_state has been queued
+        self.backlog: Optional[List[Frame]] = []
+    
+    def push(self, frame: Frame):
+        if self.backlog is not None:
+            self.backlog.append(frame)
+        elif not self.send(frame):
+            SLOW_CONSUMERS.inc()
+            self.close(drop_socket=True)
+            self.lost()
+    
+    def start(self, state: Frame):
+        self.send(state)
+        backlog, self.backlog = self.backlog, None
+        for frame in backlog:
+            self.push(frame)
+    
+    def send(self, frame: Frame, snapshot: Optional[Frame] = None) -> bool:
+        # Deltas can't be superseded like room states - a tab this far behind reconnects for a fresh lobby_state
+        if len(self.queue) >= SEND_QUEUE_SIZE:
+            return False
+        return super().send(frame)
+    
+    def lost(self):
+        lobby.subscribers.discard(self)
+
+lobby = LobbyCache()
+
+registry = RoomRegistry({room_id: name for room_id, name in ROOM_NAMES.items() if shard_of(room_id) in SERVED_SHARDS})
+rooms = registry.rooms
+room_connections = registry.connections
+room_sync = registry.sync
 
 class ConnectionManager:
     def __init__(self):
         pass
     
-    async def connect(self, websocket: WebSocket, room_id: int, nickname: str, is_viewer: bool = False):
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, room_id: int, nickname: str, is_viewer: bool = False, full_state: bool = False):
+        subprotocol = wire_subprotocol(websocket)
+        await websocket.accept(subprotocol=subprotocol)
         room = rooms[room_id]
+        registry.last_active[room_id] = time.monotonic()
+        
+        # Keep per-room memory bounded
+        if nickname not in room.players and len(room.players) >= MAX_PLAYERS_PER_ROOM:
+            await websocket.send_json({
+                "type": "error",
+                "message": "החדר מלא, לא ניתן להצטרף עכשיו"
+            })
+            await websocket.close()
+            return None
         
         # Viewers can join even if game is in progress
         if room.game_status != "waiting" and not is_viewer and nickname not in room.players:
@@ -115,278 +1373,1041 @@ class ConnectionManager:
                 "message": "המשחק כבר התחיל, לא ניתן להצטרף עכשיו"
             })
             await websocket.close()
-            return False
+            return None
         
         # Add player or reconnect existing
         is_new_player = nickname not in room.players
         
         if is_new_player:
-            # New player/viewer - check if room needs an admin (only for non-viewers)
-            connected_players = [p for p in room.players.values() if p.connected and not p.is_viewer]
-            has_admin = any(p.is_admin for p in connected_players)
-            is_admin = (len(connected_players) == 0 and not is_viewer) or (not has_admin and not is_viewer)
-            room.players[nickname] = Player(nickname=nickname, is_admin=is_admin, is_viewer=is_viewer)
+            # New player takes over admin if no playing (non-viewer) admin is connected
+            room.add_player(Player(nickname=nickname, is_viewer=is_viewer))
+            if not is_viewer and not room.has_playing_admin:
+                room.set_admin(nickname)
         else:
             # Reconnecting player - keep their previous admin status
-            room.players[nickname].connected = True
+            room.set_connected(nickname, True)
         
-        # Ensure only ONE admin exists among ALL players (not just connected)
-        admin_count = sum(1 for p in room.players.values() if p.is_admin)
-        if admin_count > 1:
-            # Keep admin status only for the first admin, remove from others
-            found_admin = False
-            for p in room.players.values():
-                if p.is_admin:
-                    if found_admin:
-                        p.is_admin = False
-                    else:
-                        found_admin = True
+        # A reconnect replaces the previous socket for this nickname
+        previous = room_connections[room_id].get(nickname)
+        if previous is not None:
+            previous.close(drop_socket=True)
         
-        room_connections[room_id][nickname] = websocket
-        return True
+        if isinstance(websocket, RemoteSocket):
+            connection = RemoteConnection(websocket, room_id, nickname, full_state=full_state)
+        else:
+            connection = ClientConnection(websocket, room_id, nickname, full_state=full_state, wire=subprotocol)
+        room_connections[room_id][nickname] = connection
+        registry.player_connections[room_id].pop(nickname, None)
+        registry.viewer_connections[room_id].pop(nickname, None)
+        if room.players[nickname].is_viewer and VIEWER_MAX_UPDATES_PER_SEC > 0:
+            registry.viewer_connections[room_id][nickname] = connection
+            room_sync[room_id].new_viewers.append(connection)
+        else:
+            registry.player_connections[room_id][nickname] = connection
+        return connection
     
-    def disconnect(self, room_id: int, nickname: str):
+    def disconnect(self, room_id: int, nickname: str, connection: Optional[Union[ClientConnection, "RemoteConnection"]] = None):
+        # A stale connection (already replaced by a reconnect, or its room released)
+        # must not evict the current one
+        if connection is not None and room_connections.get(room_id, {}).get(nickname) is not connection:
+            connection.close()
+            return
+        
         room = rooms[room_id]
         if nickname in room_connections[room_id]:
-            del room_connections[room_id][nickname]
+            room_connections[room_id].pop(nickname).close()
+            registry.player_connections[room_id].pop(nickname, None)
+            registry.viewer_connections[room_id].pop(nickname, None)
+        
+        # Player has no connection left - drop them (admin passes to the next connected player)
         if nickname in room.players:
-            was_admin = room.players[nickname].is_admin
-            # Mark as disconnected
-            room.players[nickname].connected = False
-            
-            # If admin disconnected, promote next connected player
-            if was_admin:
-                admin_exists = any(p.is_admin and p.connected for p in room.players.values())
-                if not admin_exists:
-                    for player in room.players.values():
-                        if player.connected:
-                            player.is_admin = True
-                            break
+            room.remove_player(nickname)
         
-        # Clean up players with NO connections (completely disconnected)
-        players_to_remove = [name for name, p in room.players.items() if not p.connected and name not in room_connections[room_id]]
-        for player_name in players_to_remove:
-            del room.players[player_name]
+        registry.last_active[room_id] = time.monotonic()
         
         # Clean up room if no connected players
-        if not any(p.connected for p in room.players.values()):
-            rooms[room_id] = RoomState(room_id=room_id)
-            room_connections[room_id] = {}
+        if room.connected_count == 0:
+            registry.release(room_id)
     
-    async def broadcast(self, room_id: int, message: dict):
-        disconnected = []
+    def broadcast_state(self, room_id: int, state: dict, patch: Optional[dict]):
+        """Queue full state for snapshot/old-protocol clients and the patch for everyone else;
+        throttled viewers are fed separately, so players never wait on them"""
+        started = time.perf_counter()
+        too_slow = []
+        # Each payload is encoded once, by whichever writer sends it first
+        state_frame = Frame(state)
+        patch_frame = Frame(patch) if patch is not None else None
+        connections = registry.player_connections[room_id]
         
-        for nickname, websocket in room_connections[room_id].items():
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending to {nickname}: {e}")
-                disconnected.append(nickname)
+        for nickname, connection in connections.items():
+            if connection.full_state or connection.awaiting_snapshot:
+                connection.awaiting_snapshot = False
+                accepted = connection.send(state_frame)
+            elif patch_frame is not None:
+                accepted = connection.send(patch_frame, snapshot=state_frame)
+            else:
+                continue
+            if not accepted:
+                too_slow.append(connection)
         
-        # Clean up disconnected
-        for nickname in disconnected:
-            self.disconnect(room_id, nickname)
+        BROADCAST_FANOUT.observe(len(connections))
+        if registry.viewer_connections[room_id]:
+            self.feed_viewers(room_id, state)
+        # Last - dropping the last clients of an on-demand room releases it
+        self._drop_slow_consumers(too_slow)
+        BROADCAST_SECONDS.observe(time.perf_counter() - started)
+    
+    def feed_viewers(self, room_id: int, state: dict):
+        """Hand the latest state to the viewer tier; it goes out now if a status change or a
+        new viewer needs it or the interval has passed, else when the interval ends"""
+        sync = room_sync[room_id]
+        sync.viewer_state = state
+        loop = asyncio.get_running_loop()
+        due = sync.viewer_sent_at + 1 / VIEWER_MAX_UPDATES_PER_SEC
+        if state["game_status"] != sync.viewer_status or loop.time() >= due:
+            self.flush_viewers(room_id)
+            return
+        if sync.new_viewers:
+            frame = Frame(viewer_state(state))
+            for connection in sync.new_viewers:
+                connection.send(frame)
+            sync.new_viewers.clear()
+        if sync.viewer_flush is None:
+            sync.viewer_flush = loop.call_at(due, self.flush_viewers, room_id)
+    
+    def flush_viewers(self, room_id: int):
+        sync = room_sync.get(room_id)
+        if sync is None:
+            return
+        if sync.viewer_flush is not None:
+            sync.viewer_flush.cancel()
+            sync.viewer_flush = None
+        state, sync.viewer_state = sync.viewer_state, None
+        if state is None:
+            return
+        started = time.perf_counter()
+        sync.viewer_status = state["game_status"]
+        sync.viewer_sent_at = asyncio.get_running_loop().time()
+        sync.new_viewers.clear()
+        frame = Frame(viewer_state(state))
+        connections = registry.viewer_connections[room_id]
+        too_slow = [connection for connection in connections.values() if not connection.send(frame, snapshot=frame)]
+        BROADCAST_FANOUT.observe(len(connections))
+        self._drop_slow_consumers(too_slow)
+        BROADCAST_SECONDS.observe(time.perf_counter() - started)
+    
+    def _drop_slow_consumers(self, connections: List[ClientConnection]):
+        for connection in connections:
+            SLOW_CONSUMERS.inc()
+            logger.warning(f"Disconnecting slow client {connection.nickname} in room {connection.room_id}")
+            connection.close(drop_socket=True)
+            self.disconnect(connection.room_id, connection.nickname, connection=connection)
 
 manager = ConnectionManager()
 
+class RemoteSocket:
+    """Owner-side stand-in for a websocket that another shard accepted"""
+    scope = {"subprotocols": []}  # The edge shard negotiates the wire format, this side relays JSON
+    
+    def __init__(self, edge: int, conn_id: str):
+        self.edge = edge
+        self.conn_id = conn_id
+    
+    async def accept(self, subprotocol: Optional[str] = None):
+        pass  # The edge shard accepted it before relaying the connect
+    
+    async def send_json(self, message: dict):
+        relay.deliver(self.edge, self.conn_id, Frame(message))
+    
+    async def close(self):
+        relay.close(self.edge, self.conn_id)
+
+class RemoteConnection:
+    """A client connected through another shard - frames are relayed to that shard's send queue"""
+    def __init__(self, websocket: RemoteSocket, room_id: int, nickname: str, full_state: bool = False):
+        self.websocket = websocket
+        self.room_id = room_id
+        self.nickname = nickname
+        self.full_state = full_state
+        self.awaiting_snapshot = True
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.held: Dict[str, dict] = {}
+        self.closed = False
+    
+    def send(self, frame: Frame, snapshot: Optional[Frame] = None) -> bool:
+        # The edge shard owns the socket, so it applies the slow consumer policy
+        if not self.closed:
+            relay.deliver(self.websocket.edge, self.websocket.conn_id, frame)
+        return True
+    
+    def close(self, drop_socket: bool = False):
+        if self.closed:
+            return
+        self.closed = True
+        if drop_socket:
+            relay.close(self.websocket.edge, self.websocket.conn_id)
+
+class ProxiedConnection(ClientConnection):
+    """Edge side of a client whose room is owned by another shard"""
+    def __init__(self, websocket: WebSocket, room_id: int, nickname: str, conn_id: str, wire: Optional[str] = None):
+        super().__init__(websocket, room_id, nickname, wire=wire)
+        self.conn_id = conn_id
+        self.owner = shard_of(room_id)
+    
+    def forward(self, op: str, **data):
+        backplane.publish(shard_channel(self.owner), {"op": op, "conn": self.conn_id, **data})
+    
+    def lost(self):
+        if proxied_connections.pop(self.conn_id, None) is not None:
+            self.forward("disconnect")
+
+class ShardRelay:
+    """Frames for clients on other shards, sent as one backplane message per shard per loop pass"""
+    def __init__(self):
+        self.outbox: Dict[int, List[tuple]] = {}
+        self.scheduled = False
+    
+    def deliver(self, shard: int, conn_id: str, frame: Frame):
+        self._add(shard, (conn_id, frame))
+    
+    def close(self, shard: int, conn_id: str):
+        self._add(shard, (conn_id, None))
+    
+    def _add(self, shard: int, item: tuple):
+        self.outbox.setdefault(shard, []).append(item)
+        if not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+    
+    def flush(self):
+        self.scheduled = False
+        outbox, self.outbox = self.outbox, {}
+        for shard, items in outbox.items():
+            # A broadcast queues one frame for many clients - its text crosses the backplane once
+            frame_index: Dict[Frame, int] = {}
+            frames = []
+            deliveries = []
+            for conn_id, frame in items:
+                if frame is None:
+                    deliveries.append([conn_id, -1])  # Close the socket
+                    continue
+                index = frame_index.get(frame)
+                if index is None:
+                    index = frame_index[frame] = len(frames)
+                    frames.append([frame.type, frame.text])
+                deliveries.append([conn_id, index])
+            backplane.publish(shard_channel(shard), {"op": "deliver", "frames": frames, "deliveries": deliveries})
+
+relay = ShardRelay()
+
+# Owner side: conn id -> client relayed from another shard
+remote_connections: Dict[str, RemoteConnection] = {}
+# Edge side: conn id -> local client of a room owned by another shard
+proxied_connections: Dict[str, ProxiedConnection] = {}
+# call id -> reply from another shard
+pending_calls: Dict[str, asyncio.Future] = {}
+
+async def handle_shard_message(message: dict):
+    """Everything addressed to a shard served by this process arrives here, in order"""
+    op = message["op"]
+    if op == "connect":
+        await accept_remote(message)
+    elif op == "message":
+        connection = remote_connections.get(message["conn"])
+        if connection is not None:
+            submit_action(connection, message["data"])
+    elif op == "disconnect":
+        connection = remote_connections.pop(message["conn"], None)
+        if connection is not None:
+            registry.submit(connection.room_id, handle_disconnect, connection.nickname, connection)
+    elif op == "deliver":
+        deliver_relayed(message)
+    elif op == "call":
+        result = SHARD_CALLS[message["method"]](**message["args"])
+        backplane.publish(shard_channel(message["reply_to"]), {"op": "reply", "id": message["id"], "result": result})
+    elif op == "lobby_delta":
+        lobby.remote_changed(message["shard"], message["stamp"])
+        lobby.push(message["rooms"], message["removed"])
+    elif op == "reply":
+        future = pending_calls.get(message["id"])
+        if future is not None and not future.done():
+            future.set_result(message["result"])
+
+async def accept_remote(message: dict):
+    room_id = message["room_id"]
+    websocket = RemoteSocket(message["edge"], message["conn"])
+    if registry.get_or_create(room_id) is None:
+        await websocket.close()
+        return
+    
+    connection = await manager.connect(websocket, room_id, message["nickname"],
+                                       is_viewer=message["viewer"], full_state=message["full_state"])
+    if connection is None:
+        return
+    remote_connections[message["conn"]] = connection
+    registry.submit(room_id, announce_state)
+
+def deliver_relayed(message: dict):
+    frames = [Frame.from_text(frame_type, text) for frame_type, text in message["frames"]]
+    for conn_id, index in message["deliveries"]:
+        connection = proxied_connections.get(conn_id)
+        if connection is None:
+            continue
+        if index < 0:
+            connection.close(drop_socket=True)
+        elif not connection.send(frames[index]):
+            SLOW_CONSUMERS.inc()
+            logger.warning(f"Disconnecting slow client {connection.nickname} in room {connection.room_id}")
+            connection.close(drop_socket=True)
+            connection.lost()
+
+async def proxy_websocket(websocket: WebSocket, room_id: int, nickname: str, viewer: bool, full_state: bool):
+    """Serve a client of a room owned by another shard, relaying both ways over the backplane"""
+    subprotocol = wire_subprotocol(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    connection = ProxiedConnection(websocket, room_id, nickname, uuid.uuid4().hex, wire=subprotocol)
+    proxied_connections[connection.conn_id] = connection
+    connection.forward("connect", edge=SHARD_ID, room_id=room_id, nickname=nickname, viewer=viewer, full_state=full_state)
+    try:
+        while True:
+            data = await receive_action(websocket)
+            if connection.received(data):
+                connection.forward("message", data=data)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}")
+    connection.close()
+    connection.lost()
+
+def rooms_page(after: int, limit: int, status: Optional[str], has_players: Optional[bool]):
+    page, next_cursor = registry.page(after, limit, game_status=status, has_players=has_players)
+    return [lobby.summary(room) for room in page], next_cursor, lobby.stamp
+
+def room_history_page(room_id: int, before: Optional[int], limit: int):
+    room = rooms.get(room_id)
+    if room is None:
+        return None
+    page = room.history_page(before, limit)
+    next_cursor = page[0].round_number if page and page[0] is not room.game_history[0] else None
+    return [h.to_dict() for h in page], next_cursor
+
+# limit -> (RoomStats.changes and room count it was built at, shard_stats result)
+shard_stats_cache: Dict[int, tuple] = {}
+
+def room_stats(room_id: int, limit: int):
+    room = rooms.get(room_id)
+    if room is None:
+        return None
+    return {"room_id": room_id, **room.stats.to_dict(limit)}
+
+def shard_stats(limit: int):
+    """This shard's part of the cross-room stats, merged by all_rooms_stats"""
+    # A new RoomStats or round bumps RoomStats.changes; a room going away changes the count
+    key = (RoomStats.changes, len(rooms))
+    cached = shard_stats_cache.get(limit)
+    if cached is None or cached[0] != key:
+        active = [room for room in rooms.values() if room.stats.rounds]
+        leaderboard = [
+            {"room_id": room.room_id, **player}
+            for room in active for player in room.stats.table()[:limit]
+        ]
+        leaderboard.sort(key=stats_rank)
+        targets = [room.stats for room in active if room.stats.target_min is not None]
+        cached = shard_stats_cache[limit] = (key, {
+            "rooms": len(active),
+            "rounds": sum(room.stats.rounds for room in active),
+            "target_sum": sum(room.stats.target_sum for room in active),
+            "target_min": min((stats.target_min for stats in targets), default=None),
+            "target_max": max((stats.target_max for stats in targets), default=None),
+            "pick_sum": sum(room.stats.pick_sum for room in active),
+            "picks": sum(room.stats.picks for room in active),
+            "leaderboard": leaderboard[:limit],
+        })
+    return cached[1]
+
+def stats_rank(player: dict):
+    return (-player["wins"], -player["win_rate"], player["average_distance"], player["room_id"])
+
+# Read-only queries another shard may ask for
+SHARD_CALLS = {
+    "rooms_page": rooms_page,
+    "room_history": room_history_page,
+    "room_stats": room_stats,
+    "shard_stats": shard_stats,
+}
+
+async def shard_call(shard: int, method: str, **args):
+    """Run one of SHARD_CALLS on the shard that owns the data"""
+    if shard in SERVED_SHARDS:
+        return SHARD_CALLS[method](**args)
+    call_id = uuid.uuid4().hex
+    future = pending_calls[call_id] = asyncio.get_running_loop().create_future()
+    backplane.publish(shard_channel(shard), {"op": "call", "id": call_id, "reply_to": SHARD_ID, "method": method, "args": args})
+    try:
+        return await asyncio.wait_for(future, BACKPLANE_CALL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Shard unavailable")
+    finally:
+        pending_calls.pop(call_id, None)
+
+class ProfilerSettings(BaseModel):
+    sample_rate: float = Field(ge=0, le=1)
+
+class RoomCreate(BaseModel):
+    room_name: Optional[str] = Field(default=None, max_length=60)
+
+def room_summary(room: RoomState) -> dict:
+    connected_players = [p.nickname for p in room.players.values() if p.connected]
+    return {
+        "room_id": room.room_id,
+        "room_name": get_room_name(room.room_id),
+        "player_count": len(connected_players),
+        "game_status": room.game_status,
+        "players": connected_players
+    }
+
 @api_router.get("/rooms")
-async def get_rooms():
-    """Get status of all rooms"""
-    rooms_status = []
-    for room_id, room in rooms.items():
-        connected_players = [p.nickname for p in room.players.values() if p.connected]
-        rooms_status.append({
-            "room_id": room_id,
-            "room_name": get_room_name(room_id),
-            "player_count": len(connected_players),
-            "game_status": room.game_status,
-            "players": connected_players
+async def get_rooms(
+    after: int = 0,
+    limit: int = Query(default=100, ge=1, le=500),
+    status: Optional[str] = None,
+    has_players: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """Get status of rooms, one page at a time (pass X-Next-Cursor back as ?after=).
+    
+    Answers 304 when the If-None-Match ETag is still current."""
+    # no-cache: browsers keep the body but revalidate every poll
+    headers = {"Cache-Control": "no-cache"}
+    etag = lobby.etag()
+    if etag is not None and if_none_match == etag:
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+    
+    etag, body, next_cursor = await lobby_page(after, limit, status, has_players)
+    headers["ETag"] = etag
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def lobby_page(after: int, limit: int, status: Optional[str], has_players: Optional[bool]):
+    """(etag, encoded body, next cursor) for one page of the lobby, from the cache when current"""
+    etag = lobby.etag()
+    query = (after, limit, status, has_players)
+    cached = lobby.pages.get(query)
+    if cached is not None and cached[0] == etag:
+        return cached
+    # Every shard returns its own first page; the merged page is the lowest ids of those
+    shards = [SHARD_ID] + [shard for shard in range(SHARD_COUNT) if shard not in SERVED_SHARDS]
+    results = await asyncio.gather(*(
+        shard_call(shard, "rooms_page", after=after, limit=limit, status=status, has_players=has_players)
+        for shard in shards
+    ))
+    for shard, (_, _, stamp) in zip(shards[1:], results[1:]):
+        lobby.remote_changed(shard, stamp)
+    summaries = sorted((summary for page, _, _ in results for summary in page), key=lambda summary: summary["room_id"])
+    page = summaries[:limit]
+    more = len(summaries) > limit or any(cursor is not None for _, cursor, _ in results)
+    next_cursor = page[-1]["room_id"] if more else None
+    body = encode_message(page).encode()
+    # Tagged with the versions the pages were built at - a change that landed
+    # meanwhile just makes the next poll fetch again
+    etag = '"' + ".".join(stamp for _, _, stamp in results) + '"'
+    lobby.store(query, etag, body, next_cursor)
+    return etag, body, next_cursor
+
+@api_router.post("/rooms")
+async def create_room(request: RoomCreate):
+    """Create a new room with the next free id"""
+    if len(rooms) >= MAX_ROOMS:
+        raise HTTPException(status_code=503, detail="Room limit reached")
+    room = registry.create(registry.next_room_id(), request.room_name)
+    return room_summary(room)
+
+@api_router.get("/rooms/{room_id}/history")
+async def get_room_history(
+    room_id: int,
+    response: Response,
+    before: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+):
+    """Rounds older than round number `before`, oldest first (pass X-Next-Cursor back as ?before=)"""
+    result = await shard_call(shard_of(room_id), "room_history", room_id=room_id, before=before, limit=limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    page, next_cursor = result
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return page
+
+@api_router.get("/rooms/{room_id}/stats")
+async def get_room_stats(room_id: int, limit: int = Query(default=50, ge=1, le=500)):
+    """Target and pick averages over the room's rounds, and its top players"""
+    result = await shard_call(shard_of(room_id), "room_stats", room_id=room_id, limit=limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return result
+
+@api_router.get("/stats")
+async def get_stats(limit: int = Query(default=20, ge=1, le=100)):
+    """Totals over every room's rounds, and the top players across rooms"""
+    shards = [SHARD_ID] + [shard for shard in range(SHARD_COUNT) if shard not in SERVED_SHARDS]
+    parts = await asyncio.gather(*(shard_call(shard, "shard_stats", limit=limit) for shard in shards))
+    rounds = sum(part["rounds"] for part in parts)
+    picks = sum(part["picks"] for part in parts)
+    mins = [part["target_min"] for part in parts if part["target_min"] is not None]
+    maxes = [part["target_max"] for part in parts if part["target_max"] is not None]
+    return {
+        "rooms": sum(part["rooms"] for part in parts),
+        "rounds": rounds,
+        "average_target": round(sum(part["target_sum"] for part in parts) / rounds, 2) if rounds else None,
+        "min_target": min(mins, default=None),
+        "max_target": max(maxes, default=None),
+        "average_pick": round(sum(part["pick_sum"] for part in parts) / picks, 2) if picks else None,
+        "leaderboard": sorted((player for part in parts for player in part["leaderboard"]), key=stats_rank)[:limit],
+    }
+
+# Rounds encoded into each chunk of a history export
+EXPORT_CHUNK_ROUNDS = 200
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+# One CSV row per player's pick, the round's fields repeated on each
+EXPORT_CSV_COLUMNS = ["cursor", "room_id", "round_number", "timestamp", "total_sum", "average",
+                      "target_number", "winner", "nickname", "number"]
+
+# (timestamp, room_id, round_number) - the order rounds are exported in, and the resume cursor
+ExportKey = Tuple[str, int, int]
+
+def export_cursor(key: ExportKey) -> str:
+    return f"{key[0]},{key[1]},{key[2]}"
+
+def export_bound(since: Optional[str], cursor: Optional[str]) -> ExportKey:
+    """Rounds with a key past this one are exported; raises ValueError for a malformed since or cursor"""
+    bound = ("", 0, 0)
+    if since:
+        moment = datetime.fromisoformat(since)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        # Rounds are stamped in UTC isoformat, so the strings compare in time order
+        bound = (moment.astimezone(timezone.utc).isoformat(), -1, -1)
+    if cursor:
+        timestamp, room_id, round_number = cursor.rsplit(",", 2)
+        bound = max(bound, (timestamp, int(room_id), int(round_number)))
+    return bound
+
+def memory_rounds(after: ExportKey) -> Iterator[Tuple[ExportKey, dict]]:
+    """This process's rooms' rounds past `after`, oldest first. Which rounds is settled
+    up front, so the export can run off the event loop while the rooms play on."""
+    streams = []
+    for room_id in registry.ordered_ids:
+        history = rooms[room_id].game_history
+        start = bisect_right(history, after, key=lambda r, room_id=room_id: (r.timestamp, room_id, r.round_number))
+        if start < len(history):
+            streams.append(room_rounds(room_id, history[start:]))
+    return heapq.merge(*streams, key=itemgetter(0))
+
+def room_rounds(room_id: int, history: List[Union[GameRound, dict]]) -> Iterator[Tuple[ExportKey, dict]]:
+    for game_round in history:
+        data = game_round.to_dict() if isinstance(game_round, GameRound) else game_round
+        yield (data["timestamp"], room_id, data["round_number"]), data
+
+def logged_rounds() -> Iterator[Tuple[ExportKey, dict]]:
+    """Rounds in the archives of every shard, oldest first"""
+    shards = range(SHARD_COUNT) if BACKPLANE_URL and SHARD_COUNT > 1 else [SHARD_ID]
+    return heapq.merge(*(shard_logged_rounds(event_log_dir(shard)) for shard in shards), key=itemgetter(0))
+
+def shard_logged_rounds(log_dir: Path) -> Iterator[Tuple[ExportKey, dict]]:
+    # Every round_finished is archived, so rounds survive compaction and their rooms going away
+    for record in EventLog(log_dir, encode_message, decode_message).read_archive():
+        data = record["round"]
+        yield (data["timestamp"], record["room"], data["round_number"]), data
+
+def csv_field(value) -> str:
+    """One CSV field, quoted only when it has to be (as the csv module does by default)"""
+    if value is None:
+        return ""
+    text = str(value)
+    if CSV_NEEDS_QUOTES.search(text):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+CSV_NEEDS_QUOTES = re.compile('[",\r\n]')
+
+def export_chunks(rounds: Iterator[Tuple[ExportKey, dict]], format: str, after: ExportKey) -> Iterator[str]:
+    """Encode the rounds past `after` a chunk at a time, so memory stays flat however many there are"""
+    parts = [",".join(EXPORT_CSV_COLUMNS) + "\r\n"] if format == "csv" else []
+    count = 0
+    for key, data in rounds:
+        if key <= after:
+            continue
+        cursor = export_cursor(key)
+        if format == "csv":
+            # The round's fields are encoded once and shared by its rows - the csv module
+            # would re-encode them per pick, several times slower on big rounds
+            prefix = ",".join(csv_field(field) for field in (
+                cursor, key[1], data["round_number"], data["timestamp"], data["total_sum"],
+                data["average"], data["target_number"], data["winner"],
+            ))
+            # A round nobody chose in still gets a row
+            for nickname, number in data["players_data"].items() or [("", None)]:
+                parts.append(f"{prefix},{csv_field(nickname)},{csv_field(number)}\r\n")
+        else:
+            parts.append(encode_message({"cursor": cursor, "room_id": key[1], **data}) + "\n")
+        count += 1
+        if count % EXPORT_CHUNK_ROUNDS == 0:
+            yield "".join(parts)
+            parts.clear()
+    yield "".join(parts)
+
+@api_router.get("/rounds/export")
+async def export_rounds(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    """Every completed round, oldest first, streamed as NDJSON or as CSV with a row per pick.
+    
+    since (ISO 8601) skips older rounds. Every round carries a cursor; an export that was
+    cut off resumes with ?cursor= set to that of the last complete round received. Reads
+    the round archive of every shard when an event log is configured, this process's rooms otherwise."""
+    try:
+        after = export_bound(since, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since or cursor")
+    rounds = logged_rounds() if EVENT_LOG_DIR else memory_rounds(after)
+    # A plain iterator is run on a worker thread, off the event loop
+    return StreamingResponse(export_chunks(rounds, format, after), media_type=EXPORT_MEDIA_TYPES[format])
+
+def check_profiler_token(token: Optional[str]):
+    if not PROFILER_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiler control is disabled")
+    if token != PROFILER_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid profiler token")
+
+@api_router.get("/profiler")
+async def get_profile(reset: bool = False, x_profiler_token: Optional[str] = Header(default=None)):
+    """Room action stacks profiled by this worker so far, in collapsed-stack format
+    (flamegraph.pl, speedscope); ?reset=true starts over afterwards"""
+    check_profiler_token(x_profiler_token)
+    body = profiler.collapsed()
+    headers = {"X-Sample-Rate": str(profiler.sample_rate), "X-Samples": str(profiler.samples)}
+    if reset:
+        profiler.reset()
+    return Response(content=body, media_type="text/plain; charset=utf-8", headers=headers)
+
+@api_router.put("/profiler")
+async def set_profiler(settings: ProfilerSettings, x_profiler_token: Optional[str] = Header(default=None)):
+    """Profile this fraction of room actions from now on in this worker, 0 to stop"""
+    check_profiler_token(x_profiler_token)
+    profiler.sample_rate = settings.sample_rate
+    logger.info(f"Profiling {settings.sample_rate:.2%} of room actions")
+    return {"sample_rate": profiler.sample_rate, "samples": profiler.samples}
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for this worker process"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.websocket("/api/ws/lobby")
+async def lobby_websocket(websocket: WebSocket):
+    """Room summaries as they change: one lobby_state with the first page of rooms,
+    then lobby_update messages with changed summaries and removed room ids"""
+    subprotocol = wire_subprotocol(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    if len(lobby.subscribers) >= LOBBY_MAX_SUBSCRIBERS:
+        # The lobby falls back to polling GET /api/rooms
+        await websocket.send_json({
+            "type": "error",
+            "message": "יותר מדי צופים בלובי, הרשימה תתעדכן מדי כמה שניות"
         })
-    return rooms_status
+        await websocket.close()
+        return
+    
+    subscriber = LobbySubscriber(websocket, wire=subprotocol)
+    # Subscribed before the page is built, so no change in between is missed
+    lobby.subscribers.add(subscriber)
+    try:
+        _, body, _ = await lobby_page(0, LOBBY_STREAM_ROOMS, None, None)
+        subscriber.start(Frame.from_text("lobby_state", '{"type":"lobby_state","rooms":' + body.decode() + '}'))
+        while True:
+            # Nothing but pongs is expected from the client; this mostly waits for it to leave
+            subscriber.received(await receive_action(websocket))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Lobby WebSocket error: {e}")
+    subscriber.close()
+    subscriber.lost()
 
 @app.websocket("/api/ws/{room_id}/{nickname}")
-async def websocket_endpoint(websocket: WebSocket, room_id: int, nickname: str, viewer: bool = False):
-    if room_id not in rooms:
+async def websocket_endpoint(websocket: WebSocket, room_id: int, nickname: str, viewer: bool = False, full_state: bool = False):
+    if shard_of(room_id) not in SERVED_SHARDS:
+        await proxy_websocket(websocket, room_id, nickname, viewer, full_state)
+        return
+    
+    if registry.get_or_create(room_id) is None:
         await websocket.close()
         return
     
-    connected = await manager.connect(websocket, room_id, nickname, is_viewer=viewer)
-    if not connected:
+    connection = await manager.connect(websocket, room_id, nickname, is_viewer=viewer, full_state=full_state)
+    if connection is None:
         return
     
     try:
         # Send initial state
-        await send_room_state(room_id)
+        registry.submit(room_id, announce_state)
         
         while True:
-            data = await websocket.receive_json()
-            await handle_message(room_id, nickname, data)
+            data = await receive_action(websocket)
+            if connection.received(data):
+                submit_action(connection, data)
     
     except WebSocketDisconnect:
-        manager.disconnect(room_id, nickname)
-        await send_room_state(room_id)
+        registry.submit(room_id, handle_disconnect, nickname, connection)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        manager.disconnect(room_id, nickname)
+        registry.submit(room_id, handle_disconnect, nickname, connection, False)
 
-async def handle_message(room_id: int, nickname: str, data: dict):
-    room = rooms[room_id]
-    action = data.get("action")
-    
-    if action == "start_game":
-        connected_players = [p for p in room.players.values() if p.connected]
-        if room.players[nickname].is_admin and len(connected_players) >= 1:
-            room.game_status = "choosing"
-            room.current_round += 1
-            room.force_finish_called = False  # Reset flag for new game
-            # Reset all numbers
-            for player in room.players.values():
-                player.number = None
-            await send_room_state(room_id)
-    
-    elif action == "choose_number":
-        if room.game_status == "choosing":
-            # If force_finish was already called, don't accept new choices
-            if room.force_finish_called:
-                await send_room_state(room_id)
-                return
-                
-            number = data.get("number")
-            if 0 <= number <= 100:
-                room.players[nickname].number = number
-                
-                # Check if all PLAYING players (not viewers) chose
-                playing_players = [p for p in room.players.values() if p.connected and not p.is_viewer]
-                if playing_players and all(p.number is not None for p in playing_players):
-                    await calculate_winner(room_id)
-                else:
-                    await send_room_state(room_id)
-    
-    elif action == "new_round":
-        if room.players[nickname].is_admin:
-            room.game_status = "choosing"
-            room.current_round += 1
-            room.force_finish_called = False  # Reset flag for new round
-            for player in room.players.values():
-                player.number = None
-            await send_room_state(room_id)
-    
-    elif action == "stop_game":
-        if room.players[nickname].is_admin:
-            room.game_status = "waiting"
-            for player in room.players.values():
-                player.number = None
-            
-            # Ensure only one admin exists among connected players
-            admin_count = sum(1 for p in room.players.values() if p.is_admin and p.connected)
-            if admin_count > 1:
-                # Remove admin from all but the first connected admin
-                found_admin = False
-                for player in room.players.values():
-                    if player.connected and player.is_admin:
-                        if found_admin:
-                            player.is_admin = False
-                        else:
-                            found_admin = True
-            
-            await send_room_state(room_id)
-    
-    elif action == "clear_history":
-        if room.players[nickname].is_admin:
-            room.game_history = []
-            await send_room_state(room_id)
-    
-    elif action == "set_multiplier":
-        if room.players[nickname].is_admin and room.game_status == "waiting":
-            multiplier = data.get("multiplier")
-            if multiplier is not None and 0.1 <= multiplier <= 0.9:
-                room.multiplier = multiplier
-                await send_room_state(room_id)
-    
-    elif action == "remove_player":
-        if room.players[nickname].is_admin and room.game_status == "choosing":
-            target_nickname = data.get("target_nickname")
-            if target_nickname in room.players and target_nickname != nickname:
-                room.players[target_nickname].connected = False
-                # Check if remaining PLAYING players (not viewers) all chose
-                playing_players = [p for p in room.players.values() if p.connected and not p.is_viewer]
-                if playing_players and all(p.number is not None for p in playing_players):
-                    await calculate_winner(room_id)
-                else:
-                    await send_room_state(room_id)
-    
-    elif action == "force_finish_round":
-        if room.players[nickname].is_admin and room.game_status == "choosing":
-            # Mark that force finish was called so no more choices are accepted
-            room.force_finish_called = True
-            
-            # Disconnect players who didn't choose
-            for player in room.players.values():
-                if player.connected and player.number is None:
-                    player.connected = False
-            
-            # Calculate winner with only those who chose
-            await calculate_winner(room_id)
-
-async def calculate_winner(room_id: int):
+def announce_state(room_id: int) -> int:
+    return IMMEDIATE_BROADCAST
+
+def handle_disconnect(room_id: int, nickname: str, connection: Union[ClientConnection, "RemoteConnection"], announce: bool = True) -> int:
+    manager.disconnect(room_id, nickname, connection=connection)
+    # The player who left may have been the only one the round was waiting for
+    room = rooms.get(room_id)
+    if room is not None and room.game_status == "choosing" and room.all_chosen:
+        calculate_winner(room_id)
+    return IMMEDIATE_BROADCAST if announce else NO_BROADCAST
+
+class ActionSpec(NamedTuple):
+    handler: Callable[[int, "RoomState", str, Optional[BaseModel]], int]  # (room_id, room, nickname, message) -> broadcast
+    schema: Optional[Type[BaseModel]]  # validates the message; None for actions without fields
+    admin_only: bool
+    statuses: Optional[FrozenSet[str]]  # game_status values the action is accepted in, None for any
+
+# Client actions by name, registered with @action
+ACTIONS: Dict[str, ActionSpec] = {}
+
+def action(name: str, schema: Optional[Type[BaseModel]] = None, admin_only: bool = False,
+           statuses: Optional[Set[str]] = None):
+    """Register a handler for client messages with {"action": name}. handle_message checks the
+    sender and game status and validates the message against schema before calling it."""
+    def register(handler):
+        ACTIONS[name] = ActionSpec(handler, schema, admin_only, frozenset(statuses) if statuses is not None else None)
+        return handler
+    return register
+
+class ActionMessage(BaseModel):
+    """Fields of a client action. Strict, so "5" or true is not taken for a number; extra fields are ignored."""
+    model_config = ConfigDict(strict=True)
+    action: str
+
+class ChooseNumberMessage(ActionMessage):
+    number: Union[int, float] = Field(ge=0, le=100)
+
+class SetMultiplierMessage(ActionMessage):
+    multiplier: float = Field(ge=0.1, le=0.9)
+
+class SetRoundTimeoutMessage(ActionMessage):
+    seconds: Union[int, float] = Field(ge=0, le=3600)  # 0 for no limit
+    
+    @field_validator("seconds")
+    @classmethod
+    def at_least_ten(cls, seconds):
+        if 0 < seconds < 10:
+            raise ValueError("a round timeout is 0 or at least 10 seconds")
+        return seconds
+
+class RemovePlayerMessage(ActionMessage):
+    target_nickname: str
+
+def submit_action(connection: Union[ClientConnection, "RemoteConnection"], data: dict):
+    """Queue a client's action on its room, if the action's rate limits allow it"""
+    label = message_label(data)
+    if RATE_LIMIT_SCALE > 0:
+        bucket = rate_limited(connection, label)
+        if bucket is not None:
+            if label in HELD_ACTIONS:
+                # Only the latest is kept, so a client hammering away is applied at the limit's pace
+                if label not in connection.held:
+                    asyncio.get_running_loop().call_later(bucket.wait_time(), release_held_action, connection, label)
+                connection.held[label] = data
+                RATE_LIMIT_DECISIONS.labels(label, "held").inc()
+            else:
+                RATE_LIMIT_DECISIONS.labels(label, "dropped").inc()
+            return
+    RATE_LIMIT_DECISIONS.labels(label, "allowed").inc()
+    registry.submit(connection.room_id, handle_message, connection.nickname, data)
+
+def rate_limited(connection: Union[ClientConnection, "RemoteConnection"], label: str) -> Optional[TokenBucket]:
+    """Take a token from the connection's and the room's bucket for the action; the bucket that
+    ran dry if either had none, None if the action may go ahead"""
+    bucket = connection.buckets.get(label)
+    if bucket is None:
+        rate, burst = CONNECTION_ACTION_LIMITS[label]
+        bucket = connection.buckets[label] = TokenBucket(rate * RATE_LIMIT_SCALE, burst * RATE_LIMIT_SCALE)
+    if not bucket.take():
+        RATE_LIMIT_EXCEEDED.labels(label, "connection").inc()
+        return bucket
+    room_buckets = registry.buckets.get(connection.room_id)
+    if room_buckets is None:
+        return None  # the room is gone, registry.submit drops the action anyway
+    room_bucket = room_buckets.get(label)
+    if room_bucket is None:
+        rate, burst = ROOM_ACTION_LIMITS[label]
+        room_bucket = room_buckets[label] = TokenBucket(rate * RATE_LIMIT_SCALE, burst * RATE_LIMIT_SCALE)
+    if not room_bucket.take():
+        bucket.give_back()
+        RATE_LIMIT_EXCEEDED.labels(label, "room").inc()
+        return room_bucket
+    return None
+
+def release_held_action(connection: Union[ClientConnection, "RemoteConnection"], label: str):
+    data = connection.held.pop(label, None)
+    if data is not None and not connection.closed:
+        submit_action(connection, data)
+
+def action_label(handler, args: tuple) -> str:
+    """Metric label for a queued room action, bounded to known names"""
+    if handler is handle_message:
+        return message_label(args[1])
+    return handler.__name__
+
+def message_label(data: dict) -> str:
+    """The client message's action, or "unknown" for anything ACTIONS lacks"""
+    action = data.get("action") if isinstance(data, dict) else None
+    return action if isinstance(action, str) and action in MESSAGE_ACTIONS else "unknown"
+
+def handle_message(room_id: int, nickname: str, data: dict) -> int:
+    """Apply one client action through its ACTIONS entry; returns the broadcast it needs"""
+    room = rooms.get(room_id)
+    if room is None or nickname not in room.players:
+        return NO_BROADCAST
+    name = data.get("action")
+    spec = ACTIONS.get(name) if isinstance(name, str) else None
+    if spec is None:
+        return NO_BROADCAST
+    if spec.admin_only and not room.players[nickname].is_admin:
+        return NO_BROADCAST
+    if spec.statuses is not None and room.game_status not in spec.statuses:
+        return NO_BROADCAST
+    message = None
+    if spec.schema is not None:
+        try:
+            message = spec.schema.model_validate(data)
+        except ValidationError:
+            INVALID_ACTIONS.labels(name).inc()
+            return NO_BROADCAST
+    return spec.handler(room_id, room, nickname, message)
+
+@action("sync")
+def sync_action(room_id: int, room: RoomState, nickname: str, message: None) -> int:
+    # Client lost track of the patch sequence - resend a full snapshot
+    connection = room_connections[room_id].get(nickname)
+    if connection is not None:
+        connection.awaiting_snapshot = True
+        if nickname in registry.viewer_connections[room_id]:
+            room_sync[room_id].new_viewers.append(connection)
+    return IMMEDIATE_BROADCAST
+
+@action("start_game", admin_only=True)
+def start_game_action(room_id: int, room: RoomState, nickname: str, message: None) -> int:
+    if room.connected_count < 1:
+        return NO_BROADCAST
+    # New round with all numbers reset
+    room.start_round()
+    return IMMEDIATE_BROADCAST
+
+@action("choose_number", schema=ChooseNumberMessage, statuses={"choosing"})
+def choose_number_action(room_id: int, room: RoomState, nickname: str, message: ChooseNumberMessage) -> int:
+    # If force_finish was already called, don't accept new choices
+    if room.force_finish_called:
+        return IMMEDIATE_BROADCAST
+    room.set_number(nickname, message.number)
+    # Check if all PLAYING players (not viewers) chose
+    if room.all_chosen:
+        calculate_winner(room_id)
+        return IMMEDIATE_BROADCAST
+    return COALESCED_BROADCAST
+
+@action("new_round", admin_only=True)
+def new_round_action(room_id: int, room: RoomState, nickname: str, message: None) -> int:
+    room.start_round()
+    return IMMEDIATE_BROADCAST
+
+@action("stop_game", admin_only=True)
+def stop_game_action(room_id: int, room: RoomState, nickname: str, message: None) -> int:
+    room.stop_game()
+    return IMMEDIATE_BROADCAST
+
+@action("clear_history", admin_only=True)
+def clear_history_action(room_id: int, room: RoomState, nickname: str, message: None) -> int:
+    room.clear_history()
+    return IMMEDIATE_BROADCAST
+
+@action("set_multiplier", schema=SetMultiplierMessage, admin_only=True, statuses={"waiting"})
+def set_multiplier_action(room_id: int, room: RoomState, nickname: str, message: SetMultiplierMessage) -> int:
+    room.set_multiplier(message.multiplier)
+    return IMMEDIATE_BROADCAST
+
+@action("set_round_timeout", schema=SetRoundTimeoutMessage, admin_only=True, statuses={"waiting"})
+def set_round_timeout_action(room_id: int, room: RoomState, nickname: str, message: SetRoundTimeoutMessage) -> int:
+    room.set_round_timeout(message.seconds)
+    return IMMEDIATE_BROADCAST
+
+@action("remove_player", schema=RemovePlayerMessage, admin_only=True, statuses={"choosing"})
+def remove_player_action(room_id: int, room: RoomState, nickname: str, message: RemovePlayerMessage) -> int:
+    target_nickname = message.target_nickname
+    if target_nickname not in room.players or target_nickname == nickname:
+        return NO_BROADCAST
+    room.set_connected(target_nickname, False)
+    # Check if remaining PLAYING players (not viewers) all chose
+    if room.all_chosen:
+        calculate_winner(room_id)
+    return IMMEDIATE_BROADCAST
+
+@action("force_finish_round", admin_only=True, statuses={"choosing"})
+def force_finish_round_action(room_id: int, room: RoomState, nickname: str, message: None) -> int:
+    force_finish_round(room_id)
+    return IMMEDIATE_BROADCAST
+
+# Client actions handle_message understands - anything else is labelled "unknown" in metrics
+MESSAGE_ACTIONS = frozenset(ACTIONS)
+
+def force_finish_round(room_id: int):
     room = rooms[room_id]
+    # Mark that force finish was called so no more choices are accepted
+    room.force_finish()
     
-    # Calculate average and target using room's multiplier - ONLY for playing players (not viewers)
-    numbers = [p.number for p in room.players.values() if p.connected and not p.is_viewer and p.number is not None]
-    total_sum = sum(numbers)
-    average = total_sum / len(numbers) if numbers else 0
-    target = average * room.multiplier
+    # Disconnect players who didn't choose
+    for player in list(room.players.values()):
+        if player.connected and player.number is None:
+            room.set_connected(player.nickname, False)
     
-    # Find winner (closest to target) - ONLY among playing players
-    winner = None
-    min_distance = float('inf')
+    # Calculate winner with only those who chose
+    calculate_winner(room_id)
+
+def expire_round(room_id: int, round_number: int) -> int:
+    """The round's deadline passed - score it with the numbers chosen so far. Unlike the admin's
+    force finish, players who didn't choose stay connected (and the admin keeps the room); with
+    no number chosen the room goes back to waiting, and with nobody left in it (e.g. restored
+    after a restart nobody came back from) it is freed."""
+    room = rooms.get(room_id)
+    if room is None or room.game_status != "choosing" or room.current_round != round_number:
+        return NO_BROADCAST
+    if room.connected_count == 0:
+        registry.release(room_id)
+        return NO_BROADCAST
+    if room.chosen_count == 0:
+        room.stop_game()
+        return IMMEDIATE_BROADCAST
+    room.force_finish()
+    calculate_winner(room_id)
+    return IMMEDIATE_BROADCAST
+
+class RoundScore(NamedTuple):
+    total_sum: float
+    average: float
+    target: float
+    closest: List[str]  # nicknames ordered by distance to target, ties by join order
+
+def score_round(nicknames: List[str], numbers: List[Union[int, float]], multiplier: float, top_k: int = 1) -> RoundScore:
+    """Sum, average, target and the top_k players closest to the target"""
+    if np is not None and len(numbers) >= VECTORIZE_MIN_PLAYERS:
+        return score_round_vectorized(nicknames, numbers, multiplier, top_k)
     
-    for player in room.players.values():
-        if player.connected and not player.is_viewer and player.number is not None:
-            distance = abs(float(player.number) - target)
+    total_sum = sum(numbers)
+    average = total_sum / len(numbers) if numbers else 0
+    target = average * multiplier
+    if top_k == 1:
+        # Strict < keeps the earliest player on ties
+        winner = None
+        min_distance = float('inf')
+        for nickname, number in zip(nicknames, numbers):
+            distance = abs(float(number) - target)
             if distance < min_distance:
                 min_distance = distance
-                winner = player.nickname
+                winner = nickname
+        closest = [winner] if winner is not None else []
+    else:
+        order = sorted(range(len(numbers)), key=lambda i: (abs(float(numbers[i]) - target), i))
+        closest = [nicknames[i] for i in order[:top_k]]
+    return RoundScore(total_sum, average, target, closest)
+
+def score_round_vectorized(nicknames: List[str], numbers: List[Union[int, float]], multiplier: float, top_k: int = 1) -> RoundScore:
+    values = np.fromiter(numbers, dtype=np.float64, count=len(numbers))
+    total_sum = float(values.sum())
+    average = total_sum / len(values)
+    target = average * multiplier
+    distances = np.abs(values - target)
+    if top_k == 1:
+        # argmin returns the first index on ties, same as the plain loop
+        order = [int(np.argmin(distances))]
+    else:
+        k = min(top_k, len(values))
+        candidates = np.argpartition(distances, k - 1)[:k]
+        # Only ties with the k-th distance can be left out of argpartition - pull them all in
+        cutoff = distances[candidates].max()
+        candidates = np.flatnonzero(distances <= cutoff)
+        order = candidates[np.lexsort((candidates, distances[candidates]))][:k].tolist()
+    return RoundScore(total_sum, average, target, [nicknames[i] for i in order])
+
+def calculate_winner(room_id: int):
+    started = time.perf_counter()
+    room = rooms[room_id]
+    
+    # Save to history with proper typing - ONLY playing players (not viewers) who chose,
+    # as a round that timed out leaves the others connected
+    players_data = {p.nickname: p.number for p in room.players.values()
+                    if p.connected and not p.is_viewer and p.number is not None}
+    nicknames = list(players_data)
+    numbers = list(players_data.values())
+    
+    # Calculate average and target using room's multiplier, and find the closest players
+    score = score_round(nicknames, numbers, room.multiplier, top_k=max(ROUND_TOP_K, 1))
     
-    # Save to history with proper typing - ONLY playing players
-    players_data = {p.nickname: p.number for p in room.players.values() if p.connected and not p.is_viewer}
     game_round = GameRound(
         round_number=room.current_round,
         players_data=players_data,
-        total_sum=round(total_sum, 2),
-        average=round(average, 2),
-        target_number=round(target, 2),
-        winner=winner,
-        timestamp=datetime.now(timezone.utc).isoformat()
+        total_sum=round(score.total_sum, 2),
+        average=round(score.average, 2),
+        target_number=round(score.target, 2),
+        winner=score.closest[0] if score.closest else None,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        top_players=score.closest if ROUND_TOP_K > 1 else None
     )
-    room.game_history.append(game_round)
-    room.game_status = "results"
-    
+    room.finish_round(game_round)
+    SCORING_SECONDS.observe(time.perf_counter() - started)
+
+async def schedule_room_state(room_id: int):
+    """Broadcast room state after the coalescing window, merging any changes made meanwhile"""
+    if BROADCAST_COALESCE_MS <= 0:
+        await send_room_state(room_id)
+    elif room_id not in pending_broadcasts:
+        pending_broadcasts[room_id] = asyncio.create_task(flush_room_state(room_id))
+
+async def flush_room_state(room_id: int):
+    await asyncio.sleep(BROADCAST_COALESCE_MS / 1000)
+    pending_broadcasts.pop(room_id, None)
     await send_room_state(room_id)
 
 async def send_room_state(room_id: int):
-    room = rooms[room_id]
+    # An immediate broadcast carries everything a pending coalesced one would
+    pending = pending_broadcasts.pop(room_id, None)
+    if pending is not None and pending is not asyncio.current_task():
+        pending.cancel()
     
-    # Ensure only ONE admin exists among connected players
-    connected_admins = [p for p in room.players.values() if p.is_admin and p.connected]
-    if len(connected_admins) > 1:
-        # Keep only the first admin, remove from others
-        for admin in connected_admins[1:]:
-            admin.is_admin = False
-    elif len(connected_admins) == 0 and any(p.connected for p in room.players.values()):
-        # No admin but there are connected players - promote first connected
-        for player in room.players.values():
-            if player.connected:
-                player.is_admin = True
-                break
+    room = rooms.get(room_id)
+    if room is None:
+        return
     
     # Prepare state - only include players who are truly connected
     # For results view, exclude players who didn't choose
     players_list = []
     viewers_count = 0
     for p in room.players.values():
-        # In results state, only show players who actually chose (not viewers)
-        if room.game_status == "results" and p.number is None:
+        # In results state, only show players who actually chose (not viewers) - and
+        # those still connected, e.g. after a round timed out on them
+        if room.game_status == "results" and p.number is None and not p.connected:
             continue
         
         if p.is_viewer:
@@ -403,18 +2424,289 @@ async def send_room_state(room_id: int):
             "connected": p.connected
         })
     
-    state = {
-        "type": "room_state",
-        "room_id": room_id,
-        "players": players_list,
+    fields = {
         "viewers_count": viewers_count,
         "game_status": room.game_status,
         "current_round": room.current_round,
         "multiplier": room.multiplier,
-        "game_history": [h.model_dump() for h in room.game_history]
+        "history_total": len(room.game_history),
+        "round_timeout": room.round_timeout,
+        "round_deadline": room.round_deadline,
+    }
+    sync = room_sync[room_id]
+    patch = diff_room_state(sync, room, fields, players_list)
+    
+    state = {
+        "type": "room_state",
+        "room_id": room_id,
+        "version": sync.version,
+        "players": players_list,
+        **fields,
+        "history_limit": HISTORY_INLINE_ROUNDS,  # clients keep only this many rounds from patches
+        "game_history": list(sync.history)
+    }
+    
+    manager.broadcast_state(room_id, state, patch)
+
+def viewer_state(state: dict) -> dict:
+    """The room_state the viewer tier gets: no player ids and only the latest rounds"""
+    return {
+        **state,
+        "players": [{k: v for k, v in player.items() if k != "player_id"} for player in state["players"]],
+        "history_limit": VIEWER_HISTORY_ROUNDS,
+        "game_history": state["game_history"][-VIEWER_HISTORY_ROUNDS:] if VIEWER_HISTORY_ROUNDS > 0 else [],
     }
+
+def diff_room_state(sync: RoomSync, room: RoomState, fields: dict, players_list: List[dict]) -> Optional[dict]:
+    """Diff the new state against the last broadcast and advance sync; None when nothing changed"""
+    patch = {}
     
-    await manager.broadcast(room_id, state)
+    changed_fields = {k: v for k, v in fields.items() if k not in sync.fields or sync.fields[k] != v}
+    if changed_fields:
+        patch["set"] = changed_fields
+    
+    players = {p["nickname"]: p for p in players_list}
+    removed = [name for name in sync.players if name not in players]
+    upserted = [p for name, p in players.items() if sync.players.get(name) != p]
+    players_patch = {}
+    if removed:
+        players_patch["remove"] = removed
+    if upserted:
+        players_patch["upsert"] = upserted
+    # Clients update existing entries in place and append new ones - send the
+    # full order only when that would not reproduce the broadcast order
+    expected_order = [name for name in sync.players if name in players]
+    expected_order += [name for name in players if name not in sync.players]
+    if expected_order != list(players):
+        players_patch["order"] = list(players)
+    if players_patch:
+        patch["players"] = players_patch
+    
+    # History only grows between clears, so normally just the new rounds are sent;
+    # clients drop rounds beyond history_limit themselves
+    if sync.history_source is not room.game_history:
+        if sync.history:
+            patch["history_reset"] = True
+        sync.history.clear()
+        sync.rounds_seen = 0
+    new_rounds = min(room.rounds_recorded - sync.rounds_seen, HISTORY_INLINE_ROUNDS, len(room.game_history))
+    if new_rounds > 0:
+        appended = [h.to_dict() for h in room.game_history[-new_rounds:]]
+        sync.history.extend(appended)
+        patch["history_append"] = appended
+    sync.history_source = room.game_history
+    sync.rounds_seen = room.rounds_recorded
+    
+    sync.fields = fields
+    sync.players = players
+    if not patch:
+        return None
+    
+    sync.version += 1
+    return {
+        "type": "room_patch",
+        "room_id": room.room_id,
+        "version": sync.version,
+        "base_version": sync.version - 1,
+        **patch
+    }
+
+async def collect_idle_rooms():
+    """Periodically garbage-collect empty on-demand rooms"""
+    while True:
+        await asyncio.sleep(ROOM_GC_INTERVAL)
+        removed = registry.collect_idle()
+        if removed:
+            logger.info(f"Collected {removed} idle rooms")
+
+@app.on_event("startup")
+async def start_room_gc():
+    asyncio.create_task(collect_idle_rooms())
+
+async def probe_event_loop_lag():
+    """Measure how much later than asked a sleeping task gets to run"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(METRICS_LOOP_LAG_INTERVAL)
+        LOOP_LAG.observe(max(time.perf_counter() - started - METRICS_LOOP_LAG_INTERVAL, 0))
+
+@app.on_event("startup")
+async def start_lag_probe():
+    asyncio.create_task(probe_event_loop_lag())
+
+def sweep_connections() -> int:
+    """Ping sockets that have gone quiet and evict those quiet past HEARTBEAT_TIMEOUT that have
+    answered a ping before; returns how many were evicted"""
+    now = time.monotonic()
+    stale = []
+    for connections in room_connections.values():
+        # Clients of other shards are swept by their edge, which owns the socket
+        stale.extend(c for c in connections.values() if isinstance(c, ClientConnection))
+    stale.extend(proxied_connections.values())
+    stale.extend(lobby.subscribers)
+    evicted = 0
+    for connection in stale:
+        quiet = now - connection.last_seen
+        # Half an interval, so a client that answered just after the last sweep is still pinged in time
+        if connection.closed or quiet < HEARTBEAT_INTERVAL / 2:
+            continue
+        if quiet <= HEARTBEAT_TIMEOUT or not connection.answers_pings:
+            connection.send(PING_FRAME)
+            continue
+        logger.info(f"Evicting {connection.nickname} in room {connection.room_id}, silent for {quiet:.0f}s")
+        connection.close(drop_socket=True)
+        if type(connection) is ClientConnection:
+            registry.submit(connection.room_id, handle_disconnect, connection.nickname, connection)
+        else:
+            connection.lost()
+        evicted += 1
+    HEARTBEAT_EVICTIONS.inc(evicted)
+    return evicted
+
+async def run_heartbeat():
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            sweep_connections()
+        except Exception as e:
+            logger.error(f"Heartbeat sweep failed: {e}")
+
+@app.on_event("startup")
+async def start_heartbeat():
+    if HEARTBEAT_INTERVAL > 0:
+        asyncio.create_task(run_heartbeat())
+
+@app.on_event("startup")
+async def start_round_timers():
+    round_timers.start()
+
+@app.on_event("shutdown")
+async def stop_round_timers():
+    round_timers.stop()
+
+def event_log_dir(shard: int) -> Path:
+    """Where a shard's event log lives - one directory per worker when there are several"""
+    log_dir = ROOT_DIR / EVENT_LOG_DIR
+    if BACKPLANE_URL and SHARD_COUNT > 1:
+        log_dir = log_dir / f"shard-{shard}"
+    return log_dir
+
+# The rooms as they were when a shutdown signal arrived - see freeze_rooms
+shutdown_state: Optional[dict] = None
+
+def capture_rooms() -> dict:
+    return shutdown_state if shutdown_state is not None else registry.snapshot()
+
+def freeze_rooms():
+    """The server is about to close every socket: keep the rooms as they are being played and
+    log none of the disconnects that follow, so a restart resumes the games"""
+    global shutdown_state
+    if event_log is None or event_log.frozen:
+        return
+    shutdown_state = registry.snapshot()
+    event_log.freeze()
+
+def watch_shutdown_signals():
+    """Freeze the rooms on SIGINT/SIGTERM, before the server's own handler starts closing sockets"""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(signum)
+        if not callable(previous):
+            continue  # the default action or ignored - no graceful shutdown to get ahead of
+        def on_signal(received, frame, previous=previous):
+            loop.call_soon_threadsafe(freeze_rooms)
+            previous(received, frame)
+        signal.signal(signum, on_signal)
+
+async def snapshot_rooms():
+    """Periodically compact the event log into a snapshot"""
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        if event_log.seq == event_log.snapshot_seq:
+            continue
+        try:
+            await event_log.snapshot(capture_rooms)
+        except Exception as e:
+            logger.error(f"Snapshot failed: {e}")
+
+def recover_rooms(log: EventLog):
+    """Rebuild the registry from the log, before the log records anything"""
+    snapshot, events = log.load()
+    registry.restore(snapshot, events)
+    if not log.archive_found:
+        # First run with an archive - seed it with the rounds logged before, as far as rooms still hold them
+        for (_, room_id, _), data in memory_rounds(("", 0, 0)):
+            log.archive({"room": room_id, "op": "round_finished", "round": data})
+
+@app.on_event("startup")
+async def restore_rooms():
+    global event_log
+    if not EVENT_LOG_DIR:
+        return
+    started = time.perf_counter()
+    log = EventLog(event_log_dir(SHARD_ID), encode_message, decode_message, flush_interval=EVENT_LOG_FLUSH_MS / 1000)
+    recover_rooms(log)
+    logger.info(f"Restored {len(rooms)} rooms up to event {log.seq} in {time.perf_counter() - started:.3f}s")
+    await log.start()
+    event_log = log
+    asyncio.create_task(snapshot_rooms())
+    absent = {room_id: list(room.players) for room_id, room in rooms.items() if room.players}
+    if absent:
+        asyncio.create_task(forget_absent_players(absent))
+    watch_shutdown_signals()
+
+async def forget_absent_players(absent: Dict[int, List[str]]):
+    await asyncio.sleep(RESTORE_REJOIN_SECONDS)
+    for room_id, nicknames in absent.items():
+        registry.submit(room_id, drop_absent_players, nicknames)
+
+def drop_absent_players(room_id: int, nicknames: List[str]) -> int:
+    """The rejoin window after a restart is over - drop the restored players who didn't
+    come back, or free the room if nobody did"""
+    room = rooms.get(room_id)
+    if room is None:
+        return NO_BROADCAST
+    absent = [nickname for nickname in nicknames if nickname in room.players and not room.players[nickname].connected]
+    if not absent:
+        return NO_BROADCAST
+    if room.connected_count == 0:
+        registry.release(room_id)
+        return NO_BROADCAST
+    for nickname in absent:
+        room.remove_player(nickname)
+    # They may have been the only ones the round was waiting for
+    if room.game_status == "choosing" and room.all_chosen:
+        calculate_winner(room_id)
+    return IMMEDIATE_BROADCAST
+
+@app.on_event("startup")
+async def start_backplane():
+    # After restore, so relayed clients only ever see recovered rooms
+    global backplane
+    if BACKPLANE_URL:
+        backplane = RespBackplane(BACKPLANE_URL, encode_message, decode_message)
+    else:
+        backplane = InProcessBackplane()
+    await backplane.start()
+    for shard in sorted(SERVED_SHARDS):
+        await backplane.subscribe(shard_channel(shard), handle_shard_message)
+    logger.info(f"Serving shards {sorted(SERVED_SHARDS)} of {SHARD_COUNT}")
+
+@app.on_event("shutdown")
+async def stop_backplane():
+    if backplane is not None:
+        await backplane.stop()
+
+@app.on_event("shutdown")
+async def close_event_log():
+    # Connections are already closed here. If a shutdown signal froze the log
+    # before that, the rooms as they were then make the final snapshot.
+    if event_log is not None:
+        if shutdown_state is not None:
+            await event_log.snapshot(capture_rooms)
+        await event_log.stop()
 
 # Include the router in the main app
 app.include_router(api_router)
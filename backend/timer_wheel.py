@@ -0,0 +1,98 @@
+"""
+Hierarchical timing wheel: many keyed timers driven by one periodic tick.
+
+Level 0 has SLOTS slots of one tick each, level 1 SLOTS slots of SLOTS ticks,
+and so on. A timer sits in the coarsest level its remaining time fits and
+moves down a level each time its slot comes up, so every tick touches only
+the timers that are due plus those cascading down - about 1/SLOTS of the
+timers per level per SLOTS ticks - however many are pending. Scheduling and
+cancelling are O(1).
+
+Each key has at most one timer; scheduling a key again replaces its timer.
+"""
+import asyncio
+import logging
+import math
+from typing import Callable, Dict, Hashable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    def __init__(self, on_expire: Callable[[Hashable, object], None], tick: float = 1.0, slots: int = 64, levels: int = 4):
+        self.on_expire = on_expire  # called as on_expire(key, value) when a timer fires
+        self.tick = tick  # seconds
+        self.slots = slots
+        self.levels = levels
+        self.span = slots ** levels  # ticks; timers further out wait at the top level and are placed again
+        self.wheels: List[List[Dict[Hashable, int]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.timers: Dict[Hashable, Tuple[int, int, int, object]] = {}  # key -> (level, slot, deadline tick, value)
+        self.ticks = 0  # ticks elapsed
+        self._task = None
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def schedule(self, key: Hashable, delay: float, value: object = None):
+        """Fire on_expire(key, value) after delay seconds (rounded up to whole ticks)"""
+        self.cancel(key)
+        self._place(key, self.ticks + max(math.ceil(delay / self.tick), 1), value)
+
+    def cancel(self, key: Hashable):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            level, slot, _, _ = timer
+            del self.wheels[level][slot][key]
+
+    def _place(self, key: Hashable, deadline: int, value: object):
+        # Where a timer due at `deadline` waits, as seen from the current tick
+        target = min(deadline, self.ticks + self.span - 1)
+        remaining = target - self.ticks
+        level = 0
+        size = 1  # ticks per slot at this level
+        while level < self.levels - 1 and remaining >= size * self.slots:
+            level += 1
+            size *= self.slots
+        slot = (target // size) % self.slots
+        self.wheels[level][slot][key] = deadline
+        self.timers[key] = (level, slot, deadline, value)
+
+    def advance(self):
+        """Move time on by one tick and fire what is due"""
+        self.ticks += 1
+        # Coarser slots whose time has come are redistributed first, so their
+        # timers due this very tick land in the level 0 slot fired below
+        size = self.slots
+        for level in range(1, self.levels):
+            if self.ticks % size:
+                break
+            slot = (self.ticks // size) % self.slots
+            entries, self.wheels[level][slot] = self.wheels[level][slot], {}
+            for key, deadline in entries.items():
+                _, _, _, value = self.timers.pop(key)
+                self._place(key, deadline, value)
+            size *= self.slots
+        due, self.wheels[0][self.ticks % self.slots] = self.wheels[0][self.ticks % self.slots], {}
+        for key in due:
+            _, _, _, value = self.timers.pop(key)
+            try:
+                self.on_expire(key, value)
+            except Exception as e:
+                logger.error(f"Timer {key!r} failed: {e}")
+
+    async def run(self):
+        """Tick in real time; ticks missed while the event loop was busy are caught up"""
+        loop = asyncio.get_running_loop()
+        started = loop.time() - self.ticks * self.tick
+        while True:
+            await asyncio.sleep(started + (self.ticks + 1) * self.tick - loop.time())
+            while self.ticks < (loop.time() - started) // self.tick:
+                self.advance()
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
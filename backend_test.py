@@ -79,7 +79,7 @@ class GameAPITester:
         try:
             room_id = 1
             nickname = f"test_user_{int(time.time())}"
-            ws_url = f"{self.ws_url}/api/ws/{room_id}/{nickname}"
+            ws_url = f"{self.ws_url}/api/ws/{room_id}/{nickname}?full_state=true"
             
             print(f"Connecting to: {ws_url}")
             
@@ -135,8 +135,8 @@ class GameAPITester:
             player2 = f"player_{int(time.time())}"
             
             # Connect both players
-            ws1_url = f"{self.ws_url}/api/ws/{room_id}/{player1}"
-            ws2_url = f"{self.ws_url}/api/ws/{room_id}/{player2}"
+            ws1_url = f"{self.ws_url}/api/ws/{room_id}/{player1}?full_state=true"
+            ws2_url = f"{self.ws_url}/api/ws/{room_id}/{player2}?full_state=true"
             
             ws1 = websocket.create_connection(ws1_url, timeout=10)
             time.sleep(0.5)  # Small delay
@@ -248,9 +248,9 @@ class GameAPITester:
             regular = f"regular_{int(time.time())}"
             
             # Connect admin first, then regular player
-            ws_admin = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{admin}", timeout=10)
+            ws_admin = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{admin}?full_state=true", timeout=10)
             time.sleep(0.5)
-            ws_regular = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{regular}", timeout=10)
+            ws_regular = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{regular}?full_state=true", timeout=10)
             
             # Clear initial messages
             ws_admin.recv()
@@ -306,9 +306,9 @@ class GameAPITester:
             late_joiner = f"late_{int(time.time())}"
             
             # Start a game with 2 players
-            ws_admin = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{admin}", timeout=10)
+            ws_admin = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{admin}?full_state=true", timeout=10)
             time.sleep(0.5)
-            ws_player2 = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{player2}", timeout=10)
+            ws_player2 = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{player2}?full_state=true", timeout=10)
             
             # Clear messages and start game
             ws_admin.recv()
@@ -323,7 +323,7 @@ class GameAPITester:
             
             # Now try to join with a third player
             try:
-                ws_late = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{late_joiner}", timeout=10)
+                ws_late = websocket.create_connection(f"{self.ws_url}/api/ws/{room_id}/{late_joiner}?full_state=true", timeout=10)
                 
                 # Should receive error message
                 msg = ws_late.recv()
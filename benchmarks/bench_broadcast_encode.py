@@ -0,0 +1,102 @@
+"""
+Micro-benchmark: cost of encoding one room_state broadcast as the room grows.
+
+Compares the old behaviour (every socket re-serializes the state with
+send_json) against the shared Frame that is encoded once per broadcast.
+
+Run from the repository root:
+    python benchmarks/bench_broadcast_encode.py
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+ROOM_SIZES = [1, 10, 100, 1000]
+BROADCASTS = 50
+HISTORY_ROUNDS = 30
+
+
+class NullWebSocket:
+    """Accepts frames without doing any I/O so only encoding is measured"""
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        pass
+
+    async def send_json(self, message):
+        json.dumps(message)
+
+    async def close(self):
+        pass
+
+
+def sample_state(player_count):
+    players = [{
+        "player_id": f"player-{i}",
+        "nickname": f"שחקן {i}",
+        "is_admin": i == 0,
+        "has_chosen": True,
+        "number": i % 101,
+        "connected": True
+    } for i in range(min(player_count, 50))]
+    history = [{
+        "round_number": r,
+        "players_data": {p["nickname"]: p["number"] for p in players},
+        "total_sum": 1234.0,
+        "average": 41.13,
+        "target_number": 32.9,
+        "winner": players[0]["nickname"],
+        "timestamp": "2026-01-01T00:00:00+00:00"
+    } for r in range(HISTORY_ROUNDS)]
+    return {
+        "type": "room_state",
+        "room_id": 1,
+        "version": 1,
+        "players": players,
+        "viewers_count": 0,
+        "game_status": "results",
+        "current_round": HISTORY_ROUNDS,
+        "multiplier": 0.8,
+        "game_history": history
+    }
+
+
+async def per_socket_encode(sockets, state):
+    for websocket in sockets:
+        await websocket.send_json(state)
+
+
+async def shared_frame_encode(sockets, state):
+    frame = server.Frame(state)
+    for websocket in sockets:
+        await websocket.send_text(frame.text)
+
+
+async def measure(send, sockets, state):
+    start = time.perf_counter()
+    for _ in range(BROADCASTS):
+        await send(sockets, state)
+    return (time.perf_counter() - start) / BROADCASTS * 1000
+
+
+async def main():
+    encoder = "orjson" if server.orjson is not None else "json"
+    print(f"Shared frame encoder: {encoder}")
+    print(f"{'sockets':>8} {'per-socket ms':>15} {'shared ms':>12} {'speedup':>9}")
+    for size in ROOM_SIZES:
+        sockets = [NullWebSocket() for _ in range(size)]
+        state = sample_state(size)
+        per_socket = await measure(per_socket_encode, sockets, state)
+        shared = await measure(shared_frame_encode, sockets, state)
+        print(f"{size:>8} {per_socket:>15.3f} {shared:>12.3f} {per_socket / shared:>8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
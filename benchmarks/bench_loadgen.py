@@ -0,0 +1,261 @@
+"""
+Load generator: thousands of simulated players and viewers playing full rounds.
+
+Runs the FastAPI app in-process and talks to its websocket endpoint over the
+ASGI protocol, so the whole server path is exercised without a network or a
+live server. Every room plays ROUNDS rounds: the admin sends start_game, each
+player chooses a number after a random think time, and everyone waits for the
+results. Reports action-to-broadcast latency (from sending an action until
+that client receives the next state update) plus frames/sec and bytes/sec
+delivered to clients.
+
+Results are written as JSON (by default to benchmarks/results/<commit>.json);
+pass --compare with an earlier file to see what changed between commits.
+
+Run from the repository root:
+    python benchmarks/bench_loadgen.py --rooms 100 --players 20 --viewers 5
+    python benchmarks/bench_loadgen.py --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+# A benchmark run should not touch the durable event log unless asked to
+os.environ.setdefault("EVENT_LOG_DIR", "")
+# Simulated admins start rounds faster than the per-room limit allows a person to
+os.environ.setdefault("RATE_LIMIT_SCALE", "0")
+
+import server  # noqa: E402
+
+FIRST_ROOM_ID = 1000  # clear of the permanent rooms
+
+
+class Client:
+    """One simulated browser tab, connected to the app's websocket endpoint over ASGI"""
+    def __init__(self, stats: "Stats", room_id: int, nickname: str, viewer: bool = False):
+        self.stats = stats
+        self.room_id = room_id
+        self.nickname = nickname
+        self.viewer = viewer
+        self.game_status = None
+        self.current_round = 0
+        self.changed = asyncio.Event()
+        self.action_sent_at = None  # set while an action waits for its broadcast
+        self.to_app: asyncio.Queue = asyncio.Queue()
+        self.from_app: asyncio.Queue = asyncio.Queue()
+        self.app_task = None
+        self.reader = None
+
+    async def connect(self):
+        query = urlencode({"viewer": "true"} if self.viewer else {})
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": f"/api/ws/{self.room_id}/{self.nickname}",
+            "raw_path": f"/api/ws/{self.room_id}/{self.nickname}".encode(),
+            "query_string": query.encode(),
+            "headers": [],
+            "subprotocols": [],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 8000),
+        }
+        self.app_task = asyncio.create_task(server.app(scope, self.to_app.get, self.from_app.put))
+        await self.to_app.put({"type": "websocket.connect"})
+        reply = await self.from_app.get()
+        if reply["type"] != "websocket.accept":
+            raise RuntimeError(f"{self.nickname} was refused by room {self.room_id}")
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            message = await self.from_app.get()
+            if message["type"] == "websocket.close":
+                return
+            text = message.get("text") or message.get("bytes", b"").decode()
+            self.stats.frames += 1
+            self.stats.bytes += len(text.encode())
+            self._apply(json.loads(text))
+
+    def _apply(self, message: dict):
+        if message.get("type") == "room_state":
+            fields = message
+        elif message.get("type") == "room_patch":
+            fields = message.get("set", {})
+        else:
+            return
+        if self.action_sent_at is not None:
+            self.stats.latencies.append(time.perf_counter() - self.action_sent_at)
+            self.action_sent_at = None
+        self.game_status = fields.get("game_status", self.game_status)
+        self.current_round = fields.get("current_round", self.current_round)
+        self.changed.set()
+
+    def act(self, action: dict):
+        self.action_sent_at = time.perf_counter()
+        self.stats.actions += 1
+        self.to_app.put_nowait({"type": "websocket.receive", "text": json.dumps(action)})
+
+    async def wait_for(self, game_status: str, round_number: int):
+        while self.game_status != game_status or self.current_round != round_number:
+            self.changed.clear()
+            await self.changed.wait()
+
+    async def close(self):
+        await self.to_app.put({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self.app_task, 5)
+        except asyncio.TimeoutError:
+            self.app_task.cancel()
+        self.reader.cancel()
+
+
+class Stats:
+    def __init__(self):
+        self.actions = 0
+        self.frames = 0
+        self.bytes = 0
+        self.latencies = []
+
+
+async def lifespan(event: str):
+    """Run the app's startup or shutdown handlers through the ASGI lifespan protocol"""
+    if event == "startup":
+        await server.app.router.startup()
+    else:
+        await server.app.router.shutdown()
+
+
+async def play_player(client: Client, round_number: int, think_ms: float):
+    await client.wait_for("choosing", round_number)
+    await asyncio.sleep(random.uniform(0, think_ms) / 1000)
+    client.act({"action": "choose_number", "number": random.randint(0, 100)})
+    await client.wait_for("results", round_number)
+
+
+async def play_room(players, viewers, rounds: int, think_ms: float):
+    # The first player to join is the room's admin
+    admin = players[0]
+    for round_number in range(1, rounds + 1):
+        admin.act({"action": "start_game"})
+        await asyncio.gather(*(play_player(player, round_number, think_ms) for player in players))
+        await asyncio.gather(*(viewer.wait_for("results", round_number) for viewer in viewers))
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    stats = Stats()
+    await lifespan("startup")
+    rooms = {}
+    for room_id in range(FIRST_ROOM_ID, FIRST_ROOM_ID + args.rooms):
+        players = [Client(stats, room_id, f"player{i}") for i in range(args.players)]
+        viewers = [Client(stats, room_id, f"viewer{i}", viewer=True) for i in range(args.viewers)]
+        for client in players + viewers:
+            await client.connect()
+        rooms[room_id] = (players, viewers)
+    # Everyone has their initial state before the clock starts
+    await asyncio.gather(*(client.wait_for("waiting", 0) for players, viewers in rooms.values() for client in players + viewers))
+    stats.__init__()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play_room(players, viewers, args.rounds, args.think_ms) for players, viewers in rooms.values()))
+    duration = time.perf_counter() - start
+
+    for players, viewers in rooms.values():
+        for client in players + viewers:
+            await client.close()
+    await lifespan("shutdown")
+
+    latencies = sorted(latency * 1000 for latency in stats.latencies)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "rooms": args.rooms,
+            "players": args.players,
+            "viewers": args.viewers,
+            "rounds": args.rounds,
+            "think_ms": args.think_ms,
+            "seed": args.seed,
+            "broadcast_coalesce_ms": server.BROADCAST_COALESCE_MS,
+            "rate_limit_scale": server.RATE_LIMIT_SCALE,
+        },
+        "results": {
+            "duration_s": round(duration, 3),
+            "actions": stats.actions,
+            "frames": stats.frames,
+            "bytes": stats.bytes,
+            "latency_p50_ms": round(percentile(latencies, 0.50), 3),
+            "latency_p95_ms": round(percentile(latencies, 0.95), 3),
+            "latency_p99_ms": round(percentile(latencies, 0.99), 3),
+            "latency_max_ms": round(latencies[-1] if latencies else 0.0, 3),
+            "frames_per_sec": round(stats.frames / duration, 1),
+            "bytes_per_sec": round(stats.bytes / duration, 1),
+        },
+    }
+
+
+def print_results(report: dict, baseline: dict = None):
+    config = report["config"]
+    print(f"Rooms: {config['rooms']}, players/room: {config['players']}, viewers/room: {config['viewers']}, "
+          f"rounds: {config['rounds']}, commit: {report['commit']}")
+    for name, value in report["results"].items():
+        line = f"{name:>16} {value:>14}"
+        if baseline is not None and name in baseline["results"]:
+            old = baseline["results"][name]
+            change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+            line += f"  (was {old}, {change})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--players", type=int, default=20, help="players per room")
+    parser.add_argument("--viewers", type=int, default=5, help="viewers per room")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--think-ms", type=float, default=50, help="longest delay before a player chooses")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="where to write the JSON results")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    report = asyncio.run(run(args))
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_results(report, baseline)
+
+    output = args.output or ROOT_DIR / "benchmarks" / "results" / f"{report['commit'] or 'latest'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: memory per player and time per broadcast, pydantic models vs the
+slotted runtime classes in backend/server.py.
+
+The pydantic models below are the ones the game state used before. Each
+broadcast changes one player's number and every PLAYERS-th one records a
+round, like a room playing through its rounds.
+
+Run from the repository root:
+    python benchmarks/bench_models.py
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+ROOM_SIZES = [10, 100, 1000]
+BROADCASTS = 300
+MEMORY_PLAYERS = 10000
+
+
+class PydanticPlayer(BaseModel):
+    player_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    nickname: str
+    is_admin: bool = False
+    is_viewer: bool = False
+    number: Optional[Union[int, float]] = None
+    connected: bool = True
+
+
+class PydanticGameRound(BaseModel):
+    round_number: int
+    players_data: Dict[str, Union[int, float]]
+    total_sum: float
+    average: float
+    target_number: float
+    winner: str
+    timestamp: str
+    top_players: Optional[List[str]] = None
+
+    def to_dict(self):
+        return self.model_dump(exclude_none=True)
+
+
+def memory_per_player(player_class):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    players = [player_class(nickname=f"player{i}", number=i % 101) for i in range(MEMORY_PLAYERS)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # Nicknames and ids cost the same either way - count only what the objects add
+    strings = sum(sys.getsizeof(p.nickname) + sys.getsizeof(p.player_id) for p in players)
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return (total - strings) / len(players)
+
+
+async def time_per_broadcast(player_class, round_class, size):
+    server.registry = server.RoomRegistry({})
+    server.rooms = server.registry.rooms
+    server.room_sync = server.registry.sync
+    server.room_connections = server.registry.connections
+    room = server.registry.create(1)
+    for i in range(size):
+        room.add_player(player_class(nickname=f"player{i}"))
+    server.manager.broadcast_state = lambda room_id, state, patch: server.Frame(patch or state).text
+    nicknames = list(room.players)
+
+    start = time.perf_counter()
+    for i in range(BROADCASTS):
+        if i % size == 0:
+            room.start_round()
+        room.set_number(nicknames[i % size], i % 101)
+        if i % size == size - 1:
+            room.finish_round(round_class(
+                round_number=room.current_round,
+                players_data={p.nickname: p.number for p in room.players.values()},
+                total_sum=1.0, average=1.0, target_number=1.0,
+                winner=nicknames[0], timestamp="2026-01-01T00:00:00+00:00"
+            ))
+        await server.send_room_state(1)
+    return (time.perf_counter() - start) / BROADCASTS * 1000
+
+
+async def main():
+    pydantic_bytes = memory_per_player(PydanticPlayer)
+    slotted_bytes = memory_per_player(server.Player)
+    print(f"Memory per player: pydantic {pydantic_bytes:.0f} B, slotted {slotted_bytes:.0f} B")
+    print(f"{'players':>8} {'pydantic ms':>12} {'slotted ms':>11} {'speedup':>8}")
+    for size in ROOM_SIZES:
+        before = await time_per_broadcast(PydanticPlayer, PydanticGameRound, size)
+        after = await time_per_broadcast(server.Player, server.GameRound, size)
+        print(f"{size:>8} {before:>12.3f} {after:>11.3f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark: rebuilding rooms from the event log snapshot plus its tail.
+
+Plays ROUNDS rounds in each of ROOMS on-demand rooms with the event log
+enabled, snapshots, plays one more round everywhere (the log tail), then
+times a restore into an empty registry.
+
+Run from the repository root:
+    python benchmarks/bench_restore.py
+"""
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from event_log import EventLog  # noqa: E402
+
+ROOMS = 5000
+PLAYERS_PER_ROOM = 8
+ROUNDS = 10
+
+
+def play_round(room):
+    room.start_round()
+    for nickname in room.players:
+        room.set_number(nickname, random.randint(0, 100))
+    nicknames = list(room.players)
+    numbers = [room.players[n].number for n in nicknames]
+    score = server.score_round(nicknames, numbers, room.multiplier)
+    room.finish_round(server.GameRound(
+        round_number=room.current_round,
+        players_data=dict(zip(nicknames, numbers)),
+        total_sum=round(score.total_sum, 2),
+        average=round(score.average, 2),
+        target_number=round(score.target, 2),
+        winner=score.closest[0],
+        timestamp="2026-01-01T00:00:00+00:00"
+    ))
+
+
+def fresh_registry():
+    server.registry = server.RoomRegistry(server.ROOM_NAMES)
+    server.rooms = server.registry.rooms
+    server.room_connections = server.registry.connections
+    server.room_sync = server.registry.sync
+
+
+async def main():
+    random.seed(3)
+    with tempfile.TemporaryDirectory() as directory:
+        log = EventLog(directory, server.encode_message)
+        log.load()
+        await log.start()
+        server.event_log = log
+
+        for room_id in range(100, 100 + ROOMS):
+            room = server.registry.create(room_id)
+            for i in range(PLAYERS_PER_ROOM):
+                room.add_player(server.Player(nickname=f"player{i}"))
+            for _ in range(ROUNDS):
+                play_round(room)
+
+        start = time.perf_counter()
+        await log.snapshot(server.registry.snapshot)
+        snapshot_time = time.perf_counter() - start
+
+        for room_id in range(100, 100 + ROOMS):
+            play_round(server.rooms[room_id])
+        tail_events = log.seq - log.snapshot_seq
+        await log.stop()
+        server.event_log = None
+
+        fresh_registry()
+        start = time.perf_counter()
+        restored = EventLog(directory, server.encode_message, server.decode_message)
+        snapshot, events = restored.load()
+        server.registry.restore(snapshot, events)
+        restore_time = time.perf_counter() - start
+
+        sample = server.rooms[100]
+        assert sample.current_round == ROUNDS + 1 and len(sample.game_history) == ROUNDS + 1
+        print(f"Rooms: {ROOMS}, players/room: {PLAYERS_PER_ROOM}, rounds/room: {ROUNDS + 1}")
+        print(f"Snapshot write: {snapshot_time:.3f}s, log tail: {tail_events} events")
+        print(f"Restore: {restore_time:.3f}s for {len(server.rooms)} rooms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
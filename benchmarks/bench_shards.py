@@ -0,0 +1,136 @@
+"""
+Benchmark: game throughput with rooms sharded across worker processes.
+
+Starts the RESP stand-in broker and N shard processes (the room logic of
+backend/server.py, without the HTTP layer), then acts as an edge shard for
+ROOMS rooms of PLAYERS clients each: every round the admin starts a game and
+every player chooses a number. Reports handled client actions per second for
+each worker count. Scaling is bounded by the cores available - with fewer
+cores than WORKER_COUNTS the extra shards only add relay overhead.
+
+Run from the repository root:
+    python benchmarks/bench_shards.py
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from backplane import RespBackplane, serve_forever  # noqa: E402
+
+WORKER_COUNTS = [1, 2, 4]
+ROOMS = 64
+PLAYERS = 16
+ROUNDS = 20
+
+
+def run_broker(url):
+    asyncio.run(serve_forever(url))
+
+
+def run_shard(url, shard_count, shard_id, ready_path):
+    os.environ.update(SHARD_COUNT=str(shard_count), SHARD_ID=str(shard_id), BACKPLANE_URL=url,
+                      BROADCAST_COALESCE_MS="0", EVENT_LOG_DIR="", RATE_LIMIT_SCALE="0")
+    import logging
+    logging.disable(logging.ERROR)  # the broker going away at the end is expected
+    import server
+
+    async def main():
+        await server.start_backplane()
+        Path(ready_path).touch()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+class Edge:
+    """Plays every client; the shards see it as one more worker holding the websockets"""
+    def __init__(self, url, shard_count):
+        import server  # only for its encoder and channel naming, no shard runs here
+        self.server = server
+        self.shard_count = shard_count
+        self.edge_id = shard_count  # any index outside the shard range
+        self.backplane = RespBackplane(url, server.encode_message, server.decode_message)
+        self.greeted = set()
+        self.results = 0
+        self.progress = asyncio.Event()
+
+    async def start(self):
+        await self.backplane.start()
+        await self.backplane.subscribe(self.server.shard_channel(self.edge_id), self.on_deliver)
+
+    async def on_deliver(self, message):
+        for conn_id, _ in message["deliveries"]:
+            self.greeted.add(conn_id)
+        self.results += sum('"game_status":"results"' in text for _, text in message["frames"])
+        self.progress.set()
+
+    def send(self, room, op, conn_id, **data):
+        channel = self.server.shard_channel(room % self.shard_count)
+        self.backplane.publish(channel, {"op": op, "conn": conn_id, **data})
+
+    async def wait_for(self, condition):
+        while not condition():
+            self.progress.clear()
+            await self.progress.wait()
+
+
+async def drive(url, shard_count):
+    edge = Edge(url, shard_count)
+    await edge.start()
+    clients = {room_id: [f"{room_id}-{i}" for i in range(PLAYERS)] for room_id in range(1000, 1000 + ROOMS)}
+    for room_id, conn_ids in clients.items():
+        for i, conn_id in enumerate(conn_ids):
+            edge.send(room_id, "connect", conn_id, edge=edge.edge_id, room_id=room_id,
+                      nickname=f"player{i}", viewer=False, full_state=False)
+    await edge.wait_for(lambda: len(edge.greeted) == ROOMS * PLAYERS)
+
+    start = time.perf_counter()
+    for round_number in range(1, ROUNDS + 1):
+        for room_id, conn_ids in clients.items():
+            edge.send(room_id, "message", conn_ids[0], data={"action": "start_game"})
+            for i, conn_id in enumerate(conn_ids):
+                edge.send(room_id, "message", conn_id, data={"action": "choose_number", "number": (i * 7 + round_number) % 101})
+        await edge.wait_for(lambda: edge.results >= round_number * ROOMS)
+    elapsed = time.perf_counter() - start
+    await edge.backplane.stop()
+    return ROUNDS * ROOMS * (PLAYERS + 1) / elapsed
+
+
+def main():
+    context = multiprocessing.get_context("spawn")
+    print(f"Rooms: {ROOMS}, players/room: {PLAYERS}, rounds: {ROUNDS}, cores: {os.cpu_count()}")
+    print(f"{'workers':>8} {'actions/s':>12} {'scaling':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in WORKER_COUNTS:
+            url = f"unix://{directory}/backplane-{workers}.sock"
+            processes = [context.Process(target=run_broker, args=(url,), daemon=True)]
+            processes[0].start()
+            while not os.path.exists(url[len("unix://"):]):
+                time.sleep(0.05)
+            ready_paths = [Path(directory) / f"ready-{workers}-{shard_id}" for shard_id in range(workers)]
+            for shard_id in range(workers):
+                processes.append(context.Process(target=run_shard, args=(url, workers, shard_id, ready_paths[shard_id]), daemon=True))
+                processes[-1].start()
+            # Anything published before a shard subscribes would be lost
+            while not all(path.exists() for path in ready_paths):
+                time.sleep(0.05)
+            try:
+                throughput = asyncio.run(drive(url, workers))
+            finally:
+                for process in reversed(processes):
+                    process.terminate()
+                    process.join()
+            baseline = baseline or throughput
+            print(f"{workers:>8} {throughput:>12.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: round deadline timers on the shared timer wheel.
+
+For each count of pending timers, measures schedule and cancel cost, then
+the cost of a tick: averaged over an hour of one-second ticks in which no
+timer is due (the wheel's bookkeeping, cascades included), and per timer
+fired when every timer comes due within ten minutes.
+
+Run from the repository root:
+    python benchmarks/bench_timers.py
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from timer_wheel import TimerWheel  # noqa: E402
+
+TIMER_COUNTS = [1000, 10000, 100000]
+HOUR = 3600
+
+
+def main():
+    random.seed(1)
+    print(f"{'timers':>8} {'schedule us':>12} {'cancel us':>10} {'idle tick us':>13} {'per fired us':>13}")
+    for count in TIMER_COUNTS:
+        fired = []
+        wheel = TimerWheel(lambda key, value: fired.append(key), tick=1.0)
+
+        start = time.perf_counter()
+        for key in range(count):
+            wheel.schedule(key, random.uniform(HOUR + 1, 2 * HOUR))
+        schedule_us = (time.perf_counter() - start) / count * 1e6
+
+        # An hour of ticks with every timer still ahead
+        start = time.perf_counter()
+        for _ in range(HOUR):
+            wheel.advance()
+        idle_tick_us = (time.perf_counter() - start) / HOUR * 1e6
+        assert not fired
+
+        start = time.perf_counter()
+        for key in range(count):
+            wheel.cancel(key)
+        cancel_us = (time.perf_counter() - start) / count * 1e6
+
+        for key in range(count):
+            wheel.schedule(key, random.uniform(1, 600))
+        start = time.perf_counter()
+        for _ in range(601):
+            wheel.advance()
+        per_fired_us = (time.perf_counter() - start) / count * 1e6
+        assert len(fired) == count
+
+        print(f"{count:>8} {schedule_us:>12.2f} {cancel_us:>10.2f} {idle_tick_us:>13.2f} {per_fired_us:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
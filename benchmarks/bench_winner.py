@@ -0,0 +1,85 @@
+"""
+Benchmark: scoring a round with the original three-pass loop vs score_round.
+
+Run from the repository root:
+    python benchmarks/bench_winner.py
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+PLAYER_COUNTS = [10, 1_000, 100_000]
+MULTIPLIER = 0.8
+TOP_K = 10
+
+
+def legacy_loop(players):
+    """The calculate_winner loop before vectorization, over (nickname, number) pairs"""
+    numbers = [number for _, number in players]
+    total_sum = sum(numbers)
+    average = total_sum / len(numbers) if numbers else 0
+    target = average * MULTIPLIER
+
+    winner = None
+    min_distance = float('inf')
+    for nickname, number in players:
+        distance = abs(float(number) - target)
+        if distance < min_distance:
+            min_distance = distance
+            winner = nickname
+
+    players_data = {nickname: number for nickname, number in players}
+    return winner, players_data
+
+
+def python_path(players):
+    """score_round with NumPy disabled, whatever the room size"""
+    nicknames = [nickname for nickname, _ in players]
+    numbers = [number for _, number in players]
+    saved, server.np = server.np, None
+    try:
+        return server.score_round(nicknames, numbers, MULTIPLIER)
+    finally:
+        server.np = saved
+
+
+def vectorized_path(players, top_k=1):
+    nicknames = [nickname for nickname, _ in players]
+    numbers = [number for _, number in players]
+    return server.score_round_vectorized(nicknames, numbers, MULTIPLIER, top_k)
+
+
+def measure(func, *args):
+    repeat = max(3, 200_000 // len(args[0]))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    if server.np is None:
+        print("NumPy is not installed - only the Python path can be measured")
+    random.seed(7)
+    print(f"{'players':>8} {'legacy ms':>11} {'python ms':>11} {'numpy ms':>10} {'numpy top-%d ms' % TOP_K:>15}")
+    for count in PLAYER_COUNTS:
+        players = [(f"player{i}", round(random.uniform(0, 100), 2)) for i in range(count)]
+        legacy = measure(legacy_loop, players)
+        python = measure(python_path, players)
+        if server.np is not None:
+            vectorized = measure(vectorized_path, players)
+            top_k = measure(vectorized_path, players, TOP_K)
+            # Both paths must agree on the winner
+            assert vectorized_path(players).closest[0] == legacy_loop(players)[0]
+            print(f"{count:>8} {legacy:>11.3f} {python:>11.3f} {vectorized:>10.3f} {top_k:>15.3f}")
+        else:
+            print(f"{count:>8} {legacy:>11.3f} {python:>11.3f} {'-':>10} {'-':>15}")
+
+
+if __name__ == "__main__":
+    main()
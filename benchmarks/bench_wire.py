@@ -0,0 +1,88 @@
+"""
+Benchmark: websocket frame size and encode/decode time, JSON vs MessagePack.
+
+Builds room states the way backend/server.py broadcasts them - a room of
+PLAYERS players that has played HISTORY_INLINE_ROUNDS rounds and is showing
+results - then times each encoding on the full room_state and on a typical
+room_patch (one player's has_chosen flipping). "msgpack+keys" is the
+msgpack.v1 subprotocol, with WIRE_KEYS replaced by their index, and
+"json+deflate" the deflate.v1 one (for frames over WS_COMPRESS_MIN_BYTES).
+
+Run from the repository root:
+    python benchmarks/bench_wire.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import msgpack
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("EVENT_LOG_DIR", "")
+
+import server  # noqa: E402
+
+ROOM_SIZES = [10, 100, 1000]
+REPEAT = 200
+
+
+async def room_messages(size):
+    """(room_state, room_patch) as broadcast by a room of `size` players"""
+    server.registry = server.RoomRegistry({})
+    server.rooms = server.registry.rooms
+    server.room_sync = server.registry.sync
+    server.room_connections = server.registry.connections
+    room = server.registry.create(1)
+    for i in range(size):
+        room.add_player(server.Player(nickname=f"player{i}"))
+    room.set_admin("player0")
+    sent = []
+    server.manager.broadcast_state = lambda room_id, state, patch: sent.append((state, patch))
+    for round_number in range(server.HISTORY_INLINE_ROUNDS):
+        room.start_round()
+        for i, nickname in enumerate(room.players):
+            room.set_number(nickname, (i * 37 + round_number) % 101)
+        server.calculate_winner(1)
+    await server.send_room_state(1)
+    state = sent[-1][0]
+    room.start_round()
+    await server.send_room_state(1)
+    room.set_number("player0", 42)
+    await server.send_room_state(1)
+    return state, sent[-1][1]
+
+
+def per_call_us(function, argument):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        function(argument)
+    return (time.perf_counter() - start) / REPEAT * 1e6
+
+
+def main():
+    encodings = {
+        "json": (server.encode_message, server.decode_message),
+        "json (stdlib)": (lambda m: json.dumps(m, ensure_ascii=False, separators=(",", ":")), json.loads),
+        "msgpack": (msgpack.packb, msgpack.unpackb),
+        "msgpack+keys": (server.pack_message, server.unpack_message),
+        "json+deflate": (lambda m: server.deflate(server.encode_message(m).encode()),
+                         lambda data: server.decode_message(zlib.decompress(data, -zlib.MAX_WBITS))),
+    }
+    print(f"{'players':>8} {'message':>10} {'encoding':>14} {'bytes':>9} {'encode us':>10} {'decode us':>10}")
+    for size in ROOM_SIZES:
+        state, patch = asyncio.run(room_messages(size))
+        for name, message in (("room_state", state), ("room_patch", patch)):
+            for encoding, (encode, decode) in encodings.items():
+                data = encode(message)
+                assert decode(data) == message
+                size_bytes = len(data.encode() if isinstance(data, str) else data)
+                print(f"{size:>8} {name:>10} {encoding:>14} {size_bytes:>9} "
+                      f"{per_call_us(encode, message):>10.1f} {per_call_us(decode, data):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
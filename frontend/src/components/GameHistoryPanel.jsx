@@ -1,9 +1,16 @@
+import { useState, useEffect } from "react";
+import axios from "axios";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Trophy, ArrowRight, ChevronDown, ChevronUp } from "lucide-react";
+import { API_URL } from "@/services/backendService";
+
+const HISTORY_PAGE_SIZE = 50;
 
 export default function GameHistoryPanel({
+  roomId,
   gameHistory,
+  totalRounds,
   historyExpanded,
   setHistoryExpanded,
   showAllHistory,
@@ -13,11 +20,42 @@ export default function GameHistoryPanel({
   onExport,
   onClear,
 }) {
-  if (gameHistory.length === 0) {
+  // Rounds older than the recent ones sent inline with the room state, fetched on demand
+  const [olderRounds, setOlderRounds] = useState([]);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+
+  // History was cleared - drop anything fetched before
+  useEffect(() => {
+    if (totalRounds === 0) {
+      setOlderRounds([]);
+    }
+  }, [totalRounds]);
+
+  const roundsByNumber = new Map();
+  [...olderRounds, ...gameHistory].forEach(round => roundsByNumber.set(round.round_number, round));
+  const allRounds = [...roundsByNumber.values()].sort((a, b) => a.round_number - b.round_number);
+  const roundsCount = Math.max(totalRounds ?? allRounds.length, allRounds.length);
+
+  if (roundsCount === 0) {
     return null;
   }
 
-  const reversedHistory = gameHistory.slice().reverse();
+  const loadOlderRounds = async () => {
+    setLoadingOlder(true);
+    try {
+      const before = allRounds.length > 0 ? allRounds[0].round_number : undefined;
+      const response = await axios.get(`${API_URL}/rooms/${roomId}/history`, {
+        params: { before, limit: HISTORY_PAGE_SIZE }
+      });
+      setOlderRounds(prev => [...response.data, ...prev]);
+    } catch (error) {
+      console.error("Error fetching history:", error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  const reversedHistory = allRounds.slice().reverse();
   const displayedHistory = showAllHistory ? reversedHistory : reversedHistory.slice(0, 3);
 
   return (
@@ -28,7 +66,7 @@ export default function GameHistoryPanel({
       >
         <div className="flex items-center justify-between">
           <CardTitle className="flex items-center gap-2">
-            היסטוריית משחקים ({gameHistory.length})
+            היסטוריית משחקים ({roundsCount})
           </CardTitle>
           {historyExpanded ? <ChevronUp size={20} /> : <ChevronDown size={20} />}
         </div>
@@ -38,7 +76,7 @@ export default function GameHistoryPanel({
           <div className="space-y-2 mb-4">
             {displayedHistory.map((round, idx) => (
               <div
-                key={gameHistory.length - idx}
+                key={round.round_number}
                 data-testid={`history-round-${round.round_number}`}
                 onClick={() => onSelectRound(round)}
                 className="flex items-center justify-between p-3 bg-gray-50 rounded-lg hover:bg-gray-100 hover:shadow-md cursor-pointer transition-all"
@@ -56,14 +94,25 @@ export default function GameHistoryPanel({
                 </div>
               </div>
             ))}
-            {reversedHistory.length > 3 && !showAllHistory && (
+            {roundsCount > 3 && !showAllHistory && (
               <Button
                 onClick={() => setShowAllHistory(true)}
                 variant="outline"
                 size="sm"
                 className="w-full mt-2 text-xs"
               >
-                הצג עוד משחקים ({reversedHistory.length - 3})
+                הצג עוד משחקים ({roundsCount - 3})
+              </Button>
+            )}
+            {showAllHistory && allRounds.length < roundsCount && (
+              <Button
+                onClick={loadOlderRounds}
+                disabled={loadingOlder}
+                variant="outline"
+                size="sm"
+                className="w-full mt-2 text-xs"
+              >
+                {loadingOlder ? "טוען..." : `טען משחקים קודמים (${roundsCount - allRounds.length})`}
               </Button>
             )}
           </div>
@@ -1,14 +1,18 @@
 import { useState, useEffect, useRef } from "react";
+import axios from "axios";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Slider } from "@/components/ui/slider";
 import { Badge } from "@/components/ui/badge";
-import { Crown, Users, CheckCircle2, Circle, Trophy, ArrowRight, ChevronDown, ChevronUp, Eye, EyeOff } from "lucide-react";
+import { Crown, Users, CheckCircle2, Circle, Trophy, ChevronDown, ChevronUp, Eye, EyeOff } from "lucide-react";
 import { toast } from "sonner";
 import GameResultsModal from "./GameResultsModal";
 import ResultsDisplay from "./ResultsDisplay";
-import { WS_URL } from "@/services/backendService";
+import GameHistoryPanel from "./GameHistoryPanel";
+import { API_URL, WS_URL, WS_PROTOCOLS, decodeFrame } from "@/services/backendService";
+
+const HISTORY_EXPORT_PAGE_SIZE = 200;
 
 export default function GameRoom({ roomId, roomName, playerData, isViewer = false, onUpdatePlayerData, onLeave }) {
   // Destructure player info from playerData
@@ -32,6 +36,8 @@ export default function GameRoom({ roomId, roomName, playerData, isViewer = fals
   const [previousGameStatus, setPreviousGameStatus] = useState(null);
   const wsRef = useRef(null);
   const reconnectTimeoutRef = useRef(null);
+  // Last full room state, used as the base for applying room_patch messages
+  const roomStateRef = useRef(null);
 
   // Load hide settings from localStorage on mount
   useEffect(() => {
@@ -68,22 +74,76 @@ export default function GameRoom({ roomId, roomName, playerData, isViewer = fals
     };
   }, [roomId, nickname]);
 
+  // Apply a room_patch to the last known state, returns null if the patch doesn't follow it
+  const applyRoomPatch = (base, patch) => {
+    if (!base || patch.base_version !== base.version) {
+      return null;
+    }
+
+    const next = { ...base, ...(patch.set || {}), version: patch.version };
+
+    if (patch.players) {
+      const removed = new Set(patch.players.remove || []);
+      const players = base.players.filter(p => !removed.has(p.nickname));
+      (patch.players.upsert || []).forEach(player => {
+        const index = players.findIndex(p => p.nickname === player.nickname);
+        if (index >= 0) {
+          players[index] = player;
+        } else {
+          players.push(player);
+        }
+      });
+      if (patch.players.order) {
+        const position = new Map(patch.players.order.map((name, i) => [name, i]));
+        players.sort((a, b) => position.get(a.nickname) - position.get(b.nickname));
+      }
+      next.players = players;
+    }
+
+    if (patch.history_reset) {
+      next.game_history = [];
+    }
+    if (patch.history_append) {
+      next.game_history = [...next.game_history, ...patch.history_append];
+    }
+    // Only the most recent rounds are kept inline, older ones come from the history API
+    if (next.history_limit !== undefined && next.game_history.length > next.history_limit) {
+      next.game_history = next.game_history.slice(next.game_history.length - next.history_limit);
+    }
+
+    return next;
+  };
+
   const connectWebSocket = () => {
     try {
       const viewerParam = isViewer ? "?viewer=true" : "";
-      const ws = new WebSocket(`${WS_URL}/api/ws/${roomId}/${encodeURIComponent(nickname)}${viewerParam}`);
+      const ws = new WebSocket(`${WS_URL}/api/ws/${roomId}/${encodeURIComponent(nickname)}${viewerParam}`, WS_PROTOCOLS);
 
       ws.onopen = () => {
         console.log("WebSocket connected");
       };
 
-      ws.onmessage = (event) => {
-        const data = JSON.parse(event.data);
+      const handleMessage = (data) => {
+        if (data.type === "ping") {
+          // Server heartbeat - a tab that stops answering is dropped from the room
+          ws.send(JSON.stringify({ action: "pong" }));
+          return;
+        }
+        if (data.type === "room_patch") {
+          const patched = applyRoomPatch(roomStateRef.current, data);
+          if (!patched) {
+            // Missed an update - ask the server for a fresh snapshot
+            ws.send(JSON.stringify({ action: "sync" }));
+            return;
+          }
+          data = patched;
+        }
 
         if (data.type === "error") {
           toast.error(data.message);
           onLeave();
         } else if (data.type === "room_state") {
+          roomStateRef.current = data;
           const currentPlayer = data.players.find(p => p.nickname === nickname);
 
           // Capture current player's ID on first message
@@ -141,6 +201,15 @@ export default function GameRoom({ roomId, roomName, playerData, isViewer = fals
         }
       };
 
+      // Compressed frames inflate asynchronously - chain them so messages apply in order
+      let received = Promise.resolve();
+      ws.onmessage = (event) => {
+        received = received
+          .then(() => decodeFrame(event.data))
+          .then(handleMessage)
+          .catch((error) => console.error("Error handling message:", error));
+      };
+
       ws.onerror = (error) => {
         console.error("WebSocket error:", error);
       };
@@ -261,17 +330,34 @@ export default function GameRoom({ roomId, roomName, playerData, isViewer = fals
     }
   };
 
-  const handleExportHistory = () => {
-    if (!roomState || !roomState.game_history || roomState.game_history.length === 0) {
+  const handleExportHistory = async () => {
+    if (!roomState || !roomState.history_total) {
       toast.error("אין היסטוריה לייצא");
       return;
     }
 
+    // Room state only carries recent rounds - page through the full history
+    let history = [];
+    try {
+      let before;
+      do {
+        const response = await axios.get(`${API_URL}/rooms/${roomState.room_id}/history`, {
+          params: { before, limit: HISTORY_EXPORT_PAGE_SIZE }
+        });
+        history = [...response.data, ...history];
+        before = response.data.length === HISTORY_EXPORT_PAGE_SIZE ? response.data[0].round_number : undefined;
+      } while (before !== undefined);
+    } catch (error) {
+      console.error("Error exporting history:", error);
+      toast.error("שגיאה בייצוא ההיסטוריה");
+      return;
+    }
+
     const historyData = {
       roomId: roomState.room_id,
       exportDate: new Date().toISOString(),
-      totalRounds: roomState.game_history.length,
-      history: roomState.game_history
+      totalRounds: history.length,
+      history
     };
 
     const dataStr = JSON.stringify(historyData, null, 2);
@@ -696,85 +782,19 @@ export default function GameRoom({ roomId, roomName, playerData, isViewer = fals
             )}
 
             {/* Game History */}
-            {roomState.game_history.length > 0 && (
-              <Card className="mt-6 bg-white/80 backdrop-blur-sm">
-                <CardHeader
-                  className="cursor-pointer"
-                  onClick={() => setHistoryExpanded(!historyExpanded)}
-                >
-                  <div className="flex items-center justify-between">
-                    <CardTitle className="flex items-center gap-2">
-                      היסטוריית משחקים ({roomState.game_history.length})
-                    </CardTitle>
-                    {historyExpanded ? <ChevronUp size={20} /> : <ChevronDown size={20} />}
-                  </div>
-                </CardHeader>
-                {historyExpanded && (
-                  <CardContent>
-                    <div className="space-y-2 mb-4">
-                      {(() => {
-                        const reversedHistory = roomState.game_history.slice().reverse();
-                        const displayedHistory = showAllHistory ? reversedHistory : reversedHistory.slice(0, 3);
-                        return (
-                          <>
-                            {displayedHistory.map((round, idx) => (
-                              <div
-                                key={roomState.game_history.length - idx}
-                                data-testid={`history-round-${round.round_number}`}
-                                onClick={() => setSelectedHistoryRound(round)}
-                                className="flex items-center justify-between p-3 bg-gray-50 rounded-lg hover:bg-gray-100 hover:shadow-md cursor-pointer transition-all"
-                              >
-                                <div className="flex items-center gap-3">
-                                  <span className="font-medium">סיבוב {round.round_number}</span>
-                                  <ArrowRight size={16} className="text-gray-400" />
-                                  <span className="text-sm text-gray-600">
-                                    יעד: {round.target_number}
-                                  </span>
-                                </div>
-                                <div className="flex items-center gap-2">
-                                  <Trophy size={16} className="text-yellow-500" />
-                                  <span className="font-medium">{round.winner}</span>
-                                </div>
-                              </div>
-                            ))}
-                            {reversedHistory.length > 3 && !showAllHistory && (
-                              <Button
-                                onClick={() => setShowAllHistory(true)}
-                                variant="outline"
-                                size="sm"
-                                className="w-full mt-2 text-xs"
-                              >
-                                הצג עוד משחקים ({reversedHistory.length - 3})
-                              </Button>
-                            )}
-                          </>
-                        );
-                      })()}
-                    </div>
-                    {isAdmin && (
-                      <div className="space-y-2">
-                        <Button
-                          data-testid="export-history-btn"
-                          onClick={handleExportHistory}
-                          variant="outline"
-                          className="w-full h-10"
-                        >
-                          ⬇️ ייצא היסטוריה
-                        </Button>
-                        <Button
-                          data-testid="clear-history-btn"
-                          onClick={handleClearHistory}
-                          variant="destructive"
-                          className="w-full h-10"
-                        >
-                          מחק היסטוריה
-                        </Button>
-                      </div>
-                    )}
-                  </CardContent>
-                )}
-              </Card>
-            )}
+            <GameHistoryPanel
+              roomId={roomId}
+              gameHistory={roomState.game_history}
+              totalRounds={roomState.history_total}
+              historyExpanded={historyExpanded}
+              setHistoryExpanded={setHistoryExpanded}
+              showAllHistory={showAllHistory}
+              setShowAllHistory={setShowAllHistory}
+              onSelectRound={setSelectedHistoryRound}
+              isAdmin={isAdmin}
+              onExport={handleExportHistory}
+              onClear={handleClearHistory}
+            />
           </div>
         </div>
       </div>
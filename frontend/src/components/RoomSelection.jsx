@@ -5,7 +5,15 @@ import { Input } from "@/components/ui/input";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Users } from "lucide-react";
 import { toast } from "sonner";
-import { API_URL } from "@/services/backendService";
+import { API_URL, WS_URL, WS_PROTOCOLS, decodeFrame } from "@/services/backendService";
+
+// Apply a lobby_update: changed summaries replace their rooms, removed rooms go away
+const applyLobbyUpdate = (rooms, update) => {
+  const byId = new Map(rooms.map((room) => [room.room_id, room]));
+  update.removed.forEach((roomId) => byId.delete(roomId));
+  update.rooms.forEach((room) => byId.set(room.room_id, room));
+  return [...byId.values()].sort((a, b) => a.room_id - b.room_id);
+};
 
 export default function RoomSelection({ onJoinRoom }) {
   const [rooms, setRooms] = useState([]);
@@ -20,9 +28,54 @@ export default function RoomSelection({ onJoinRoom }) {
       setNickname(savedNickname);
     }
 
-    fetchRooms();
-    const interval = setInterval(fetchRooms, 3000);
-    return () => clearInterval(interval);
+    // Room changes are pushed over the lobby stream; polling is the fallback
+    // while it is unavailable (e.g. the server is at its subscriber limit)
+    let ws = null;
+    let interval = null;
+    let reconnect = null;
+    let unmounted = false;
+
+    const startPolling = () => {
+      if (interval) return;
+      fetchRooms();
+      interval = setInterval(fetchRooms, 3000);
+    };
+
+    const connectLobby = () => {
+      ws = new WebSocket(`${WS_URL}/api/ws/lobby`, WS_PROTOCOLS);
+      const handleMessage = (message) => {
+        if (message.type === "lobby_state") {
+          setRooms(message.rooms);
+          clearInterval(interval);
+          interval = null;
+        } else if (message.type === "lobby_update") {
+          setRooms((current) => applyLobbyUpdate(current, message));
+        } else if (message.type === "ping") {
+          ws.send(JSON.stringify({ action: "pong" }));
+        }
+      };
+      // Compressed frames inflate asynchronously - chain them so messages apply in order
+      let received = Promise.resolve();
+      ws.onmessage = (event) => {
+        received = received
+          .then(() => decodeFrame(event.data))
+          .then(handleMessage)
+          .catch((error) => console.error("Error handling lobby message:", error));
+      };
+      ws.onclose = () => {
+        if (unmounted) return;
+        startPolling();
+        reconnect = setTimeout(connectLobby, 30000);
+      };
+    };
+
+    connectLobby();
+    return () => {
+      unmounted = true;
+      clearInterval(interval);
+      clearTimeout(reconnect);
+      if (ws) ws.close();
+    };
   }, []);
 
   const fetchRooms = async () => {
@@ -18,3 +18,13 @@ export const getBackendURL = () => {
 export const BACKEND_URL = getBackendURL();
 export const API_URL = `${BACKEND_URL}/api`;
 export const WS_URL = BACKEND_URL.replace('https://', 'wss://').replace('http://', 'ws://');
+
+// Websocket subprotocols to offer: with deflate.v1 the server sends large
+// messages as binary raw-DEFLATE frames, everything else stays JSON text
+export const WS_PROTOCOLS = typeof DecompressionStream !== "undefined" ? ["deflate.v1"] : [];
+
+export const decodeFrame = async (data) => {
+  if (typeof data === "string") return JSON.parse(data);
+  const inflated = data.stream().pipeThrough(new DecompressionStream("deflate-raw"));
+  return JSON.parse(await new Response(inflated).text());
+};
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+# The backend runs from its own directory and imports its modules flat
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh registry in place of the server's, with no event log"""
+    monkeypatch.setattr(server, "event_log", None)
+    registry = server.RoomRegistry(server.ROOM_NAMES)
+    monkeypatch.setattr(server, "registry", registry)
+    monkeypatch.setattr(server, "rooms", registry.rooms)
+    monkeypatch.setattr(server, "room_connections", registry.connections)
+    monkeypatch.setattr(server, "room_sync", registry.sync)
+    return registry
+
+
+@pytest.fixture
+def client(monkeypatch, registry):
+    """The app served in-process on a fresh registry and lobby, with no event log"""
+    monkeypatch.setattr(server, "EVENT_LOG_DIR", "")
+    monkeypatch.setattr(server, "lobby", server.LobbyCache())
+    monkeypatch.setattr(server, "backplane", None)
+    with TestClient(server.app) as client:
+        yield client
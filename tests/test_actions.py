@@ -0,0 +1,76 @@
+import pytest
+
+import server
+from server import Player
+
+
+def invalid_count(action: str) -> float:
+    return server.INVALID_ACTIONS.labels(action).value
+
+
+@pytest.fixture
+def room(registry):
+    room = registry.rooms[1]
+    room.add_player(Player("alice"))
+    room.add_player(Player("bob"))
+    return room
+
+
+def send(nickname: str, **data) -> int:
+    return server.handle_message(1, nickname, data)
+
+
+@pytest.mark.parametrize("number", ["5", True, None, -1, 100.5, [5]])
+def test_choose_number_rejects_anything_but_a_number_in_range(room, number):
+    room.start_round()
+    before = invalid_count("choose_number")
+    assert send("bob", action="choose_number", number=number) == server.NO_BROADCAST
+    assert room.players["bob"].number is None
+    assert invalid_count("choose_number") == before + 1
+
+
+def test_valid_actions_are_applied(room):
+    room.start_round()
+    assert send("bob", action="choose_number", number=42.5, extra="ignored") == server.COALESCED_BROADCAST
+    assert room.players["bob"].number == 42.5
+    assert send("alice", action="choose_number", number=0) == server.IMMEDIATE_BROADCAST
+    assert room.game_status == "results"
+
+
+@pytest.mark.parametrize("seconds, accepted", [(0, True), (5, False), (10, True), (3600, True), (3601, False), ("30", False)])
+def test_round_timeout_is_off_or_at_least_ten_seconds(room, seconds, accepted):
+    send("alice", action="set_round_timeout", seconds=seconds)
+    assert (room.round_timeout == seconds) is accepted
+
+
+def test_admin_only_actions_are_ignored_from_other_players(room):
+    assert send("bob", action="start_game") == server.NO_BROADCAST
+    assert room.game_status == "waiting"
+    assert send("alice", action="start_game") == server.IMMEDIATE_BROADCAST
+    assert room.game_status == "choosing"
+
+
+def test_actions_outside_their_statuses_are_ignored(room):
+    room.start_round()
+    assert send("alice", action="set_multiplier", multiplier=0.5) == server.NO_BROADCAST
+    assert room.multiplier != 0.5
+    room.stop_game()
+    assert send("bob", action="choose_number", number=5) == server.NO_BROADCAST
+    assert send("alice", action="set_multiplier", multiplier=0.5) == server.IMMEDIATE_BROADCAST
+    assert room.multiplier == 0.5
+
+
+def test_unknown_actions_and_senders_are_ignored(room):
+    assert send("alice", action="launch_rockets") == server.NO_BROADCAST
+    assert send("alice", number=5) == server.NO_BROADCAST
+    assert server.handle_message(1, "mallory", {"action": "start_game"}) == server.NO_BROADCAST
+    assert room.game_status == "waiting"
+    # Metric labels stay bounded to registered actions
+    assert server.message_label({"action": "launch_rockets"}) == "unknown"
+    assert server.message_label({"action": ["start_game"]}) == "unknown"
+    assert server.message_label({"action": "start_game"}) == "start_game"
+
+
+def test_every_action_has_limits():
+    for name in server.ACTIONS:
+        assert name in server.CONNECTION_ACTION_LIMITS and name in server.ROOM_ACTION_LIMITS
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import server
+from server import Player
+
+
+@pytest.fixture
+def broadcasts(monkeypatch, registry):
+    """(game_status, players who chose) of every state broadcast"""
+    sent = []
+    monkeypatch.setattr(server.manager, "broadcast_state", lambda room_id, state, patch: sent.append(
+        (state["game_status"], sorted(p["nickname"] for p in state["players"] if p["has_chosen"]))))
+    monkeypatch.setattr(server, "BROADCAST_COALESCE_MS", 20)
+    monkeypatch.setattr(server, "pending_broadcasts", {})
+    room = registry.rooms[1]
+    for nickname in ("alice", "bob", "carol"):
+        room.add_player(Player(nickname))
+    room.start_round()
+    return sent
+
+
+def choose(actor, nickname, number):
+    actor.submit(server.handle_message, nickname, {"action": "choose_number", "number": number})
+
+
+def test_choices_within_the_window_go_out_together(broadcasts):
+    async def run():
+        actor = server.RoomActor(1)
+        choose(actor, "alice", 10)
+        await asyncio.sleep(0.005)
+        choose(actor, "bob", 20)
+        await asyncio.sleep(0.005)
+        assert broadcasts == []
+        await asyncio.sleep(0.03)
+        actor.stop()
+    asyncio.run(run())
+    assert broadcasts == [("choosing", ["alice", "bob"])]
+
+
+def test_an_immediate_broadcast_takes_over_a_pending_one(broadcasts):
+    async def run():
+        actor = server.RoomActor(1)
+        choose(actor, "alice", 10)
+        await asyncio.sleep(0.005)
+        choose(actor, "bob", 20)
+        choose(actor, "carol", 30)
+        await asyncio.sleep(0.005)
+        # The round is over - results go out at once, and the coalesced update is dropped
+        assert broadcasts == [("results", ["alice", "bob", "carol"])]
+        await asyncio.sleep(0.03)
+        actor.stop()
+    asyncio.run(run())
+    assert len(broadcasts) == 1 and not server.pending_broadcasts
+
+
+def test_zero_window_broadcasts_every_choice(monkeypatch, broadcasts):
+    monkeypatch.setattr(server, "BROADCAST_COALESCE_MS", 0)
+
+    async def run():
+        actor = server.RoomActor(1)
+        choose(actor, "alice", 10)
+        await asyncio.sleep(0.005)
+        choose(actor, "bob", 20)
+        await asyncio.sleep(0.005)
+        actor.stop()
+    asyncio.run(run())
+    assert broadcasts == [("choosing", ["alice"]), ("choosing", ["alice", "bob"])]
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import zlib
+
+import server
+from server import ClientConnection, Frame, DEFLATE_SUBPROTOCOL
+
+
+def inflate(data):
+    return json.loads(zlib.decompressobj(-zlib.MAX_WBITS).decompress(data))
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+
+def big_state():
+    return {"type": "room_state", "room_id": 1, "players": [{"nickname": f"player{i}"} for i in range(100)]}
+
+
+def test_a_frame_is_compressed_once():
+    frame = Frame(big_state())
+    assert frame.deflated is frame.deflated
+    assert len(frame.deflated) < frame.size
+    assert inflate(frame.deflated) == big_state()
+
+
+def test_large_frames_go_out_compressed_and_shared(monkeypatch):
+    monkeypatch.setattr(server, "WS_COMPRESS_MIN_BYTES", 512)
+
+    async def run():
+        sockets = [RecordingSocket() for _ in range(3)]
+        connections = [ClientConnection(socket, 1, f"p{i}", wire=DEFLATE_SUBPROTOCOL) for i, socket in enumerate(sockets)]
+        large, small = Frame(big_state()), Frame({"type": "room_patch", "version": 2})
+        for connection in connections:
+            connection.send(large)
+            connection.send(small)
+        await asyncio.sleep(0)
+        for connection in connections:
+            connection.close()
+        return sockets
+    sockets = asyncio.run(run())
+    for socket in sockets:
+        assert len(socket.sent) == 2
+        assert socket.sent[0] is sockets[0].sent[0]
+        assert inflate(socket.sent[0]) == big_state()
+        assert socket.sent[1] == '{"type":"room_patch","version":2}'
+
+
+def test_deflate_socket(monkeypatch, client):
+    monkeypatch.setattr(server, "WS_COMPRESS_MIN_BYTES", 0)
+    with client.websocket_connect("/api/ws/1/alice", subprotocols=[DEFLATE_SUBPROTOCOL]) as ws:
+        assert ws.accepted_subprotocol == DEFLATE_SUBPROTOCOL
+        assert inflate(ws.receive_bytes())["type"] == "room_state"
+    # Frames under the threshold stay text
+    monkeypatch.setattr(server, "WS_COMPRESS_MIN_BYTES", 1 << 20)
+    with client.websocket_connect("/api/ws/2/alice", subprotocols=[DEFLATE_SUBPROTOCOL]) as ws:
+        assert ws.receive_json()["type"] == "room_state"
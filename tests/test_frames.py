@@ -0,0 +1,47 @@
+import asyncio
+
+import server
+from server import ClientConnection, Frame
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+def test_a_frame_is_encoded_once_for_every_socket(monkeypatch):
+    calls = []
+
+    def encode_message(message):
+        calls.append(message)
+        return server.json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+    monkeypatch.setattr(server, "encode_message", encode_message)
+
+    async def run():
+        sockets = [RecordingSocket() for _ in range(5)]
+        connections = [ClientConnection(socket, 1, f"p{i}") for i, socket in enumerate(sockets)]
+        frame = Frame({"type": "room_state", "room_id": 1, "players": []})
+        for connection in connections:
+            connection.send(frame)
+        await asyncio.sleep(0)
+        for connection in connections:
+            connection.close()
+        return sockets
+    sockets = asyncio.run(run())
+    assert len(calls) == 1
+    assert {socket.sent[0] for socket in sockets} == {'{"type":"room_state","room_id":1,"players":[]}'}
+    assert all(socket.sent[0] is sockets[0].sent[0] for socket in sockets)
+
+
+def test_size_counts_encoded_bytes():
+    frame = Frame({"type": "error", "message": "החדר מלא"})
+    assert frame.size == len(frame.text.encode()) > len(frame.text)
+
+
+def test_relayed_frame_keeps_its_text():
+    text = '{"type":"room_patch","version":3}'
+    frame = Frame.from_text("room_patch", text)
+    assert frame.text is text and frame.type == "room_patch" and frame.message is None
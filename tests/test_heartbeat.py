@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import server
+from server import ClientConnection, PONG_MESSAGE
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_pongs_are_not_actions():
+    async def run():
+        connection = ClientConnection(RecordingSocket(), 1, "alice")
+        connection.last_seen -= 100
+        assert connection.received({"action": "sync"}) is True
+        assert not connection.answers_pings and time.monotonic() - connection.last_seen < 1
+        assert connection.received(dict(PONG_MESSAGE)) is False
+        assert connection.answers_pings
+        connection.close()
+    asyncio.run(run())
+
+
+def test_sweep_pings_quiet_clients_and_evicts_only_those_that_answer_pings(monkeypatch, registry):
+    monkeypatch.setattr(server, "HEARTBEAT_INTERVAL", 10)
+    monkeypatch.setattr(server, "HEARTBEAT_TIMEOUT", 30)
+    disconnected = []
+    monkeypatch.setattr(registry, "submit", lambda room_id, handler, nickname, connection: disconnected.append(nickname))
+
+    async def run():
+        sockets = {nickname: RecordingSocket() for nickname in ("busy", "quiet", "gone", "old")}
+        connections = {nickname: ClientConnection(socket, 1, nickname) for nickname, socket in sockets.items()}
+        now = time.monotonic()
+        connections["quiet"].last_seen = now - 20
+        connections["gone"].last_seen = now - 40
+        connections["gone"].answers_pings = True
+        # Never answered a ping, so it may just be an old client waiting in the lobby
+        connections["old"].last_seen = now - 400
+        registry.connections[1] = connections
+        evicted = server.sweep_connections()
+        await asyncio.sleep(0)
+        for connection in connections.values():
+            connection.close()
+        return evicted, sockets, connections
+    evicted, sockets, connections = asyncio.run(run())
+    assert evicted == 1 and disconnected == ["gone"]
+    assert sockets["gone"].closed and not sockets["quiet"].closed
+    assert sockets["busy"].sent == []
+    assert sockets["quiet"].sent == ['{"type":"ping"}'] and sockets["old"].sent == ['{"type":"ping"}']
+
+
+def test_client_answers_a_ping_with_a_pong(client, registry):
+    with client.websocket_connect("/api/ws/1/alice") as ws:
+        ws.receive_json()
+        connection = registry.connections[1]["alice"]
+        assert not connection.answers_pings
+        ws.send_json(PONG_MESSAGE)
+        # The socket reads in order, so once the sync is answered the pong has been seen
+        ws.send_json({"action": "sync"})
+        ws.receive_json()
+        assert connection.answers_pings
@@ -0,0 +1,59 @@
+import server
+from server import GameRound
+
+
+def game_round(round_number):
+    return GameRound(round_number=round_number, players_data={"a": 10}, total_sum=10, average=10,
+                     target_number=8, winner="a", timestamp="2026-01-01T00:00:00+00:00")
+
+
+def fill(room, rounds):
+    for round_number in range(1, rounds + 1):
+        room.add_round(game_round(round_number))
+
+
+def test_history_keeps_only_the_newest_rounds(registry, monkeypatch):
+    monkeypatch.setattr(server, "HISTORY_MAX_ROUNDS", 5)
+    room = registry.rooms[1]
+    fill(room, 12)
+    assert [r.round_number for r in room.game_history] == [8, 9, 10, 11, 12]
+    # Totals still cover every round
+    assert room.rounds_recorded == 12 and room.stats.rounds == 12
+
+
+def test_history_page(registry):
+    room = registry.rooms[1]
+    fill(room, 10)
+    assert [r.round_number for r in room.history_page(None, 3)] == [8, 9, 10]
+    assert [r.round_number for r in room.history_page(8, 3)] == [5, 6, 7]
+    assert [r.round_number for r in room.history_page(3, 5)] == [1, 2]
+    assert room.history_page(1, 5) == []
+
+
+def test_history_api_pages_back_with_the_cursor(client, registry):
+    fill(registry.rooms[1], 7)
+    response = client.get("/api/rooms/1/history?limit=3")
+    assert [r["round_number"] for r in response.json()] == [5, 6, 7]
+    assert response.headers["x-next-cursor"] == "5"
+    response = client.get("/api/rooms/1/history?limit=3&before=5")
+    assert [r["round_number"] for r in response.json()] == [2, 3, 4]
+    response = client.get("/api/rooms/1/history?limit=3&before=2")
+    assert [r["round_number"] for r in response.json()] == [1]
+    assert "x-next-cursor" not in response.headers
+
+
+def test_history_api_errors(client, registry):
+    assert client.get("/api/rooms/1/history").json() == []
+    assert client.get(f"/api/rooms/{server.MAX_ROOMS + 1}/history").status_code == 404
+    assert client.get("/api/rooms/1/history?limit=0").status_code == 422
+    assert client.get("/api/rooms/1/history?limit=201").status_code == 422
+
+
+def test_room_state_carries_only_the_inline_rounds(client, registry, monkeypatch):
+    monkeypatch.setattr(server, "HISTORY_INLINE_ROUNDS", 4)
+    fill(registry.rooms[1], 9)
+    with client.websocket_connect("/api/ws/1/alice") as ws:
+        state = ws.receive_json()
+    assert state["type"] == "room_state"
+    assert [r["round_number"] for r in state["game_history"]] == [6, 7, 8, 9]
+    assert state["history_total"] == 9 and state["history_limit"] == 4
@@ -0,0 +1,41 @@
+import asyncio
+import importlib.util
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+import server
+
+BENCHMARK = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_loadgen.py"
+
+
+@pytest.fixture
+def loadgen(monkeypatch, registry):
+    monkeypatch.setattr(server, "EVENT_LOG_DIR", "")
+    monkeypatch.setattr(server, "lobby", server.LobbyCache())
+    monkeypatch.setattr(server, "backplane", None)
+    monkeypatch.setattr(server, "RATE_LIMIT_SCALE", 0)
+    spec = importlib.util.spec_from_file_location("bench_loadgen", BENCHMARK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_percentile(loadgen):
+    ordered = list(range(1, 101))
+    assert loadgen.percentile(ordered, 0.5) == 51
+    assert loadgen.percentile(ordered, 0.99) == 100
+    assert loadgen.percentile(ordered, 1.0) == 100
+    assert loadgen.percentile([], 0.5) == 0.0
+
+
+def test_rooms_play_every_round(loadgen):
+    args = Namespace(rooms=2, players=3, viewers=1, rounds=2, think_ms=0, seed=1)
+    report = asyncio.run(loadgen.run(args))
+    results = report["results"]
+    # Each round the admin starts it and every player chooses once
+    assert results["actions"] == 2 * 2 * (1 + 3)
+    assert results["frames"] > 0 and results["bytes"] > 0
+    assert 0 <= results["latency_p50_ms"] <= results["latency_p99_ms"] <= results["latency_max_ms"]
+    assert report["config"]["rooms"] == 2
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+import server
+from server import LobbyCache, Player
+
+
+@pytest.fixture(autouse=True)
+def quick_pushes(monkeypatch):
+    monkeypatch.setattr(server, "LOBBY_PUSH_INTERVAL_MS", 10)
+
+
+def receive_until(websocket, type):
+    while True:
+        message = websocket.receive_json()
+        if message["type"] == type:
+            return message
+
+
+def test_lobby_stream_starts_with_the_rooms_then_pushes_changes(client):
+    with client.websocket_connect("/api/ws/lobby") as lobby:
+        state = lobby.receive_json()
+        assert state["type"] == "lobby_state"
+        assert [room["room_id"] for room in state["rooms"]] == [1, 2, 3, 4]
+        with client.websocket_connect("/api/ws/2/alice?full_state=true") as alice:
+            alice.receive_json()
+            update = receive_until(lobby, "lobby_update")
+            assert update["removed"] == []
+            assert [(room["room_id"], room["players"]) for room in update["rooms"]] == [(2, ["alice"])]
+        update = receive_until(lobby, "lobby_update")
+        assert [(room["room_id"], room["player_count"]) for room in update["rooms"]] == [(2, 0)]
+
+
+def test_lobby_stream_announces_new_and_removed_rooms(client):
+    with client.websocket_connect("/api/ws/lobby") as lobby:
+        lobby.receive_json()
+        room_id = client.post("/api/rooms", json={"room_name": "חדר חדש"}).json()["room_id"]
+        update = receive_until(lobby, "lobby_update")
+        assert [(room["room_id"], room["room_name"]) for room in update["rooms"]] == [(room_id, "חדר חדש")]
+        with client.websocket_connect(f"/api/ws/{room_id}/alice?full_state=true") as alice:
+            alice.receive_json()
+            receive_until(lobby, "lobby_update")
+        # Its last player left, so the on-demand room is gone
+        assert receive_until(lobby, "lobby_update")["removed"] == [room_id]
+
+
+def test_lobby_stream_is_refused_past_the_subscriber_limit(monkeypatch, client):
+    monkeypatch.setattr(server, "LOBBY_MAX_SUBSCRIBERS", 0)
+    with client.websocket_connect("/api/ws/lobby") as lobby:
+        assert lobby.receive_json()["type"] == "error"
+
+
+class Subscriber:
+    def __init__(self):
+        self.messages = []
+
+    def push(self, frame):
+        self.messages.append(frame.message)
+
+
+def test_changes_within_an_interval_go_out_as_one_update(monkeypatch, registry):
+    lobby = LobbyCache()
+    monkeypatch.setattr(server, "lobby", lobby)
+    monkeypatch.setattr(server, "backplane", object())
+    subscriber = Subscriber()
+    lobby.subscribers.add(subscriber)
+
+    async def run():
+        room = registry.rooms[1]
+        for nickname in ("alice", "bob", "carol"):
+            room.add_player(Player(nickname))
+        registry.rooms[3].start_round()
+        assert subscriber.messages == []
+        await asyncio.sleep(0.05)
+    asyncio.run(run())
+    assert len(subscriber.messages) == 1
+    update = subscriber.messages[0]
+    assert [(room["room_id"], room["player_count"], room["game_status"]) for room in update["rooms"]] == [
+        (1, 3, "waiting"), (3, 0, "choosing")]
+
+
+def test_no_pushes_without_subscribers(monkeypatch, registry):
+    lobby = LobbyCache()
+    monkeypatch.setattr(server, "lobby", lobby)
+    monkeypatch.setattr(server, "backplane", object())
+    registry.rooms[1].add_player(Player("alice"))
+    assert not lobby.push_scheduled and not lobby.dirty
@@ -0,0 +1,32 @@
+import server
+from metrics import MetricsRegistry
+from server import Player
+
+
+def test_labelled_gauge_reports_each_series():
+    metrics = MetricsRegistry()
+    gauge = metrics.gauge("queue_depth", "Depth", labelnames=["queue"])
+    gauge.labels("a").set(3)
+    gauge.labels("b").set(1.5)
+    gauge.labels("a").set(2)
+    assert metrics.render().splitlines()[2:] == ['queue_depth{queue="a"} 2', 'queue_depth{queue="b"} 1.5']
+
+
+def rooms_by_sockets() -> dict:
+    prefix = "game_rooms_by_sockets{le=\""
+    return {line[len(prefix):].split('"')[0]: int(line.split()[-1])
+            for line in server.metrics.render().splitlines() if line.startswith(prefix)}
+
+
+def test_rooms_by_sockets_is_the_current_distribution(registry):
+    for room_id, players in ((1, 0), (2, 1), (3, 3), (4, 3)):
+        for i in range(players):
+            registry.rooms[room_id].add_player(Player(f"p{i}"))
+            registry.connections[room_id][f"p{i}"] = object()
+    counts = rooms_by_sockets()
+    assert (counts["0"], counts["1"], counts["2"], counts["5"], counts["+Inf"]) == (1, 2, 2, 4, 4)
+    # Sockets closing take the distribution down again, unlike a histogram's _count
+    registry.connections[3].clear()
+    registry.connections[4].clear()
+    counts = rooms_by_sockets()
+    assert (counts["0"], counts["1"], counts["+Inf"]) == (3, 4, 4)
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from server import GameRound, Player, RoomState
+
+
+def test_models_have_no_instance_dict():
+    game_round = GameRound(round_number=1, players_data={}, total_sum=0, average=0, target_number=0,
+                           winner=None, timestamp="2026-01-01T00:00:00+00:00")
+    for obj in (Player("alice"), game_round, RoomState(room_id=1)):
+        assert not hasattr(obj, "__dict__")
+        with pytest.raises(AttributeError):
+            obj.typo = 1
+
+
+def test_player_defaults():
+    player = Player("alice")
+    assert player.player_id and player.player_id != Player("alice").player_id
+    assert (player.is_admin, player.is_viewer, player.number, player.connected) == (False, False, None, True)
+    assert Player("bob", player_id="p1").player_id == "p1"
+
+
+def test_round_dict_is_built_once():
+    game_round = GameRound(round_number=3, players_data={"a": 10, "b": 2.5}, total_sum=12.5, average=6.25,
+                           target_number=5, winner="b", timestamp="2026-01-01T00:00:00+00:00")
+    data = game_round.to_dict()
+    assert game_round.to_dict() is data
+    assert "top_players" not in data
+    # The dict form builds an equal round
+    assert GameRound(**data).to_dict() == data
+    with_top = GameRound(**data, top_players=["b", "a"]).to_dict()
+    assert with_top == {**data, "top_players": ["b", "a"]}
+
+
+def test_room_snapshot_round_trip(registry):
+    room = registry.rooms[1]
+    room.add_player(Player("alice", player_id="p1"))
+    room.add_player(Player("vic", player_id="p2", is_viewer=True))
+    room.set_multiplier(0.5)
+    room.start_round()
+    room.set_number("alice", 40)
+    room.finish_round(GameRound(round_number=1, players_data={"alice": 40}, total_sum=40, average=40,
+                                target_number=20, winner="alice", timestamp="2026-01-01T00:00:00+00:00"))
+    data = json.loads(json.dumps(room.to_snapshot()))
+    restored = RoomState.from_snapshot(data)
+    assert restored.to_snapshot() == data
+    assert (restored.game_status, restored.current_round, restored.multiplier) == ("results", 1, 0.5)
+    assert [r.to_dict() for r in restored.game_history] == [r.to_dict() for r in room.game_history]
+    # Players come back disconnected, waiting for their owners
+    assert restored.players["alice"].player_id == "p1" and restored.players["vic"].is_viewer
+    assert restored.connected_count == 0 and restored.admin is None
+    restored.set_connected("alice", True)
+    assert restored.admin == "alice" and restored.playing_count == 1
@@ -0,0 +1,79 @@
+import asyncio
+import sys
+
+from starlette.testclient import TestClient
+
+import server
+from profiler import StackProfiler
+from server import Player
+
+
+def leaf(n):
+    return sum(range(n))
+
+
+def branch(n):
+    return leaf(n) + leaf(n)
+
+
+def test_profiled_call_returns_its_result_and_records_its_stacks():
+    profiler = StackProfiler()
+    assert profiler.run("action", branch, 1000) == 2 * sum(range(1000))
+    assert profiler.samples == 1
+    stacks = list(profiler.stacks)
+    assert all(stack.startswith("action") for stack in stacks)
+    assert any(stack.startswith("action;branch (test_profiler.py:") and ";leaf (" in stack for stack in stacks)
+    for line in profiler.collapsed().splitlines():
+        stack, weight = line.rsplit(" ", 1)
+        assert stack in profiler.stacks and int(weight) > 0
+    profiler.reset()
+    assert profiler.collapsed() == "" and profiler.samples == 0
+
+
+def test_profiled_call_that_raises_still_unhooks():
+    profiler = StackProfiler()
+
+    def fail():
+        raise ValueError("boom")
+    try:
+        profiler.run("action", fail)
+    except ValueError:
+        pass
+    assert sys.getprofile() is None and profiler.samples == 1
+
+
+def test_sample_rate_bounds():
+    assert not any(StackProfiler(0).sample() for _ in range(100))
+    assert all(StackProfiler(1).sample() for _ in range(100))
+
+
+def test_room_actions_are_profiled_under_their_action_name(monkeypatch, registry):
+    monkeypatch.setattr(server, "profiler", StackProfiler(1))
+    monkeypatch.setattr(server, "send_room_state", lambda room_id: asyncio.sleep(0))
+    registry.rooms[1].add_player(Player("alice"))
+
+    async def run():
+        actor = server.RoomActor(1)
+        actor.submit(server.handle_message, "alice", {"action": "start_game"})
+        for _ in range(5):
+            await asyncio.sleep(0)
+        actor.stop()
+    asyncio.run(run())
+    assert registry.rooms[1].game_status == "choosing"
+    assert any(stack.startswith("start_game;handle_message (server.py:") for stack in server.profiler.stacks)
+
+
+def test_profiler_endpoints_need_the_token(monkeypatch):
+    monkeypatch.setattr(server, "profiler", StackProfiler())
+    monkeypatch.setattr(server, "EVENT_LOG_DIR", "")
+    with TestClient(server.app) as client:
+        monkeypatch.setattr(server, "PROFILER_TOKEN", "")
+        assert client.get("/api/profiler", headers={"X-Profiler-Token": ""}).status_code == 403
+        monkeypatch.setattr(server, "PROFILER_TOKEN", "secret")
+        assert client.get("/api/profiler").status_code == 403
+        assert client.put("/api/profiler", json={"sample_rate": 0.5}, headers={"X-Profiler-Token": "wrong"}).status_code == 403
+        assert server.profiler.sample_rate == 0
+        response = client.put("/api/profiler", json={"sample_rate": 0.5}, headers={"X-Profiler-Token": "secret"})
+        assert response.json() == {"sample_rate": 0.5, "samples": 0}
+        response = client.get("/api/profiler", headers={"X-Profiler-Token": "secret"})
+        assert response.status_code == 200 and response.headers["X-Sample-Rate"] == "0.5"
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from rate_limit import TokenBucket
+
+
+def test_bucket_allows_a_burst_then_refills_at_its_rate():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    assert [bucket.take(now) for _ in range(4)] == [True, True, True, False]
+    assert not bucket.take(now + 0.4)
+    assert bucket.take(now + 0.5)
+    # Idle time never fills it past the burst
+    assert [bucket.take(now + 100) for _ in range(4)] == [True, True, True, False]
+
+
+def test_give_back_is_capped_at_the_burst():
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.give_back()
+    assert bucket.tokens == 2
+    bucket.take()
+    bucket.give_back()
+    assert bucket.tokens == 2
+
+
+@pytest.fixture
+def submitted(monkeypatch, registry):
+    """(nickname, message) of every action let through to a room"""
+    actions = []
+    monkeypatch.setattr(registry, "submit", lambda room_id, handler, *args: actions.append(args))
+    monkeypatch.setattr(server, "RATE_LIMIT_SCALE", 1)
+    return actions
+
+
+def client(nickname="alice"):
+    return SimpleNamespace(room_id=1, nickname=nickname, buckets={}, held={}, closed=False)
+
+
+def choose(number):
+    return {"action": "choose_number", "number": number}
+
+
+def test_over_the_limit_only_the_latest_value_is_held(monkeypatch, submitted):
+    monkeypatch.setitem(server.CONNECTION_ACTION_LIMITS, "choose_number", (20, 2))
+
+    async def run():
+        alice = client()
+        for number in range(5):
+            server.submit_action(alice, choose(number))
+        assert submitted == [("alice", choose(0)), ("alice", choose(1))]
+        assert alice.held == {"choose_number": choose(4)}
+        await asyncio.sleep(0.1)
+        assert submitted[2:] == [("alice", choose(4))] and alice.held == {}
+    asyncio.run(run())
+
+
+def test_over_the_limit_other_actions_are_dropped(monkeypatch, submitted):
+    monkeypatch.setitem(server.CONNECTION_ACTION_LIMITS, "start_game", (20, 2))
+
+    async def run():
+        alice = client()
+        for _ in range(4):
+            server.submit_action(alice, {"action": "start_game"})
+        assert len(submitted) == 2 and alice.held == {}
+        await asyncio.sleep(0.1)
+        assert len(submitted) == 2
+    asyncio.run(run())
+
+
+def test_room_limit_is_shared_and_spares_the_connection_budget(monkeypatch, submitted):
+    monkeypatch.setitem(server.ROOM_ACTION_LIMITS, "stop_game", (0.001, 2))
+
+    async def run():
+        server.submit_action(client("alice"), {"action": "stop_game"})
+        server.submit_action(client("bob"), {"action": "stop_game"})
+        # A reconnect gets a fresh connection bucket, but not a fresh room one
+        reconnected = client("alice")
+        server.submit_action(reconnected, {"action": "stop_game"})
+        assert [nickname for nickname, _ in submitted] == ["alice", "bob"]
+        # The room ran dry, so the connection's own token was handed back
+        bucket = reconnected.buckets["stop_game"]
+        assert bucket.tokens == pytest.approx(bucket.burst, abs=0.01)
+    asyncio.run(run())
+
+
+def test_scale_zero_turns_limiting_off(monkeypatch, submitted):
+    monkeypatch.setattr(server, "RATE_LIMIT_SCALE", 0)
+    alice = client()
+    for _ in range(50):
+        server.submit_action(alice, {"action": "start_game"})
+    assert len(submitted) == 50 and alice.buckets == {}
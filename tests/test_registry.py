@@ -0,0 +1,93 @@
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+import server
+from server import Player
+
+
+def test_rooms_are_created_on_first_use_within_range(monkeypatch, registry):
+    monkeypatch.setattr(server, "MAX_ROOM_ID", 100)
+    assert registry.get_or_create(1) is registry.rooms[1]
+    assert registry.get_or_create(50).room_id == 50
+    assert registry.get_or_create(0) is None and registry.get_or_create(101) is None
+    monkeypatch.setattr(server, "MAX_ROOMS", len(registry.rooms))
+    assert registry.get_or_create(60) is None
+    assert registry.ordered_ids == [1, 2, 3, 4, 50]
+    assert registry.next_room_id() == 51
+
+
+def test_release_resets_permanent_rooms_and_drops_on_demand_ones(registry):
+    for room_id in (1, 10):
+        room = registry.get_or_create(room_id)
+        room.add_player(Player("alice"))
+        room.start_round()
+    registry.release(1)
+    assert registry.rooms[1].game_status == "waiting" and not registry.rooms[1].players
+    registry.release(10)
+    for table in (registry.rooms, registry.connections, registry.player_connections, registry.viewer_connections,
+                  registry.sync, registry.buckets, registry.last_active):
+        assert 10 not in table
+    assert 10 not in registry.ordered_ids
+
+
+def test_idle_on_demand_rooms_are_collected(monkeypatch, registry):
+    monkeypatch.setattr(server, "ROOM_IDLE_TTL", 60)
+    for room_id in (10, 11, 12):
+        registry.get_or_create(room_id)
+    registry.connections[11]["alice"] = object()
+    registry.last_active[10] -= 120
+    registry.last_active[11] -= 120
+    registry.last_active[1] -= 120
+    assert registry.collect_idle() == 1
+    # 11 still has a socket, 12 was active lately, and permanent rooms stay
+    assert [room_id for room_id in registry.ordered_ids if room_id >= 10] == [11, 12] and 1 in registry.rooms
+
+
+def test_pages_follow_the_cursor_and_filters(registry):
+    for room_id in (7, 20, 9):
+        registry.get_or_create(room_id)
+    registry.rooms[9].start_round()
+    registry.connections[20]["alice"] = object()
+    page, cursor = registry.page(0, 3)
+    assert [room.room_id for room in page] == [1, 2, 3] and cursor == 3
+    page, cursor = registry.page(cursor, 3)
+    assert [room.room_id for room in page] == [4, 7, 9] and cursor == 9
+    page, cursor = registry.page(cursor, 3)
+    assert [room.room_id for room in page] == [20] and cursor is None
+    assert [room.room_id for room in registry.page(0, 10, game_status="choosing")[0]] == [9]
+    assert [room.room_id for room in registry.page(0, 10, has_players=True)[0]] == [20]
+
+
+def test_rooms_api_creates_and_pages(client):
+    created = client.post("/api/rooms", json={"room_name": "ערב משחקים"}).json()
+    assert created["room_id"] == 5 and created["room_name"] == "ערב משחקים"
+    response = client.get("/api/rooms?limit=3")
+    assert [room["room_id"] for room in response.json()] == [1, 2, 3]
+    assert response.headers["X-Next-Cursor"] == "3"
+    response = client.get("/api/rooms?after=3&limit=3")
+    assert [room["room_id"] for room in response.json()] == [4, 5]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_joining_an_unknown_room_creates_it_and_leaving_frees_it(client, registry):
+    with client.websocket_connect("/api/ws/42/alice?full_state=true") as alice:
+        assert alice.receive_json()["room_id"] == 42
+        assert 42 in registry.rooms
+    # Leaving is handled by the room's actor, in the app's own thread
+    deadline = time.monotonic() + 2
+    while 42 in registry.rooms and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert 42 not in registry.rooms
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f"/api/ws/{server.MAX_ROOM_ID + 1}/alice"):
+            pass
+
+
+def test_a_full_room_turns_players_away(monkeypatch, client):
+    monkeypatch.setattr(server, "MAX_PLAYERS_PER_ROOM", 1)
+    with client.websocket_connect("/api/ws/1/alice?full_state=true") as alice:
+        alice.receive_json()
+        with client.websocket_connect("/api/ws/1/bob?full_state=true") as bob:
+            assert bob.receive_json() == {"type": "error", "message": "החדר מלא, לא ניתן להצטרף עכשיו"}
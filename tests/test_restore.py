@@ -0,0 +1,229 @@
+import asyncio
+
+import pytest
+
+import server
+from event_log import EventLog
+from server import Player
+
+
+@pytest.fixture
+def log_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "event_log", None)
+    monkeypatch.setattr(server, "shutdown_state", None)
+    return tmp_path
+
+
+async def start(monkeypatch, log_dir) -> EventLog:
+    """What startup does: a fresh registry rebuilt from the log, which then records every change"""
+    monkeypatch.setattr(server, "event_log", None)
+    monkeypatch.setattr(server, "shutdown_state", None)
+    registry = server.RoomRegistry(server.ROOM_NAMES)
+    monkeypatch.setattr(server, "registry", registry)
+    monkeypatch.setattr(server, "rooms", registry.rooms)
+    monkeypatch.setattr(server, "room_connections", registry.connections)
+    monkeypatch.setattr(server, "room_sync", registry.sync)
+    log = EventLog(log_dir, server.encode_message, server.decode_message)
+    server.recover_rooms(log)
+    await log.start()
+    monkeypatch.setattr(server, "event_log", log)
+    return log
+
+
+def play_round(room_id: int, numbers: dict):
+    room = server.rooms[room_id]
+    room.start_round()
+    for nickname, number in numbers.items():
+        room.set_number(nickname, number)
+    server.calculate_winner(room_id)
+
+
+def test_snapshot_and_tail_are_restored(monkeypatch, log_dir):
+    async def run():
+        log = await start(monkeypatch, log_dir)
+        room = server.rooms[1]
+        room.add_player(Player("alice"))
+        room.add_player(Player("bob"))
+        room.set_multiplier(0.5)
+        play_round(1, {"alice": 10, "bob": 30})
+        await log.snapshot(server.capture_rooms)
+        play_round(1, {"alice": 20, "bob": 40})
+        room.start_round()
+        room.set_number("bob", 50)
+        await log.stop()
+
+        await start(monkeypatch, log_dir)
+        restored = server.rooms[1]
+        assert restored.game_status == "choosing"
+        assert restored.current_round == 3
+        assert restored.multiplier == 0.5
+        assert [r.target_number for r in restored.game_history] == [10, 15]
+        assert restored.stats.rounds == 2
+        assert {p.nickname: p.number for p in restored.players.values()} == {"alice": None, "bob": 50}
+        assert not any(p.connected for p in restored.players.values())
+        await server.event_log.stop()
+    asyncio.run(run())
+
+
+def test_players_who_left_are_not_restored(monkeypatch, log_dir):
+    async def run():
+        log = await start(monkeypatch, log_dir)
+        server.rooms[2].add_player(Player("bob"))
+        server.rooms[2].add_player(Player("alice"))
+        server.manager.disconnect(2, "alice")
+        await log.stop()
+
+        await start(monkeypatch, log_dir)
+        assert list(server.rooms[2].players) == ["bob"]
+        await server.event_log.stop()
+    asyncio.run(run())
+
+
+def test_rejoining_player_is_restored_once(monkeypatch, log_dir):
+    async def run():
+        log = await start(monkeypatch, log_dir)
+        server.rooms[2].add_player(Player("bob"))
+        server.rooms[2].add_player(Player("alice"))
+        server.rooms[2].add_player(Player("bob", is_viewer=True))
+        await log.stop()
+
+        await start(monkeypatch, log_dir)
+        players = server.rooms[2].players
+        assert list(players) == ["alice", "bob"] and players["bob"].is_viewer
+        await server.event_log.stop()
+    asyncio.run(run())
+
+
+def test_released_room_restarts_empty(monkeypatch, log_dir):
+    async def run():
+        log = await start(monkeypatch, log_dir)
+        server.rooms[1].add_player(Player("alice"))
+        server.rooms[1].add_player(Player("bob"))
+        server.rooms[1].start_round()
+        server.manager.disconnect(1, "alice")
+        server.manager.disconnect(1, "bob")
+        assert server.rooms[1].game_status == "waiting"
+        await log.stop()
+
+        log = await start(monkeypatch, log_dir)
+        room = server.rooms[1]
+        assert room.game_status == "waiting" and not room.players
+        # With a snapshot in between as well
+        room.add_player(Player("carol"))
+        server.manager.disconnect(1, "carol")
+        await log.snapshot(server.capture_rooms)
+        await log.stop()
+
+        await start(monkeypatch, log_dir)
+        assert server.rooms[1].game_status == "waiting" and not server.rooms[1].players
+        await server.event_log.stop()
+    asyncio.run(run())
+
+
+def test_released_on_demand_room_is_gone(monkeypatch, log_dir):
+    async def run():
+        log = await start(monkeypatch, log_dir)
+        server.registry.get_or_create(10).add_player(Player("alice"))
+        play_round(10, {"alice": 10})
+        server.manager.disconnect(10, "alice")
+        await log.stop()
+
+        await start(monkeypatch, log_dir)
+        assert 10 not in server.rooms
+        await server.event_log.stop()
+    asyncio.run(run())
+
+
+def test_players_who_do_not_come_back_are_dropped(monkeypatch, log_dir):
+    async def run():
+        log = await start(monkeypatch, log_dir)
+        for room_id in (1, 2):
+            for nickname in ("alice", "bob", "carol"):
+                server.rooms[room_id].add_player(Player(nickname))
+        server.rooms[1].start_round()
+        server.rooms[1].set_number("alice", 10)
+        server.rooms[1].set_number("bob", 30)
+        await log.stop()
+
+        await start(monkeypatch, log_dir)
+        # Only alice rejoins room 1, so far; nobody rejoins room 2
+        server.rooms[1].set_connected("alice", True)
+        assert list(server.rooms[1].players) == ["alice", "bob", "carol"]
+        assert server.drop_absent_players(1, ["alice", "bob", "carol"]) == server.IMMEDIATE_BROADCAST
+        room = server.rooms[1]
+        assert list(room.players) == ["alice"] and room.admin == "alice"
+        # Carol was the one the round was waiting for
+        assert room.game_status == "results" and room.game_history[-1].players_data == {"alice": 10}
+        assert server.drop_absent_players(2, ["alice", "bob", "carol"]) == server.NO_BROADCAST
+        assert server.rooms[2].game_status == "waiting" and not server.rooms[2].players
+        await server.event_log.stop()
+
+        await start(monkeypatch, log_dir)
+        assert list(server.rooms[1].players) == ["alice"] and not server.rooms[2].players
+        await server.event_log.stop()
+    asyncio.run(run())
+
+
+def test_shutdown_keeps_the_rooms_being_played(monkeypatch, log_dir):
+    async def run():
+        await start(monkeypatch, log_dir)
+        server.rooms[1].add_player(Player("alice"))
+        server.rooms[1].add_player(Player("bob"))
+        server.rooms[1].start_round()
+        server.rooms[1].set_number("alice", 10)
+        # A shutdown signal, then the server closing every socket
+        server.freeze_rooms()
+        server.manager.disconnect(1, "alice")
+        server.manager.disconnect(1, "bob")
+        await server.close_event_log()
+
+        await start(monkeypatch, log_dir)
+        room = server.rooms[1]
+        assert room.game_status == "choosing"
+        assert {p.nickname: p.number for p in room.players.values()} == {"alice": 10, "bob": None}
+        await server.event_log.stop()
+    asyncio.run(run())
+
+
+def test_export_keeps_rounds_past_compaction(monkeypatch, log_dir):
+    async def run():
+        monkeypatch.setattr(server, "EVENT_LOG_DIR", str(log_dir))
+        log = await start(monkeypatch, log_dir)
+        server.rooms[1].add_player(Player("alice"))
+        play_round(1, {"alice": 10})
+        server.registry.get_or_create(10).add_player(Player("bob"))
+        play_round(10, {"bob": 20})
+        server.rooms[1].clear_history()
+        server.manager.disconnect(1, "alice")
+        server.manager.disconnect(10, "bob")
+        server.rooms[1].add_player(Player("carol"))
+        await log.snapshot(server.capture_rooms)
+        assert [(room_id, round_number) for (_, room_id, round_number), _ in server.logged_rounds()] == [(1, 1), (10, 1)]
+        await log.stop()
+
+        await start(monkeypatch, log_dir)
+        server.rooms[1].add_player(Player("carol"))
+        play_round(1, {"carol": 30})
+        await server.event_log.flush()
+        rounds = [data for _, data in server.logged_rounds()]
+        assert [(r["round_number"], r["winner"]) for r in rounds] == [(1, "alice"), (1, "bob"), (1, "carol")]
+        await server.event_log.stop()
+    asyncio.run(run())
+
+
+def test_archive_is_seeded_from_the_rooms_on_first_run(monkeypatch, log_dir):
+    async def run():
+        monkeypatch.setattr(server, "EVENT_LOG_DIR", str(log_dir))
+        log = await start(monkeypatch, log_dir)
+        server.rooms[1].add_player(Player("alice"))
+        play_round(1, {"alice": 10})
+        play_round(1, {"alice": 20})
+        await log.stop()
+        # As left by a version that kept no archive
+        (log_dir / "archive.log").unlink()
+
+        await start(monkeypatch, log_dir)
+        await server.event_log.flush()
+        assert [round_number for (_, _, round_number), _ in server.logged_rounds()] == [1, 2]
+        await server.event_log.stop()
+    asyncio.run(run())
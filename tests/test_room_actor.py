@@ -0,0 +1,66 @@
+import asyncio
+
+import server
+from server import Player
+
+
+def record_broadcasts(monkeypatch, fail_first=False):
+    """(game_status, current_round) of the room at every immediate broadcast"""
+    sent = []
+
+    async def send_room_state(room_id):
+        if fail_first and not sent:
+            sent.append(None)
+            raise RuntimeError("boom")
+        room = server.rooms[room_id]
+        sent.append((room.game_status, room.current_round))
+    monkeypatch.setattr(server, "send_room_state", send_room_state)
+    monkeypatch.setattr(server, "BROADCAST_COALESCE_MS", 0)
+    return sent
+
+
+async def settle(actor):
+    for _ in range(100):
+        if not actor.inbox:
+            break
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+
+def choose(nickname, number):
+    return (server.handle_message, nickname, {"action": "choose_number", "number": number})
+
+
+def test_results_go_out_before_the_next_round_in_the_same_batch(monkeypatch, registry):
+    sent = record_broadcasts(monkeypatch)
+    room = registry.rooms[1]
+    room.add_player(Player("alice"))
+    room.add_player(Player("bob"))
+    room.start_round()
+
+    async def run():
+        actor = server.RoomActor(1)
+        for handler, *args in [choose("alice", 10), choose("bob", 30),
+                               (server.handle_message, "alice", {"action": "new_round"})]:
+            actor.submit(handler, *args)
+        await settle(actor)
+        actor.stop()
+    asyncio.run(run())
+    assert sent == [("results", 1), ("choosing", 2)]
+
+
+def test_a_failing_broadcast_does_not_stop_the_room(monkeypatch, registry):
+    sent = record_broadcasts(monkeypatch, fail_first=True)
+    room = registry.rooms[1]
+    room.add_player(Player("alice"))
+
+    async def run():
+        actor = server.RoomActor(1)
+        actor.submit(server.handle_message, "alice", {"action": "start_game"})
+        await settle(actor)
+        actor.submit(server.handle_message, "alice", {"action": "stop_game"})
+        await settle(actor)
+        assert not actor.task.done()
+        actor.stop()
+    asyncio.run(run())
+    assert sent == [None, ("waiting", 1)]
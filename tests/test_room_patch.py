@@ -0,0 +1,110 @@
+from server import GameRound, RoomState, RoomSync, HISTORY_INLINE_ROUNDS, diff_room_state
+
+FIELDS = {"game_status": "waiting", "current_round": 0, "multiplier": 0.8}
+
+
+def player(nickname, **changes):
+    return {"player_id": nickname, "nickname": nickname, "is_admin": False, "has_chosen": False,
+            "number": None, "connected": True, **changes}
+
+
+def game_round(round_number):
+    return GameRound(round_number=round_number, players_data={"a": 10}, total_sum=10, average=10,
+                     target_number=8, winner="a", timestamp=f"2026-01-01T00:00:{round_number:02d}+00:00")
+
+
+def test_first_diff_sends_everything():
+    sync, room = RoomSync(), RoomState(room_id=1)
+    patch = diff_room_state(sync, room, FIELDS, [player("a"), player("b")])
+    assert patch["version"] == 1 and patch["base_version"] == 0
+    assert patch["set"] == FIELDS
+    assert [p["nickname"] for p in patch["players"]["upsert"]] == ["a", "b"]
+    assert "order" not in patch["players"] and "remove" not in patch["players"]
+
+
+def test_unchanged_state_is_no_patch():
+    sync, room = RoomSync(), RoomState(room_id=1)
+    diff_room_state(sync, room, FIELDS, [player("a")])
+    assert diff_room_state(sync, room, dict(FIELDS), [player("a")]) is None
+    assert sync.version == 1
+
+
+def test_only_changed_fields_and_players_are_sent():
+    sync, room = RoomSync(), RoomState(room_id=1)
+    diff_room_state(sync, room, FIELDS, [player("a"), player("b")])
+    patch = diff_room_state(sync, room, {**FIELDS, "game_status": "choosing"}, [player("a"), player("b", has_chosen=True)])
+    assert patch["set"] == {"game_status": "choosing"}
+    assert patch["players"] == {"upsert": [player("b", has_chosen=True)]}
+    assert patch["base_version"] == 1
+
+
+def test_new_players_are_appended_without_order():
+    sync, room = RoomSync(), RoomState(room_id=1)
+    diff_room_state(sync, room, FIELDS, [player("a"), player("b")])
+    patch = diff_room_state(sync, room, FIELDS, [player("a"), player("c")])
+    assert patch["players"] == {"remove": ["b"], "upsert": [player("c")]}
+
+
+def test_order_is_sent_when_players_move():
+    # Even when no entry changed
+    sync, room = RoomSync(), RoomState(room_id=1)
+    diff_room_state(sync, room, FIELDS, [player("a"), player("b"), player("c")])
+    patch = diff_room_state(sync, room, FIELDS, [player("b"), player("a"), player("c")])
+    assert patch["players"] == {"order": ["b", "a", "c"]}
+    # A new player placed ahead of existing ones is not where clients would append it
+    patch = diff_room_state(sync, room, FIELDS, [player("d"), player("b"), player("a"), player("c")])
+    assert patch["players"] == {"upsert": [player("d")], "order": ["d", "b", "a", "c"]}
+
+
+def test_new_rounds_are_appended():
+    sync, room = RoomSync(), RoomState(room_id=1)
+    room.add_round(game_round(1))
+    patch = diff_room_state(sync, room, FIELDS, [])
+    assert [r["round_number"] for r in patch["history_append"]] == [1]
+    assert "history_reset" not in patch
+    room.add_round(game_round(2))
+    room.add_round(game_round(3))
+    patch = diff_room_state(sync, room, FIELDS, [])
+    assert [r["round_number"] for r in patch["history_append"]] == [2, 3]
+    assert [r["round_number"] for r in sync.history] == [1, 2, 3]
+
+
+def test_only_the_inline_rounds_are_appended():
+    sync, room = RoomSync(), RoomState(room_id=1)
+    for round_number in range(1, HISTORY_INLINE_ROUNDS + 6):
+        room.add_round(game_round(round_number))
+    patch = diff_room_state(sync, room, FIELDS, [])
+    assert [r["round_number"] for r in patch["history_append"]] == list(range(6, HISTORY_INLINE_ROUNDS + 6))
+    assert len(sync.history) == HISTORY_INLINE_ROUNDS
+
+
+def test_cleared_history_is_reset():
+    sync, room = RoomSync(), RoomState(room_id=1)
+    room.add_round(game_round(1))
+    diff_room_state(sync, room, FIELDS, [])
+    room.clear_history()
+    patch = diff_room_state(sync, room, FIELDS, [])
+    assert patch["history_reset"] is True and "history_append" not in patch
+    room.add_round(game_round(2))
+    patch = diff_room_state(sync, room, FIELDS, [])
+    assert "history_reset" not in patch
+    assert [r["round_number"] for r in patch["history_append"]] == [2]
+    # A clear before anything was sent has nothing to reset, just rounds to append
+    room.clear_history()
+    room.add_round(game_round(3))
+    sync = RoomSync()
+    patch = diff_room_state(sync, room, FIELDS, [])
+    assert "history_reset" not in patch
+    assert [r["round_number"] for r in patch["history_append"]] == [3]
+
+
+def test_cleared_and_refilled_history_is_reset_and_appended():
+    sync, room = RoomSync(), RoomState(room_id=1)
+    room.add_round(game_round(1))
+    diff_room_state(sync, room, FIELDS, [])
+    room.clear_history()
+    room.add_round(game_round(2))
+    patch = diff_room_state(sync, room, FIELDS, [])
+    assert patch["history_reset"] is True
+    assert [r["round_number"] for r in patch["history_append"]] == [2]
+    assert [r["round_number"] for r in sync.history] == [2]
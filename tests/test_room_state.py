@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+from server import Player, RoomState
+
+
+@pytest.fixture
+def room(registry):
+    return RoomState(room_id=1)
+
+
+def recount(room):
+    connected = [p for p in room.players.values() if p.connected]
+    playing = [p for p in connected if not p.is_viewer]
+    return len(connected), len(playing), len([p for p in playing if p.number is not None])
+
+
+def test_counts_follow_joins_choices_and_disconnects(room):
+    room.add_player(Player("alice"))
+    room.add_player(Player("bob"))
+    room.add_player(Player("vic", is_viewer=True))
+    assert (room.connected_count, room.playing_count, room.viewers_count) == (3, 2, 1)
+    room.set_number("alice", 10)
+    room.set_number("vic", 20)  # viewers don't count as choosing
+    assert room.chosen_count == 1 and not room.all_chosen
+    room.set_connected("bob", False)
+    assert (room.connected_count, room.playing_count, room.chosen_count) == (2, 1, 1)
+    assert room.all_chosen
+    room.set_connected("bob", True)
+    assert not room.all_chosen
+    room.set_number("bob", 30)
+    assert room.all_chosen
+    room.reset_numbers()
+    assert room.chosen_count == 0 and not room.all_chosen
+
+
+def test_a_room_of_viewers_has_not_all_chosen(room):
+    room.add_player(Player("vic", is_viewer=True))
+    assert room.playing_count == 0 and not room.all_chosen
+
+
+def test_rejoining_replaces_the_old_entry(room):
+    room.add_player(Player("alice"))
+    room.set_number("alice", 10)
+    room.add_player(Player("alice", is_viewer=True))
+    assert len(room.players) == 1 and room.players["alice"].is_viewer
+    assert (room.connected_count, room.playing_count, room.chosen_count) == (1, 0, 0)
+
+
+def test_admin_passes_to_the_longest_connected_player(room):
+    for nickname in ("alice", "bob", "carol"):
+        room.add_player(Player(nickname))
+    assert room.admin == "alice" and room.players["alice"].is_admin
+    room.set_connected("bob", False)
+    room.set_connected("bob", True)  # now connected after carol
+    room.set_connected("alice", False)
+    assert room.admin == "carol"
+    assert room.players["carol"].is_admin and not room.players["alice"].is_admin
+    room.remove_player("carol")
+    assert room.admin == "bob"
+    room.set_connected("bob", False)
+    assert room.admin is None
+    room.set_connected("alice", True)
+    assert room.admin == "alice"
+
+
+def test_viewer_admin_is_not_a_playing_admin(room):
+    room.add_player(Player("vic", is_viewer=True))
+    room.add_player(Player("alice"))
+    assert room.admin == "vic" and not room.has_playing_admin
+
+
+def test_counts_match_a_recount(room):
+    rng = random.Random(6)
+    nicknames = [f"p{i}" for i in range(8)]
+    for _ in range(2000):
+        nickname = rng.choice(nicknames)
+        op = rng.randrange(5)
+        if nickname not in room.players or op == 0:
+            room.add_player(Player(nickname, is_viewer=rng.random() < 0.2, connected=rng.random() < 0.9))
+        elif op == 1:
+            room.remove_player(nickname)
+        elif op == 2:
+            room.set_connected(nickname, not room.players[nickname].connected)
+        elif op == 3:
+            room.set_number(nickname, rng.choice([None, rng.randint(0, 100)]))
+        elif rng.random() < 0.1:
+            room.reset_numbers()
+        assert (room.connected_count, room.playing_count, room.chosen_count) == recount(room)
+        admins = [p.nickname for p in room.players.values() if p.is_admin]
+        if room.connected_count:
+            assert admins == [room.admin] and room.players[room.admin].connected
+        else:
+            assert room.admin is None and admins == []
@@ -0,0 +1,55 @@
+import server
+from server import Player
+
+
+def test_unchanged_lobby_is_answered_with_304(client):
+    first = client.get("/api/rooms?limit=5")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+    second = client.get("/api/rooms?limit=5", headers={"If-None-Match": etag})
+    assert second.status_code == 304 and second.content == b""
+    assert second.headers["etag"] == etag
+    # Any page of the same lobby shares the tag
+    assert client.get("/api/rooms?limit=2", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_room_changes_change_the_etag(client, registry):
+    etag = client.get("/api/rooms?limit=5").headers["etag"]
+    registry.rooms[1].add_player(Player("alice"))
+    response = client.get("/api/rooms?limit=5", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert response.json()[0]["players"] == ["alice"]
+    etag = response.headers["etag"]
+    registry.rooms[1].start_round()
+    response = client.get("/api/rooms?limit=5", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.json()[0]["game_status"] == "choosing"
+    etag = response.headers["etag"]
+    room_id = client.post("/api/rooms", json={}).json()["room_id"]
+    response = client.get(f"/api/rooms?after={room_id - 1}&limit=1", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.json()[0]["room_id"] == room_id
+
+
+def test_choices_do_not_change_the_etag(client, registry):
+    # The lobby doesn't show numbers, so polls stay 304 while a round is played
+    room = registry.rooms[1]
+    room.add_player(Player("alice"))
+    room.start_round()
+    etag = client.get("/api/rooms").headers["etag"]
+    room.set_number("alice", 10)
+    assert client.get("/api/rooms", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_pages_are_encoded_once_per_version(client, registry):
+    client.get("/api/rooms?limit=5")
+    cached = server.lobby.pages[(0, 5, None, None)]
+    client.get("/api/rooms?limit=5")
+    assert server.lobby.pages[(0, 5, None, None)] is cached
+    registry.rooms[2].add_player(Player("bob"))
+    assert server.lobby.pages == {}
+    assert client.get("/api/rooms?limit=5").json()[1]["players"] == ["bob"]
+
+
+def test_a_restart_never_reuses_an_etag(monkeypatch, client):
+    etag = client.get("/api/rooms").headers["etag"]
+    monkeypatch.setattr(server, "lobby", server.LobbyCache())
+    assert client.get("/api/rooms", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,156 @@
+import asyncio
+
+import server
+from server import Player, RoomState
+from timer_wheel import TimerWheel
+
+
+def wheel(**options):
+    """A wheel recording (key, value, tick) for every timer it fires"""
+    fired = []
+    timers = TimerWheel(lambda key, value: fired.append((key, value, timers.ticks)), **options)
+    return timers, fired
+
+
+def advance(timers: TimerWheel, ticks: int):
+    for _ in range(ticks):
+        timers.advance()
+
+
+def test_timer_fires_on_its_tick():
+    timers, fired = wheel(tick=1, slots=4, levels=3)
+    timers.schedule("a", 3, "value")
+    advance(timers, 2)
+    assert fired == []
+    advance(timers, 1)
+    assert fired == [("a", "value", 3)]
+    assert len(timers) == 0
+
+
+def test_delays_round_up_to_whole_ticks():
+    timers, fired = wheel(tick=0.5, slots=4, levels=3)
+    timers.schedule("a", 0.1)
+    timers.schedule("b", 1.2)
+    advance(timers, 3)
+    assert fired == [("a", None, 1), ("b", None, 3)]
+
+
+def test_far_timers_cascade_down_the_levels():
+    timers, fired = wheel(tick=1, slots=4, levels=3)
+    # Slots cover 1, 4 and 16 ticks; these start out on every level
+    delays = [1, 3, 4, 5, 15, 16, 17, 40, 63]
+    for delay in delays:
+        timers.schedule(f"in {delay}", delay)
+    assert {level for level, _, _, _ in timers.timers.values()} == {0, 1, 2}
+    advance(timers, 63)
+    assert fired == [(f"in {delay}", None, delay) for delay in delays]
+
+
+def test_timers_beyond_the_span_wait_at_the_top():
+    timers, fired = wheel(tick=1, slots=4, levels=2)
+    timers.schedule("far", 37)  # the two levels span 16 ticks
+    advance(timers, 36)
+    assert fired == []
+    advance(timers, 1)
+    assert fired == [("far", None, 37)]
+
+
+def test_cascading_from_a_later_start():
+    timers, fired = wheel(tick=1, slots=4, levels=3)
+    advance(timers, 13)
+    timers.schedule("a", 7)
+    timers.schedule("b", 20)
+    advance(timers, 20)
+    assert fired == [("a", None, 20), ("b", None, 33)]
+
+
+def test_scheduling_a_key_again_replaces_its_timer():
+    timers, fired = wheel(tick=1, slots=4, levels=3)
+    timers.schedule("a", 20, "first")
+    timers.schedule("a", 2, "second")
+    assert len(timers) == 1
+    advance(timers, 30)
+    assert fired == [("a", "second", 2)]
+    # And the other way round, from a near slot to a far one
+    timers.schedule("b", 1, "first")
+    timers.schedule("b", 10, "second")
+    advance(timers, 10)
+    assert fired[1:] == [("b", "second", 40)]
+
+
+def test_cancel():
+    timers, fired = wheel(tick=1, slots=4, levels=3)
+    timers.schedule("a", 2)
+    timers.schedule("b", 20)
+    timers.cancel("a")
+    timers.cancel("b")
+    timers.cancel("never scheduled")
+    advance(timers, 30)
+    assert fired == [] and len(timers) == 0
+
+
+def test_a_failing_callback_does_not_stop_the_others():
+    fired = []
+
+    def on_expire(key, value):
+        if key == "bad":
+            raise RuntimeError("boom")
+        fired.append(key)
+    timers = TimerWheel(on_expire, tick=1, slots=4, levels=2)
+    timers.schedule("bad", 1)
+    timers.schedule("good", 1)
+    advance(timers, 1)
+    assert fired == ["good"]
+
+
+def test_expired_round_is_scored_and_keeps_everyone(monkeypatch, registry):
+    room = registry.rooms[1]
+    room.add_player(Player("alice"))
+    room.add_player(Player("bob"))
+    room.start_round()
+    room.set_number("bob", 40)
+    assert server.expire_round(1, room.current_round) == server.IMMEDIATE_BROADCAST
+    assert room.game_status == "results"
+    assert room.game_history[-1].players_data == {"bob": 40}
+    assert room.game_history[-1].winner == "bob"
+    # Alice just didn't choose - she stays connected, and admin, and is listed in the results
+    assert room.players["alice"].connected and room.admin == "alice"
+    sent = []
+    monkeypatch.setattr(server.manager, "broadcast_state", lambda room_id, state, patch: sent.append(state))
+    asyncio.run(server.send_room_state(1))
+    assert [(p["nickname"], p["is_admin"], p["number"]) for p in sent[0]["players"]] == [("alice", True, None), ("bob", False, 40)]
+
+
+def test_expired_round_with_no_choices_goes_back_to_waiting(registry):
+    room = registry.rooms[1]
+    room.add_player(Player("alice"))
+    room.add_player(Player("bob"))
+    room.start_round()
+    assert server.expire_round(1, room.current_round) == server.IMMEDIATE_BROADCAST
+    assert room.game_status == "waiting" and room.game_history == []
+    assert room.connected_count == 2 and room.admin == "alice"
+
+
+def test_expired_round_of_an_earlier_round_is_ignored(registry):
+    room = registry.rooms[1]
+    room.add_player(Player("alice"))
+    room.start_round()
+    assert server.expire_round(1, room.current_round - 1) == server.NO_BROADCAST
+    assert room.game_status == "choosing"
+
+
+def test_expired_round_in_an_empty_room_frees_it(registry):
+    # As restored from a snapshot taken in the middle of a round nobody came back to
+    for room_id in (1, 10):
+        data = RoomState(room_id=room_id, game_status="choosing", current_round=3).to_snapshot()
+        data["players"] = [{"nickname": "alice", "player_id": "a", "is_viewer": False, "number": 20}]
+        if room_id not in registry.rooms:
+            registry.create(room_id)
+        registry.rooms[room_id] = RoomState.from_snapshot(data)
+
+    assert server.expire_round(1, 3) == server.NO_BROADCAST
+    room = registry.rooms[1]
+    assert room.game_status == "waiting" and not room.players
+    assert room.game_history == [] and room.stats.rounds == 0
+    server.expire_round(10, 3)
+    assert 10 not in registry.rooms
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import server
+from server import Player, score_round
+
+
+def test_closest_player_wins_and_ties_go_to_the_earliest():
+    score = score_round(["a", "b", "c"], [10, 50, 90], 0.8)
+    assert (score.total_sum, score.average, score.target) == (150, 50, 40)
+    assert score.closest == ["b"]
+    # 30 and 50 are both 10 away from a target of 40
+    assert score_round(["a", "b", "c"], [50, 30, 70], 0.8).closest == ["a"]
+    assert score_round([], [], 0.8).closest == []
+
+
+def test_top_k_orders_by_distance_then_join_order():
+    score = score_round(["a", "b", "c", "d"], [0, 20, 0, 20], 1.0, top_k=3)
+    assert score.target == 10
+    assert score.closest == ["a", "b", "c"]
+    assert score_round(["a", "b"], [1, 5], 1.5, top_k=5).closest == ["b", "a"]
+
+
+def test_vectorized_scoring_matches_the_loop(monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(server, "VECTORIZE_MIN_PLAYERS", 10 ** 9)
+    rng = random.Random(7)
+    for _ in range(200):
+        size = rng.randint(1, 120)
+        nicknames = [f"p{i}" for i in range(size)]
+        # A small range makes ties common
+        numbers = [rng.choice([rng.randint(0, 10), rng.uniform(0, 100)]) for _ in range(size)]
+        multiplier, top_k = rng.choice([0.5, 0.8, 1.5]), rng.choice([1, 2, 5, 200])
+        vectorized = server.score_round_vectorized(nicknames, numbers, multiplier, top_k)
+        plain = score_round(nicknames, numbers, multiplier, top_k)
+        assert vectorized.closest == plain.closest
+        assert vectorized.total_sum == pytest.approx(plain.total_sum)
+        assert vectorized.target == pytest.approx(plain.target)
+
+
+def test_rounds_keep_the_top_players_when_enabled(registry, monkeypatch):
+    monkeypatch.setattr(server, "ROUND_TOP_K", 2)
+    room = registry.rooms[1]
+    for nickname in ("alice", "bob", "carol", "vic"):
+        room.add_player(Player(nickname, is_viewer=nickname == "vic"))
+    room.start_round()
+    for nickname, number in (("alice", 90), ("bob", 40), ("carol", 20), ("vic", 50)):
+        room.set_number(nickname, number)
+    server.calculate_winner(1)
+    game_round = room.game_history[-1]
+    assert game_round.players_data == {"alice": 90, "bob": 40, "carol": 20}
+    assert game_round.target_number == 40
+    assert game_round.winner == "bob"
+    assert game_round.to_dict()["top_players"] == ["bob", "carol"]
+
+
+def test_rounds_leave_out_top_players_by_default(registry):
+    room = registry.rooms[1]
+    room.add_player(Player("alice"))
+    room.start_round()
+    room.set_number("alice", 10)
+    server.calculate_winner(1)
+    assert room.game_history[-1].winner == "alice"
+    assert "top_players" not in room.game_history[-1].to_dict()
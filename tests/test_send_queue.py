@@ -0,0 +1,74 @@
+import asyncio
+
+import server
+from server import ClientConnection, Frame, Player
+
+
+class StuckSocket:
+    """A websocket whose client never reads, so every write waits forever"""
+    async def send_text(self, text):
+        await asyncio.Event().wait()
+
+
+def patch(version):
+    return Frame({"type": "room_patch", "version": version, "base_version": version - 1})
+
+
+async def backed_up(queued: int) -> ClientConnection:
+    connection = ClientConnection(StuckSocket(), 1, "alice")
+    connection.send(patch(1))
+    await asyncio.sleep(0)  # the writer takes the first frame and blocks on it
+    for version in range(queued):
+        assert connection.send(patch(version + 2))
+    assert len(connection.queue) == queued
+    return connection
+
+
+def test_latest_policy_collapses_patches_into_the_snapshot(monkeypatch):
+    monkeypatch.setattr(server, "SEND_QUEUE_SIZE", 4)
+    monkeypatch.setattr(server, "SLOW_CONSUMER_POLICY", "latest")
+
+    async def run():
+        connection = await backed_up(4)
+        snapshot = Frame({"type": "room_state", "version": 9})
+        assert connection.send(patch(9), snapshot=snapshot)
+        assert list(connection.queue) == [snapshot]
+        connection.close()
+    asyncio.run(run())
+
+
+def test_control_frames_never_push_out_queued_patches(monkeypatch):
+    monkeypatch.setattr(server, "SEND_QUEUE_SIZE", 4)
+    monkeypatch.setattr(server, "SLOW_CONSUMER_POLICY", "latest")
+
+    async def run():
+        connection = await backed_up(4)
+        assert connection.send(server.PING_FRAME)
+        # A relayed patch comes without a snapshot to collapse into either
+        assert connection.send(Frame.from_text("room_patch", '{"version":6}'))
+        assert [frame.type for frame in connection.queue] == ["room_patch"] * 4 + ["ping", "room_patch"]
+        # Until the client is twice the bound behind
+        for _ in range(2):
+            assert connection.send(server.PING_FRAME)
+        assert not connection.send(server.PING_FRAME)
+        connection.close()
+    asyncio.run(run())
+
+
+def test_dropping_the_last_slow_client_releases_the_room(monkeypatch, registry):
+    monkeypatch.setattr(server, "SEND_QUEUE_SIZE", 4)
+    monkeypatch.setattr(server, "SLOW_CONSUMER_POLICY", "disconnect")
+    room = registry.get_or_create(10)
+    room.add_player(Player("alice"))
+
+    async def run():
+        connection = await backed_up(4)
+        connection.room_id = 10
+        registry.connections[10]["alice"] = registry.player_connections[10]["alice"] = connection
+        state = {"type": "room_state", "room_id": 10, "game_status": "waiting"}
+        manager_patch = {"type": "room_patch", "room_id": 10, "version": 2, "base_version": 1}
+        connection.awaiting_snapshot = False
+        server.manager.broadcast_state(10, state, manager_patch)
+        assert connection.closed
+    asyncio.run(run())
+    assert 10 not in registry.rooms
@@ -0,0 +1,19 @@
+from starlette.testclient import TestClient
+
+import server
+
+
+def test_rooms_of_every_served_shard_are_handled_in_process(monkeypatch, registry):
+    # Several shards and no backplane URL: this process serves all of them
+    monkeypatch.setattr(server, "SHARD_COUNT", 2)
+    monkeypatch.setattr(server, "SERVED_SHARDS", {0, 1})
+    monkeypatch.setattr(server, "EVENT_LOG_DIR", "")
+
+    async def proxy_websocket(*args):
+        raise AssertionError("relayed a room this process serves")
+    monkeypatch.setattr(server, "proxy_websocket", proxy_websocket)
+    with TestClient(server.app) as client:
+        with client.websocket_connect("/api/ws/1/alice?full_state=true") as websocket:
+            state = websocket.receive_json()
+            assert state["type"] == "room_state" and state["room_id"] == 1
+            assert isinstance(registry.connections[1]["alice"], server.ClientConnection)
@@ -0,0 +1,123 @@
+import pytest
+
+import server
+from server import Player, RoomStats
+
+
+@pytest.fixture
+def room(registry):
+    room = registry.rooms[1]
+    for nickname in ("alice", "bob", "carol"):
+        room.add_player(Player(nickname))
+    return room
+
+
+def play(room, **numbers):
+    room.start_round()
+    for nickname, number in numbers.items():
+        room.set_number(nickname, number)
+    server.calculate_winner(room.room_id)
+
+
+def test_running_totals(room):
+    room.set_multiplier(0.5)
+    play(room, alice=10, bob=30, carol=50)  # target 15: alice
+    play(room, alice=20, bob=40, carol=60)  # target 20: alice
+    play(room, alice=20, bob=40, carol=60)  # again
+    stats = server.room_stats(1, limit=10)
+    assert stats["rounds"] == 3
+    assert stats["average_target"] == round((15 + 20 + 20) / 3, 2)
+    assert (stats["min_target"], stats["max_target"]) == (15, 20)
+    assert stats["average_pick"] == round((90 + 120 + 120) / 9, 2)
+    assert stats["target_trend"] == 2.5
+    assert stats["player_total"] == 3
+    assert [(p["nickname"], p["rounds"], p["wins"]) for p in stats["players"]] == [("alice", 3, 3), ("bob", 3, 0), ("carol", 3, 0)]
+    assert stats["players"][0]["average_distance"] == round((5 + 0 + 0) / 3, 2)
+
+
+def test_totals_outlive_the_history_kept(monkeypatch, room):
+    monkeypatch.setattr(server, "HISTORY_MAX_ROUNDS", 2)
+    for number in (10, 20, 30, 40):
+        play(room, alice=number)
+    assert len(room.game_history) == 2
+    assert room.stats.rounds == 4 and room.stats.players["alice"][0] == 4
+
+
+def test_ties_rank_by_win_rate_then_distance_then_first_seen():
+    rounds = [
+        server.GameRound(round_number=1, players_data={"dan": 10, "erin": 12}, total_sum=22, average=11,
+                         target_number=10, winner="dan", timestamp=""),
+        server.GameRound(round_number=2, players_data={"erin": 10, "frank": 10}, total_sum=20, average=10,
+                         target_number=10, winner="erin", timestamp=""),
+        server.GameRound(round_number=3, players_data={"gus": 30}, total_sum=30, average=30,
+                         target_number=30, winner=None, timestamp=""),
+        server.GameRound(round_number=4, players_data={"hal": 30}, total_sum=30, average=30,
+                         target_number=30, winner=None, timestamp=""),
+    ]
+    stats = RoomStats.from_rounds(rounds)
+    # dan and erin won once each, dan in one round of one; frank beats gus and hal on
+    # distance; gus and hal tie on everything and keep their order
+    assert [p["nickname"] for p in stats.table()] == ["dan", "erin", "frank", "gus", "hal"]
+
+
+def test_vectorized_ranking_matches(monkeypatch, room):
+    pytest.importorskip("numpy")
+    for i in range(6):
+        play(room, alice=10 + i, bob=20 - i, carol=15)
+    plain = room.stats.table()
+    monkeypatch.setattr(server, "VECTORIZE_MIN_PLAYERS", 1)
+    room.stats._table = None
+    assert room.stats.table() == plain
+
+
+def test_table_is_reused_until_the_next_round(room):
+    play(room, alice=10, bob=20, carol=30)
+    table = room.stats.table()
+    assert room.stats.table() is table
+    play(room, alice=10, bob=20, carol=30)
+    assert room.stats.table() is not table
+
+
+def test_stats_after_reset(room):
+    play(room, alice=10, bob=20, carol=30)
+    room.clear_history()
+    assert server.room_stats(1, limit=10) == {
+        "room_id": 1, "rounds": 0, "average_target": None, "min_target": None, "max_target": None,
+        "target_trend": None, "average_pick": None, "player_total": 0, "players": [],
+    }
+    play(room, alice=40)
+    assert server.room_stats(1, limit=10)["rounds"] == 1
+    # A released room starts over too
+    for nickname in ("alice", "bob", "carol"):
+        server.manager.disconnect(1, nickname)
+    assert server.rooms[1].stats.rounds == 0
+
+
+def test_snapshot_round_trip(room):
+    play(room, alice=10, bob=20, carol=30)
+    play(room, alice=50, bob=20, carol=30)
+    restored = RoomStats.from_snapshot(room.stats.to_snapshot())
+    assert restored.to_dict(10) == room.stats.to_dict(10)
+
+
+def test_cross_room_stats_cache(monkeypatch, room, registry):
+    monkeypatch.setattr(server, "shard_stats_cache", {})
+    play(room, alice=10, bob=20, carol=30)
+    first = server.shard_stats(limit=5)
+    assert first["rooms"] == 1 and first["rounds"] == 1
+    assert server.shard_stats(limit=5) is first
+    # A round anywhere, a cleared history and a room going away all rebuild it
+    registry.rooms[2].add_player(Player("dan"))
+    play(registry.rooms[2], dan=50)
+    second = server.shard_stats(limit=5)
+    assert second["rooms"] == 2 and second["rounds"] == 2
+    assert [(p["room_id"], p["nickname"]) for p in second["leaderboard"]][:2] == [(1, "bob"), (2, "dan")]
+    room.clear_history()
+    third = server.shard_stats(limit=5)
+    assert third["rooms"] == 1 and third["rounds"] == 1
+    extra = registry.get_or_create(10)
+    extra.add_player(Player("eve"))
+    play(extra, eve=5)
+    assert server.shard_stats(limit=5)["rounds"] == 2
+    server.manager.disconnect(10, "eve")
+    assert server.shard_stats(limit=5)["rounds"] == 1
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+import server
+
+
+class Viewer:
+    def __init__(self):
+        self.states = []
+
+    def send(self, frame, snapshot=None):
+        self.states.append(frame.message)
+        return True
+
+
+def state(game_status, version, rounds=0):
+    return {
+        "type": "room_state", "room_id": 1, "game_status": game_status, "version": version,
+        "players": [{"player_id": "id-alice", "nickname": "alice", "is_admin": True}],
+        "game_history": [{"round_number": n} for n in range(1, rounds + 1)],
+    }
+
+
+@pytest.fixture
+def viewer(monkeypatch, registry):
+    monkeypatch.setattr(server, "VIEWER_MAX_UPDATES_PER_SEC", 20)
+    viewer = registry.viewer_connections[1]["v"] = Viewer()
+    return viewer
+
+
+def test_viewer_state_drops_player_ids_and_older_rounds(monkeypatch):
+    monkeypatch.setattr(server, "VIEWER_HISTORY_ROUNDS", 2)
+    sent = server.viewer_state(state("results", 1, rounds=5))
+    assert sent["players"] == [{"nickname": "alice", "is_admin": True}]
+    assert sent["history_limit"] == 2
+    assert [r["round_number"] for r in sent["game_history"]] == [4, 5]
+    monkeypatch.setattr(server, "VIEWER_HISTORY_ROUNDS", 0)
+    assert server.viewer_state(state("results", 1, rounds=5))["game_history"] == []
+
+
+def test_viewers_get_the_latest_state_once_per_interval(viewer):
+    async def run():
+        server.manager.feed_viewers(1, state("choosing", 1))
+        for version in (2, 3, 4):
+            server.manager.feed_viewers(1, state("choosing", version))
+        assert [s["version"] for s in viewer.states] == [1]
+        await asyncio.sleep(0.08)
+        assert [s["version"] for s in viewer.states] == [1, 4]
+    asyncio.run(run())
+
+
+def test_a_status_change_goes_out_at_once(viewer):
+    async def run():
+        server.manager.feed_viewers(1, state("choosing", 1))
+        server.manager.feed_viewers(1, state("choosing", 2))
+        server.manager.feed_viewers(1, state("results", 3))
+        assert [(s["game_status"], s["version"]) for s in viewer.states] == [("choosing", 1), ("results", 3)]
+        # The pending update was part of it, nothing more follows
+        await asyncio.sleep(0.08)
+        assert len(viewer.states) == 2
+    asyncio.run(run())
+
+
+def test_a_new_viewer_does_not_wait_for_the_interval(viewer, registry):
+    async def run():
+        server.manager.feed_viewers(1, state("choosing", 1))
+        late = registry.viewer_connections[1]["late"] = Viewer()
+        server.room_sync[1].new_viewers.append(late)
+        server.manager.feed_viewers(1, state("choosing", 2))
+        assert [s["version"] for s in late.states] == [2]
+        assert [s["version"] for s in viewer.states] == [1]
+        await asyncio.sleep(0.08)
+        # Everyone gets the throttled update, the new viewer included
+        assert [s["version"] for s in viewer.states] == [1, 2]
+        assert [s["version"] for s in late.states] == [2, 2]
+    asyncio.run(run())
+
+
+def test_viewer_socket_gets_the_viewer_state(monkeypatch, registry):
+    monkeypatch.setattr(server, "EVENT_LOG_DIR", "")
+    monkeypatch.setattr(server, "VIEWER_HISTORY_ROUNDS", 1)
+    with TestClient(server.app) as client:
+        with client.websocket_connect("/api/ws/1/alice?full_state=true") as alice:
+            assert "player_id" in alice.receive_json()["players"][0]
+            with client.websocket_connect("/api/ws/1/v?viewer=true") as v:
+                sent = v.receive_json()
+                assert sent["type"] == "room_state" and sent["history_limit"] == 1
+                assert sent["viewers_count"] == 1
+                assert [p["nickname"] for p in sent["players"]] == ["alice"]
+                assert all("player_id" not in p for p in sent["players"])
@@ -0,0 +1,55 @@
+import pytest
+
+import server
+from server import Frame, WIRE_KEYS
+
+msgpack = pytest.importorskip("msgpack")
+
+
+def receive_until(websocket, pred):
+    while True:
+        message = server.unpack_message(websocket.receive_bytes())
+        if pred(message):
+            return message
+
+
+def test_keys_are_compacted_and_expanded():
+    message = {"type": "room_state", "players": [{"nickname": "a", "number": 1}], "extra": {"round_number": 2},
+               "game_history": [{"round_number": 1, "players_data": {"type": 5, "bob": 7}}]}
+    compacted = server.compact_keys(message)
+    assert compacted[WIRE_KEYS.index("type")] == "room_state"
+    assert compacted[WIRE_KEYS.index("players")] == [{WIRE_KEYS.index("nickname"): "a", WIRE_KEYS.index("number"): 1}]
+    # Keys outside the list stay as they are, and nicknames are never taken for keys
+    assert compacted["extra"] == {WIRE_KEYS.index("round_number"): 2}
+    history = compacted[WIRE_KEYS.index("game_history")][0]
+    assert history[WIRE_KEYS.index("players_data")] == {"type": 5, "bob": 7}
+    assert server.unpack_message(server.pack_message(message)) == message
+
+
+def test_packed_form_is_built_once():
+    frame = Frame({"type": "room_patch", "version": 2})
+    assert frame.packed is frame.packed
+    assert server.unpack_message(frame.packed) == {"type": "room_patch", "version": 2}
+    relayed = Frame.from_text("room_patch", '{"type":"room_patch","version":2}')
+    assert relayed.packed == frame.packed
+
+
+def test_msgpack_socket_gets_the_keys_then_binary_frames(client):
+    with client.websocket_connect("/api/ws/1/alice", subprotocols=["msgpack.v1"]) as ws:
+        assert ws.accepted_subprotocol == "msgpack.v1"
+        assert msgpack.unpackb(ws.receive_bytes()) == {"type": "wire_keys", "keys": WIRE_KEYS}
+        state = receive_until(ws, lambda m: m["type"] == "room_state")
+        assert state["players"][0]["nickname"] == "alice"
+        # Actions may be MessagePack, with plain or compacted keys, or JSON text
+        ws.send_bytes(msgpack.packb({"action": "start_game"}))
+        receive_until(ws, lambda m: m.get("set", {}).get("game_status") == "choosing")
+        ws.send_bytes(server.pack_message({"action": "choose_number", "number": 10}))
+        receive_until(ws, lambda m: m.get("set", {}).get("game_status") == "results")
+        ws.send_json({"action": "stop_game"})
+        receive_until(ws, lambda m: m.get("set", {}).get("game_status") == "waiting")
+
+
+def test_json_is_the_default(client):
+    with client.websocket_connect("/api/ws/1/alice", subprotocols=["something.else"]) as ws:
+        assert ws.accepted_subprotocol is None
+        assert ws.receive_json()["type"] == "room_state"